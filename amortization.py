@@ -0,0 +1,116 @@
+"""Level-payment amortization, vectorized over whole loan portfolios.
+
+Every function takes NumPy arrays (one element per loan) and works in a
+fixed number of array operations, with no per-loan Python loop. Money is
+float64 in major units and rounded to cents only on output. Dates are
+``datetime64[D]``.
+
+Payments fall due monthly on the start date's day of month (clamped to
+short months), the first one month after the start. Outstanding balances
+are contractual: they assume every scheduled payment was made.
+"""
+import numpy as np
+
+
+def monthly_payment(principal, annual_rate, term_months):
+    r = annual_rate / 12
+    n = term_months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        level = principal * r / (1 - (1 + r) ** -n)
+    return np.where(r > 0, level, principal / n)
+
+
+def balance_after(principal, annual_rate, term_months, payment, k):
+    """Principal left after ``k`` payments (``k`` clipped to the term)."""
+    r = annual_rate / 12
+    k = np.clip(k, 0, term_months)
+    growth = (1 + r) ** k
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amortized = principal * growth - payment * (growth - 1) / r
+    balance = np.where(r > 0, amortized, principal - payment * k)
+    return np.where(k >= term_months, 0.0, np.maximum(balance, 0.0))
+
+
+def add_months(start, months):
+    """``start + months`` keeping the day of month, clamped to month end."""
+    start = np.asarray(start, dtype="datetime64[D]")
+    month = start.astype("datetime64[M]")
+    day = (start - month.astype("datetime64[D]")).astype(np.int64)
+
+    target = month + np.asarray(months, dtype=np.int64)
+    month_days = ((target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")).astype(np.int64)
+    return target.astype("datetime64[D]") + np.minimum(day, month_days - 1)
+
+
+def payments_made(start, term_months, as_of):
+    """Number of due dates on or before ``as_of``, per loan."""
+    start = np.asarray(start, dtype="datetime64[D]")
+    months = (
+        np.datetime64(as_of, "M").astype(np.int64)
+        - start.astype("datetime64[M]").astype(np.int64)
+    )
+    # One month too many where this month's due date is still ahead
+    months = months - (add_months(start, months) > np.datetime64(as_of, "D"))
+    return np.clip(months, 0, term_months)
+
+
+# =========================
+# PORTFOLIO
+# =========================
+
+def portfolio(principal, annual_rate, term_months, start, as_of):
+    """Position of every loan on ``as_of`` in one vectorized pass.
+
+    Returns a dict of arrays: ``payment``, ``payments_made``,
+    ``outstanding`` (principal), ``accrued_interest`` (since the last
+    due date, actual/365), ``interest_paid`` and ``maturity``.
+    """
+    principal = np.asarray(principal, dtype=np.float64)
+    annual_rate = np.asarray(annual_rate, dtype=np.float64)
+    term_months = np.asarray(term_months, dtype=np.int64)
+    start = np.asarray(start, dtype="datetime64[D]")
+
+    payment = monthly_payment(principal, annual_rate, term_months)
+    k = payments_made(start, term_months, as_of)
+    outstanding = balance_after(principal, annual_rate, term_months, payment, k)
+
+    last_due = add_months(start, k)
+    days = (np.datetime64(as_of, "D") - last_due).astype(np.int64)
+    accrued = np.where(outstanding > 0, outstanding * annual_rate * np.maximum(days, 0) / 365, 0.0)
+
+    return {
+        "payment": payment,
+        "payments_made": k,
+        "outstanding": outstanding,
+        "accrued_interest": accrued,
+        "interest_paid": payment * k - (principal - outstanding),
+        "maturity": add_months(start, term_months),
+    }
+
+
+# =========================
+# SINGLE SCHEDULE
+# =========================
+
+def schedule(principal, annual_rate, term_months, start):
+    """Per-period rows for one loan, computed as arrays over the periods.
+
+    Returns ``(due_dates, payments, interest, principal_paid, balances)``,
+    rounded to cents; the last payment absorbs the rounding so the
+    balance ends at exactly zero.
+    """
+    n = int(term_months)
+    periods = np.arange(1, n + 1)
+    principal = float(principal)
+    annual_rate = float(annual_rate)
+
+    payment = float(monthly_payment(np.float64(principal), np.float64(annual_rate), n))
+    opening = balance_after(principal, annual_rate, n, payment, periods - 1)
+    balances = np.round(balance_after(principal, annual_rate, n, payment, periods), 2)
+
+    interest = np.round(opening * annual_rate / 12, 2)
+    principal_paid = np.round(np.concatenate(([principal], balances[:-1])) - balances, 2)
+    payments = interest + principal_paid
+
+    due_dates = add_months(np.full(n, np.datetime64(start, "D")), periods)
+    return due_dates, payments, interest, principal_paid, balances
@@ -1,4 +1,13 @@
-from flask import Flask, render_template, request, redirect, session, jsonify
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    redirect,
+    session,
+    jsonify,
+    stream_with_context
+)
 from flask_jwt_extended import (
     JWTManager,
     create_access_token,
@@ -8,22 +17,75 @@ from flask_jwt_extended import (
 )
 from models import db, bcrypt, User, Account, Transaction, VirtualCard, Loan
 from config import Config
+from pagination import transaction_page
+from search import SearchError, parse_filters, search_page
+from summaries import dashboard_summary, recent_transactions
+from stats import system_stats
+from cli import zenith
+import ledger
+from ledger import TransferError
+import cards
+from cards import CardError
+import loans
+from loans import LoanError
+import limits
+import outbox
+from ratelimit import RateLimiter, create_backend, parse_limit
+from passwords import HasherBusy, PasswordHasher, resolve_rounds
+from users import current_user, user_profile
+import metrics
+import assets
+import engines
+import replicas
+from replicas import read_only
+from versions import conditional
+from exports import iter_csv, iter_jsonl, parse_date_range, statement_rows
 from functools import wraps
-from time import time
 from flask_migrate import Migrate
-from decimal import Decimal
+import hmac
+import json
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
-login_attempts = {}
-
 # Extensions
+engines.configure(app.config)
 db.init_app(app)
+engines.init_app(app, db)
+app.config["BCRYPT_LOG_ROUNDS"] = resolve_rounds(app.config)
 bcrypt.init_app(app)
 jwt = JWTManager(app)
 migrate = Migrate(app, db)
 
+# Password hashing off the request thread, with a bounded queue
+hasher = PasswordHasher(
+    app.config["BCRYPT_LOG_ROUNDS"],
+    workers=Config.PASSWORD_HASH_WORKERS,
+    max_pending=Config.PASSWORD_HASH_MAX_PENDING,
+    timeout=Config.PASSWORD_HASH_TIMEOUT
+)
+
+# Rate limiting (shared across gunicorn workers by default)
+ratelimit_backend = create_backend(app.config)
+login_limiter = RateLimiter(ratelimit_backend, "login", *parse_limit(Config.LOGIN_RATE_LIMIT))
+refresh_limiter = RateLimiter(ratelimit_backend, "refresh", *parse_limit(Config.REFRESH_RATE_LIMIT))
+
+# Per-route latency / SQL instrumentation, exported at /metrics
+metrics.init_app(app)
+
+# Daily/monthly spend limits and the transfer velocity rule
+limits.init_app(app)
+outbox.init_app(app)
+
+# Read-replica routing (after metrics so the target is recorded)
+replicas.init_app(app)
+
+# Fingerprinted, precompressed static files (built by `flask zenith assets`)
+assets.init_app(app)
+
+# CLI (flask zenith ...)
+app.cli.add_command(zenith)
+
 # =============================
 # DATABASE INIT
 # =============================
@@ -62,7 +124,10 @@ def register():
         if User.query.filter_by(email=email).first():
             return render_template("register.html", error="Email already registered")
 
-        hashed_pw = bcrypt.generate_password_hash(password).decode("utf-8")
+        try:
+            hashed_pw = hasher.hash(password)
+        except HasherBusy:
+            return render_template("register.html", error="Service busy. Please try again."), 503
 
         new_user = User(
             username=username,
@@ -75,6 +140,15 @@ def register():
 
         account = Account(balance=1000, user_id=new_user.id)
         db.session.add(account)
+        db.session.flush()
+
+        # Opening deposit keeps the balance equal to its ledger sum
+        db.session.add(Transaction(
+            amount=1000,
+            transaction_type="General",
+            description="Opening deposit",
+            account_id=account.id
+        ))
         db.session.commit()
 
         return redirect("/login")
@@ -84,22 +158,28 @@ def register():
 
 # -------- Login --------
 
+def rehash_if_needed(user, password):
+    # Bring weaker hashes up to the configured cost on a good login
+    if not hasher.needs_rehash(user.password):
+        return
+
+    try:
+        user.password = hasher.hash(password)
+        db.session.commit()
+    except HasherBusy:
+        # Not worth failing a valid login over; retry next time
+        db.session.rollback()
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
 
     if request.method == "POST":
 
         ip = request.remote_addr
-        current_time = time()
-
-        # امسح المحاولات الأقدم من 60 ثانية
-        login_attempts[ip] = [
-            t for t in login_attempts.get(ip, [])
-            if current_time - t < 60
-        ]
 
         # لو أكتر من 5 محاولات في دقيقة
-        if len(login_attempts.get(ip, [])) >= 5:
+        if login_limiter.blocked(ip):
             return render_template("login.html", error="Too many attempts. Try again in a minute.")
 
         username = request.form.get("username", "").strip()
@@ -107,17 +187,24 @@ def login():
 
         user = User.query.filter_by(username=username).first()
 
-        if not user or not bcrypt.check_password_hash(user.password, password):
-            login_attempts.setdefault(ip, []).append(current_time)
+        try:
+            valid = user is not None and hasher.check(user.password, password)
+        except HasherBusy:
+            return render_template("login.html", error="Service busy. Please try again."), 503
+
+        if not valid:
+            login_limiter.hit(ip)
             return render_template("login.html", error="Invalid username or password")
 
+        rehash_if_needed(user, password)
+
         # تسجيل دخول ناجح
         session.clear()
         session["user_id"] = user.id
         session.permanent = True
 
         # امسح المحاولات بعد النجاح
-        login_attempts.pop(ip, None)
+        login_limiter.reset(ip)
 
         return redirect("/dashboard")
 
@@ -138,22 +225,30 @@ def logout():
 # -------- Dashboard --------
 
 @app.route("/dashboard")
+@read_only
+@conditional(lambda: session.get("user_id"), vary="Cookie")
 def dashboard():
-    if "user_id" not in session:
+    user = current_user()
+    if user is None:
         return redirect("/login")
 
-    user = User.query.get(session["user_id"])
-    accounts = Account.query.filter_by(user_id=user.id).all()
+    accounts = user.accounts
+    virtual_cards = user.virtual_cards
 
-    transactions = []
-    for acc in accounts:
-        transactions.extend(acc.transactions)
+    # Aggregates come from the monthly summary store; only the latest
+    # few rows are embedded so the page size doesn't grow with history
+    summary = dashboard_summary(user.id, accounts, virtual_cards)
+    transactions = recent_transactions(
+        [a.id for a in accounts],
+        [c.id for c in virtual_cards]
+    )
 
     return render_template(
         "dashboard.html",
         user=user,
         accounts=accounts,
         transactions=transactions,
+        summary=summary,
         bank_name=Config.BANK_NAME
     )
 
@@ -161,70 +256,36 @@ def dashboard():
 
 @app.route("/transfer", methods=["GET", "POST"])
 def transfer():
-    if "user_id" not in session:
+    user = current_user()
+    if user is None:
         return redirect("/login")
 
-    user = db.session.get(User, session["user_id"])
-    accounts = Account.query.filter_by(user_id=user.id).all()
-    virtual_cards = VirtualCard.query.filter_by(user_id=user.id).all()
+    accounts = user.accounts
+    virtual_cards = user.virtual_cards
 
     if request.method == "POST":
         target_username = request.form.get("target_username", "").strip()
-        
-        # FIX: Cast to Decimal instead of float to prevent Python TypeErrors
-        try:
-            amount = Decimal(request.form.get("amount", "0"))
-        except:
-            amount = Decimal('0')
-            
-        source = request.form.get("source")  
 
         target_user = User.query.filter_by(username=target_username).first()
-        
+
         if not target_user:
             return render_template("transfer.html", user=user, accounts=accounts, virtual_cards=virtual_cards, error="Target user not found")
 
         try:
-            source_type, source_id = source.split("_")
-            source_id = int(source_id)
-            
-            if source_type == "account":
-                sender_source = db.session.get(Account, source_id)
-                sender_source.balance -= amount
-                tx_out = Transaction(
-                    amount=-amount, 
-                    transaction_type="Transfer Out", 
-                    description=f"Sent to {target_username}", 
-                    account_id=source_id
-                )
-            elif source_type == "vcard":
-                sender_source = db.session.get(VirtualCard, source_id)
-                sender_source.balance -= amount
-                tx_out = Transaction(
-                    amount=-amount, 
-                    transaction_type="Transfer Out", 
-                    description=f"Sent to {target_username}", 
-                    virtual_card_id=source_id
-                )
-            else:
-                raise ValueError("Invalid source")
-
-            target_account = Account.query.filter_by(user_id=target_user.id).first()
-            target_account.balance += amount
-            
-            tx_in = Transaction(
-                amount=amount, 
-                transaction_type="Transfer In", 
-                description=f"Received from {user.username}", 
-                account_id=target_account.id
+            ledger.transfer(
+                user.id,
+                ledger.parse_source(request.form.get("source")),
+                ledger.parse_amount(request.form.get("amount", "0")),
+                target_account_id=ledger.primary_account_id(target_user.id),
+                description_out=f"Sent to {target_username}",
+                description_in=f"Received from {user.username}"
             )
 
-            db.session.add(tx_out)
-            db.session.add(tx_in)
-            db.session.commit()
-            
             return redirect("/history")
 
+        except TransferError as e:
+            return render_template("transfer.html", user=user, accounts=accounts, virtual_cards=virtual_cards, error=str(e))
+
         except Exception as e:
             # FIX: Print the exact error to the terminal for easy debugging
             print(f"TRANSFER ERROR: {e}") 
@@ -243,116 +304,122 @@ def transfer():
 
 @app.route("/loan", methods=["GET", "POST"])
 def loan():
-    if "user_id" not in session:
+    user = current_user()
+    if user is None:
         return redirect("/login")
 
-    user = db.session.get(User, session["user_id"])
-    accounts = Account.query.filter_by(user_id=user.id).all()
-    virtual_cards = VirtualCard.query.filter_by(user_id=user.id).all()
+    accounts = user.accounts
+    virtual_cards = user.virtual_cards
 
     if request.method == "POST":
-        # FIX: Cast to Decimal instead of float
         try:
-            amount = Decimal(request.form.get("amount", "0"))
-        except:
-            amount = Decimal('0')
-            
-        target = request.form.get("target")
-
-        try:
-            target_type, target_id = target.split("_")
-            target_id = int(target_id)
-            
-            if target_type == "account":
-                dest = db.session.get(Account, target_id)
-                dest.balance += amount
-                tx = Transaction(
-                    amount=amount, 
-                    transaction_type="Loan Disbursed", 
-                    description="System Loan", 
-                    account_id=dest.id
-                )
-            elif target_type == "vcard":
-                dest = db.session.get(VirtualCard, target_id)
-                dest.balance += amount
-                tx = Transaction(
-                    amount=amount, 
-                    transaction_type="Loan Disbursed", 
-                    description="System Loan", 
-                    virtual_card_id=dest.id
-                )
-            else:
-                raise ValueError("Invalid target")
-
-            new_loan = Loan(amount=amount, user_id=user.id)
-
-            db.session.add(tx)
-            db.session.add(new_loan)
-            db.session.commit()
-            
+            loans.disburse(
+                user.id,
+                request.form.get("target"),
+                request.form.get("amount"),
+                Config.LOAN_ANNUAL_RATE,
+                request.form.get("term"),
+                Config.LOAN_TERMS,
+                Config.LOAN_MAX_AMOUNT
+            )
             return redirect("/history")
 
-        except Exception as e:
-            # FIX: Print the exact error to the terminal
-            print(f"LOAN ERROR: {e}")
-            return render_template("loan.html", user=user, accounts=accounts, virtual_cards=virtual_cards, error="Loan processing failed.")
+        except LoanError as e:
+            return render_template("loan.html", user=user, accounts=accounts, virtual_cards=virtual_cards, loan_terms=Config.LOAN_TERMS, loan_rate=Config.LOAN_ANNUAL_RATE, error=str(e))
+
+        except Exception:
+            app.logger.exception("Loan disbursement failed")
+            return render_template("loan.html", user=user, accounts=accounts, virtual_cards=virtual_cards, loan_terms=Config.LOAN_TERMS, loan_rate=Config.LOAN_ANNUAL_RATE, error="Loan processing failed.")
 
     return render_template(
         "loan.html", 
         user=user, 
         accounts=accounts, 
         virtual_cards=virtual_cards, 
+        loan_terms=Config.LOAN_TERMS,
+        loan_rate=Config.LOAN_ANNUAL_RATE,
         bank_name=Config.BANK_NAME
     )
 
 # -------- Transaction History --------
 
 @app.route("/history")
+@read_only
+@conditional(lambda: session.get("user_id"), vary="Cookie")
 def history():
-    if "user_id" not in session:
+    user = current_user()
+    if user is None:
         return redirect("/login")
 
-    user = User.query.get(session["user_id"])
-    accounts = Account.query.filter_by(user_id=user.id).all()
+    account_ids = [a.id for a in user.accounts]
+    card_ids = [c.id for c in user.virtual_cards]
 
-    # Gather all transactions linked to the user's primary accounts
-    transactions = []
-    for acc in accounts:
-        transactions.extend(acc.transactions)
-        
-    # Sort transactions chronologically (newest first)
-    transactions.sort(key=lambda x: x.created_at, reverse=True)
+    # Keyset pagination on (created_at, id), newest first
+    transactions, next_cursor = transaction_page(
+        account_ids,
+        card_ids,
+        cursor=request.args.get("cursor"),
+        limit=Config.HISTORY_PAGE_SIZE
+    )
 
     return render_template(
         "history.html",
         user=user,
         transactions=transactions,
+        next_cursor=next_cursor,
+        is_first_page=not request.args.get("cursor"),
         bank_name=Config.BANK_NAME
     )
 
+# -------- Statement Export --------
+
+@app.route("/history/export.csv")
+@read_only
+def history_export():
+    user = current_user()
+    if user is None:
+        return redirect("/login")
+
+    try:
+        start_at, end_before = parse_date_range(
+            request.args.get("start"), request.args.get("end")
+        )
+    except ValueError:
+        return "Invalid date range", 400
+
+    rows = statement_rows(
+        [a.id for a in user.accounts],
+        [c.id for c in user.virtual_cards],
+        start_at,
+        end_before
+    )
+
+    return Response(
+        stream_with_context(iter_csv(rows)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=statement.csv"}
+    )
+
 # -------- Admin Panel --------
 
 @app.route("/admin")
+@read_only
 def admin():
     if "user_id" not in session:
         return redirect("/login")
 
-    user = User.query.get(session["user_id"])
+    profile = user_profile(session["user_id"])
 
-    if not user.is_admin:
+    if not profile or not profile["is_admin"]:
         return "Unauthorized", 403
 
-    total_users = User.query.count()
-    total_transactions = Transaction.query.count()
-    total_balance = db.session.query(
-        db.func.sum(Account.balance)
-    ).scalar()
+    stats = system_stats(Config.ADMIN_STATS_TTL)
 
     return render_template(
         "admin.html",
-        total_users=total_users,
-        total_transactions=total_transactions,
-        total_balance=total_balance
+        total_users=stats["users"],
+        total_transactions=stats["transactions"],
+        total_balance=stats["balance"]
     )
 
 # =============================
@@ -361,26 +428,40 @@ def admin():
 
 @app.route("/api/login", methods=["POST"])
 def api_login():
+    ip = request.remote_addr
+
+    if login_limiter.blocked(ip):
+        return jsonify({"msg": "Too many attempts"}), 429
+
     data = request.get_json()
 
     user = User.query.filter_by(
         username=data["username"]
     ).first()
 
-    if not user or not bcrypt.check_password_hash(
-        user.password,
-        data["password"]
-    ):
+    try:
+        valid = user is not None and hasher.check(user.password, data["password"])
+    except HasherBusy:
+        return jsonify({"msg": "Service busy"}), 503
+
+    if not valid:
+        login_limiter.hit(ip)
         return jsonify({"msg": "Invalid credentials"}), 401
 
+    login_limiter.reset(ip)
+    rehash_if_needed(user, data["password"])
+
     return jsonify({
-        "access_token": create_access_token(identity=user.id),
-        "refresh_token": create_refresh_token(identity=user.id)
+        "access_token": create_access_token(identity=str(user.id)),
+        "refresh_token": create_refresh_token(identity=str(user.id))
     })
 
 @app.route("/api/refresh", methods=["POST"])
 @jwt_required(refresh=True)
 def refresh():
+    if not refresh_limiter.hit(request.remote_addr):
+        return jsonify({"msg": "Too many requests"}), 429
+
     identity = get_jwt_identity()
     new_access = create_access_token(identity=identity)
     return jsonify({"access_token": new_access})
@@ -391,10 +472,9 @@ def admin_required(fn):
     @wraps(fn)
     @jwt_required()
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        profile = user_profile(get_jwt_identity())
 
-        if not user or not user.is_admin:
+        if not profile or not profile["is_admin"]:
             return jsonify({"msg": "Admin access required"}), 403
 
         return fn(*args, **kwargs)
@@ -402,11 +482,95 @@ def admin_required(fn):
     return wrapper
 
 @app.route("/api/admin/stats")
+@read_only
 @admin_required
 def admin_stats():
+    stats = system_stats(Config.ADMIN_STATS_TTL)
+
+    return jsonify({
+        "users": stats["users"],
+        "transactions": stats["transactions"]
+    })
+
+# -------- API Dashboard / History --------
+
+def _transaction_json(tx):
+    return {
+        "id": tx.id,
+        "created_at": tx.created_at.isoformat(),
+        "transaction_type": tx.transaction_type,
+        "description": tx.description,
+        "amount": str(tx.amount),
+        "account_id": tx.account_id,
+        "virtual_card_id": tx.virtual_card_id,
+    }
+
+@app.route("/api/dashboard")
+@read_only
+@jwt_required()
+@conditional(lambda: int(get_jwt_identity()), vary="Authorization")
+def api_dashboard():
+
+    user_id = int(get_jwt_identity())
+    accounts = Account.query.filter_by(user_id=user_id).all()
+    virtual_cards = VirtualCard.query.filter_by(user_id=user_id).all()
+
+    summary = dashboard_summary(user_id, accounts, virtual_cards)
+    transactions = recent_transactions(
+        [a.id for a in accounts],
+        [c.id for c in virtual_cards]
+    )
+
+    return jsonify({
+        "summary": summary,
+        "transactions": [_transaction_json(tx) for tx in transactions]
+    })
+
+@app.route("/api/transactions")
+@read_only
+@jwt_required()
+@conditional(lambda: int(get_jwt_identity()), vary="Authorization")
+def api_transactions():
+
+    user_id = int(get_jwt_identity())
+
+    transactions, next_cursor = transaction_page(
+        [a.id for a in Account.query.filter_by(user_id=user_id)],
+        [c.id for c in VirtualCard.query.filter_by(user_id=user_id)],
+        cursor=request.args.get("cursor"),
+        limit=Config.HISTORY_PAGE_SIZE
+    )
+
     return jsonify({
-        "users": User.query.count(),
-        "transactions": Transaction.query.count()
+        "transactions": [_transaction_json(tx) for tx in transactions],
+        "next_cursor": next_cursor
+    })
+
+@app.route("/api/transactions/search")
+@read_only
+@jwt_required()
+@conditional(lambda: int(get_jwt_identity()), vary="Authorization")
+def api_transactions_search():
+
+    user_id = int(get_jwt_identity())
+
+    try:
+        types, where = parse_filters(request.args, Config.SEARCH_MAX_DAYS)
+    except SearchError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    transactions, next_cursor = search_page(
+        [a.id for a in Account.query.filter_by(user_id=user_id)],
+        [c.id for c in VirtualCard.query.filter_by(user_id=user_id)],
+        types,
+        where,
+        cursor=request.args.get("cursor"),
+        limit=Config.HISTORY_PAGE_SIZE
+    )
+
+    return jsonify({
+        "transactions": [_transaction_json(tx) for tx in transactions],
+        "next_cursor": next_cursor
     })
 
 # -------- API Transfer --------
@@ -417,32 +581,234 @@ def api_transfer():
 
     user_id = get_jwt_identity()
     data = request.get_json()
-    amount = float(data["amount"])
 
-    if amount <= 0:
+    try:
+        amount = ledger.parse_amount(data.get("amount"))
+    except TransferError:
         return jsonify({"msg": "Invalid amount"}), 400
 
-    if amount > 5000:
+    if amount > Config.API_TRANSFER_LIMIT:
         return jsonify({"msg": "Transaction limit exceeded"}), 400
 
-    account = Account.query.filter_by(user_id=user_id).first()
+    target_account_id = None
+    target_username = data.get("target_username")
+
+    if target_username:
+        target_user = User.query.filter_by(username=target_username).first()
+        if not target_user:
+            return jsonify({"msg": "Target user not found"}), 404
+        target_account_id = ledger.primary_account_id(target_user.id)
+
+    try:
+        ledger.transfer(
+            int(user_id),
+            (Account, ledger.primary_account_id(user_id)),
+            amount,
+            target_account_id=target_account_id,
+            description_out="API Transfer",
+            description_in="API Transfer",
+            type_out="API Transfer",
+            type_in="API Transfer"
+        )
+    except TransferError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    return jsonify({"msg": "Transfer successful"}), 200
+
+@app.route("/api/limits")
+@read_only
+@jwt_required()
+def api_limits():
+    user_id = int(get_jwt_identity())
+    card_ids = db.session.scalars(
+        db.select(VirtualCard.id).where(VirtualCard.user_id == user_id)
+    ).all()
+
+    def usage_json(usage):
+        return {
+            "spent_today": str(usage["day"]),
+            "spent_this_month": str(usage["month"]),
+            "daily_limit": str(usage["daily_limit"]) if usage["daily_limit"] is not None else None,
+            "monthly_limit": str(usage["monthly_limit"]) if usage["monthly_limit"] is not None else None,
+        }
+
+    return jsonify({
+        "user": usage_json(limits.usage(limits.USER, [user_id])[user_id]),
+        "cards": {
+            str(card_id): usage_json(usage)
+            for card_id, usage in limits.usage(limits.CARD, card_ids).items()
+        },
+        "loans": usage_json(limits.usage(limits.LOAN, [user_id])[user_id]),
+    })
 
-    if account.balance < amount:
-        return jsonify({"msg": "Insufficient funds"}), 400
+# -------- API Statement Export --------
+
+@app.route("/api/transactions/export")
+@read_only
+@jwt_required()
+def api_transactions_export():
 
-    account.balance -= amount
+    user_id = int(get_jwt_identity())
 
-    tx = Transaction(
-        amount=-amount,
-        transaction_type="API Transfer",
-        description="API Transfer",
-        account_id=account.id
+    try:
+        start_at, end_before = parse_date_range(
+            request.args.get("start"), request.args.get("end")
+        )
+    except ValueError:
+        return jsonify({"msg": "Invalid date range"}), 400
+
+    rows = statement_rows(
+        [a.id for a in Account.query.filter_by(user_id=user_id)],
+        [c.id for c in VirtualCard.query.filter_by(user_id=user_id)],
+        start_at,
+        end_before
     )
 
-    db.session.add(tx)
-    db.session.commit()
+    if request.args.get("format") == "csv":
+        return Response(stream_with_context(iter_csv(rows)), mimetype="text/csv")
 
-    return jsonify({"msg": "Transfer successful"}), 200
+    return Response(
+        stream_with_context(iter_jsonl(rows)),
+        mimetype="application/x-ndjson"
+    )
+
+# -------- Card Authorization (processor) --------
+
+def processor_required(fn):
+    # Service-to-service: the card processor presents a shared bearer token
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = Config.CARD_PROCESSOR_TOKEN
+        if not token:
+            return jsonify({"msg": "Card processing is not configured"}), 503
+        presented = request.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(presented, f"Bearer {token}".encode("utf-8")):
+            return jsonify({"msg": "Unauthorized"}), 401
+
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+@app.route("/api/cards/authorize", methods=["POST"])
+@processor_required
+def card_authorize():
+    data = request.get_json(silent=True) or {}
+
+    try:
+        amount = ledger.parse_amount(data.get("amount"))
+    except TransferError:
+        return jsonify({"status": "declined", "reason": "invalid_amount"}), 400
+
+    try:
+        hold = cards.authorize(
+            str(data.get("card_number", "")),
+            str(data.get("cvv", "")),
+            amount,
+            Config.CARD_HOLD_TTL,
+            merchant=data.get("merchant"),
+            reference=data.get("reference")
+        )
+    except CardError as e:
+        return jsonify({"status": "declined", "reason": str(e)}), 402
+
+    return jsonify({
+        "status": "approved",
+        "hold_id": hold["hold_id"],
+        "amount": str(hold["amount"]),
+        "expires_at": hold["expires_at"].isoformat()
+    }), 200
+
+@app.route("/api/cards/capture", methods=["POST"])
+@processor_required
+def card_capture():
+    data = request.get_json(silent=True) or {}
+
+    try:
+        hold_id = int(data.get("hold_id"))
+        amount = ledger.parse_amount(data["amount"]) if data.get("amount") is not None else None
+    except (TypeError, ValueError, TransferError):
+        return jsonify({"status": "rejected", "reason": "invalid_request"}), 400
+
+    try:
+        result = cards.capture(hold_id, amount)
+    except CardError as e:
+        status = 404 if str(e) == "hold_not_found" else 409
+        return jsonify({"status": "rejected", "reason": str(e)}), status
+
+    return jsonify({
+        "status": "captured",
+        "hold_id": result["hold_id"],
+        "captured": str(result["captured"]),
+        "transaction_id": result["transaction_id"]
+    }), 200
+
+# -------- API Loans --------
+
+@app.route("/api/loans/<int:loan_id>/schedule")
+@read_only
+@jwt_required()
+def api_loan_schedule(loan_id):
+    user_id = int(get_jwt_identity())
+    loan = db.session.get(Loan, loan_id)
+    profile = user_profile(user_id)
+
+    if loan is None or (loan.user_id != user_id and not (profile and profile["is_admin"])):
+        return jsonify({"msg": "Loan not found"}), 404
+
+    return jsonify(loans.loan_schedule(loan))
+
+@app.route("/api/admin/loans/exposure")
+@read_only
+@admin_required
+def admin_loan_exposure():
+    return jsonify(loans.exposure_report(Config.LOAN_EXPOSURE_TTL))
+
+# -------- API Batch Transfer --------
+
+def _batch_items():
+    # JSONL (one transfer per line) or a plain JSON array
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        return [
+            json.loads(line)
+            for line in request.get_data(as_text=True).splitlines()
+            if line.strip()
+        ]
+
+    items = request.get_json()
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array")
+    return items
+
+
+@app.route("/api/transfers/batch", methods=["POST"])
+@jwt_required()
+def api_transfer_batch():
+
+    user_id = int(get_jwt_identity())
+
+    try:
+        items = _batch_items()
+    except ValueError:
+        return jsonify({"msg": "Malformed batch"}), 400
+
+    if not items:
+        return jsonify({"msg": "Empty batch"}), 400
+
+    if len(items) > Config.BATCH_TRANSFER_MAX_ITEMS:
+        return jsonify({"msg": "Batch too large"}), 413
+
+    results = ledger.transfer_batch(
+        user_id,
+        items,
+        max_amount=Config.API_TRANSFER_LIMIT
+    )
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+
+    return jsonify({
+        "succeeded": succeeded,
+        "rejected": len(results) - succeeded,
+        "results": results
+    }), 200
 
 # =============================
 # RUN
@@ -0,0 +1,263 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional: images are fingerprinted but not re-encoded
+    Image = None
+
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".map")
+IMAGES = (".png", ".jpg", ".jpeg")
+IMAGE_WIDTHS = (480, 960, 1600)
+WEBP_QUALITY = 80
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)/static/([^'")]+)\1\s*\)""")
+CSS_BACKGROUND = re.compile(r"""^(\s*)background(?:-image)?\s*:.*url\(\s*['"]?/static/([^'")]+)""")
+
+_manifest = {"files": {}, "images": {}}
+
+
+# =========================
+# BUILD
+# =========================
+
+def _fingerprint(data, relpath):
+    root, ext = os.path.splitext(relpath)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _write(out_dir, relpath, data):
+    path = os.path.join(out_dir, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+    if relpath.endswith(COMPRESSIBLE):
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+
+
+def _emit(out_dir, manifest, relpath, data):
+    hashed = _fingerprint(data, relpath)
+    _write(out_dir, hashed, data)
+    manifest["files"][relpath] = hashed
+    return hashed
+
+
+def _encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(buf, "WEBP", quality=WEBP_QUALITY, method=6)
+    elif fmt == "JPEG":
+        image.convert("RGB").save(buf, "JPEG", quality=82, optimize=True, progressive=True)
+    else:
+        image.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def _build_image(out_dir, manifest, relpath, data):
+    """Optimized original plus WebP and narrower variants of each."""
+    if Image is None:
+        return _emit(out_dir, manifest, relpath, data)
+
+    root, ext = os.path.splitext(relpath)
+    fmt = "PNG" if ext.lower() == ".png" else "JPEG"
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        optimized = _encode(image, fmt)
+        # Re-encoding can lose to an already well-compressed source
+        hashed = _emit(out_dir, manifest, relpath, min(optimized, data, key=len))
+
+        variants = {"width": image.width, "webp": None, "sizes": {}}
+        variants["webp"] = _emit(out_dir, manifest, root + ".webp", _encode(image, "WEBP"))
+
+        for width in IMAGE_WIDTHS:
+            if width >= image.width:
+                continue
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            variants["sizes"][width] = {
+                "original": _emit(out_dir, manifest, f"{root}-{width}w{ext}", _encode(resized, fmt)),
+                "webp": _emit(out_dir, manifest, f"{root}-{width}w.webp", _encode(resized, "WEBP")),
+            }
+
+    manifest["images"][relpath] = variants
+    return hashed
+
+
+def _rewrite_css(css, manifest):
+    """Point ``/static/...`` urls at fingerprinted files and add WebP."""
+    def hashed_url(match):
+        relpath = manifest["files"].get(match.group(2))
+        if relpath is None:
+            return match.group(0)
+        return f'url("/static/{DIST}/{relpath}")'
+
+    lines = []
+    for line in css.splitlines():
+        background = CSS_BACKGROUND.match(line)
+        lines.append(CSS_URL.sub(hashed_url, line))
+
+        variants = background and manifest["images"].get(background.group(2))
+        if variants and variants["webp"]:
+            # Later declaration wins where image-set() is supported;
+            # older browsers drop it and keep the plain url() above
+            original = manifest["files"][background.group(2)]
+            lines.append(
+                f'{background.group(1)}background-image: image-set('
+                f'url("/static/{DIST}/{variants["webp"]}") type("image/webp"), '
+                f'url("/static/{DIST}/{original}") type("{mimetypes.guess_type(original)[0]}"));'
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+def build(static_dir, progress=print):
+    """Fingerprint and precompress ``static_dir`` into ``static_dir/dist``.
+
+    Images go first so stylesheets can be rewritten to their hashed
+    names. Writes ``dist/manifest.json`` mapping logical to hashed paths;
+    returns that manifest.
+    """
+    out_dir = os.path.join(static_dir, DIST)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    manifest = {"files": {}, "images": {}}
+
+    sources = []
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != out_dir]
+        for name in files:
+            path = os.path.join(root, name)
+            sources.append(os.path.relpath(path, static_dir).replace(os.sep, "/"))
+
+    def order(relpath):
+        return (relpath.endswith(".css"), not relpath.lower().endswith(IMAGES), relpath)
+
+    for relpath in sorted(sources, key=order):
+        with open(os.path.join(static_dir, relpath), "rb") as f:
+            data = f.read()
+
+        if relpath.lower().endswith(IMAGES):
+            hashed = _build_image(out_dir, manifest, relpath, data)
+        elif relpath.endswith(".css"):
+            css = _rewrite_css(data.decode("utf-8"), manifest)
+            hashed = _emit(out_dir, manifest, relpath, css.encode("utf-8"))
+        else:
+            hashed = _emit(out_dir, manifest, relpath, data)
+
+        size = os.path.getsize(os.path.join(out_dir, hashed))
+        progress(f"{relpath} -> {DIST}/{hashed} ({len(data):,} -> {size:,} bytes)")
+
+    if brotli is None:
+        progress("brotli not installed; wrote gzip variants only")
+    if Image is None:
+        progress("Pillow not installed; images copied without WebP/resized variants")
+
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return manifest
+
+
+# =========================
+# SERVING
+# =========================
+
+def load_manifest(static_dir):
+    path = os.path.join(static_dir, DIST, MANIFEST)
+    if not os.path.exists(path):
+        return {"files": {}, "images": {}}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def _fingerprinted_url(endpoint, values):
+    # url_for('static', filename='css/base.css') -> dist/css/base.<hash>.css
+    if endpoint != "static":
+        return
+
+    hashed = _manifest["files"].get(values.get("filename"))
+    if hashed is not None:
+        values["filename"] = f"{DIST}/{hashed}"
+
+
+def srcset(filename):
+    """``srcset`` value of the WebP variants of ``filename`` (for <picture>)."""
+    variants = _manifest["images"].get(filename)
+    if not variants:
+        return ""
+
+    entries = [
+        f"/static/{DIST}/{sizes['webp']} {width}w"
+        for width, sizes in sorted(variants["sizes"].items(), key=lambda item: int(item[0]))
+    ]
+    entries.append(f"/static/{DIST}/{variants['webp']} {variants['width']}w")
+    return ", ".join(entries)
+
+
+def _static(filename):
+    static_dir = current_app.static_folder
+
+    if not filename.startswith(DIST + "/"):
+        return current_app.send_static_file(filename)
+
+    # Hashed names never change content: cache for a year, and hand out
+    # the precompressed copy the client accepts
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if accepted[encoding] and os.path.exists(os.path.join(static_dir, filename + suffix)):
+            response = send_from_directory(
+                static_dir, filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0],
+                max_age=31536000
+            )
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(static_dir, filename, max_age=31536000)
+
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_app(app):
+    """Serve ``static/dist`` (if built) and emit fingerprinted static URLs."""
+    _manifest.update(load_manifest(app.static_folder))
+
+    app.url_defaults(_fingerprinted_url)
+    app.view_functions["static"] = _static
+    app.jinja_env.globals["asset_srcset"] = srcset
+
+
+if __name__ == "__main__":
+    # `python assets.py`: same as `flask zenith assets` without importing
+    # the app (whose startup calibrates bcrypt for the current host)
+    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    manifest = build(static_dir)
+    print(f"Done: {len(manifest['files']):,} files in static/{DIST}")
@@ -0,0 +1,103 @@
+"""Shared helpers for the benchmark scripts (app bootstrap and seeding)."""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TX_TYPES = ("Transfer In", "Transfer Out", "API Transfer", "Loan Disbursed", "General")
+
+
+def load_app(database_url, bcrypt_rounds=None):
+    """Import the app pointed at ``database_url``.
+
+    Spend limits and the transfer velocity rule are switched off, so a
+    benchmark measures the routes rather than limit rejections.
+    """
+    import config
+    config.Config.SQLALCHEMY_DATABASE_URI = database_url
+    config.Config.TRANSFER_VELOCITY_LIMIT = ""
+    for scope in ("USER", "CARD", "LOAN"):
+        setattr(config.Config, f"{scope}_DAILY_LIMIT", "0")
+        setattr(config.Config, f"{scope}_MONTHLY_LIMIT", "0")
+    if bcrypt_rounds:
+        config.Config.BCRYPT_LOG_ROUNDS = str(bcrypt_rounds)
+
+    from app import app
+    return app
+
+
+def seed(app, users, cards_per_user, tx_per_user, password="benchpass",
+         opening_balance=Decimal("1000000"), chunk=5000, rng=None):
+    """Drop and recreate the schema, then bulk-load a synthetic dataset.
+
+    Returns the list of seeded usernames (all sharing ``password``).
+    """
+    import stats
+    from models import db, bcrypt, User, Account, VirtualCard, Transaction
+    from sqlutil import copy_rows
+    from summaries import record_transactions
+
+    rng = rng or random.Random(42)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        hashed = bcrypt.generate_password_hash(password).decode("utf-8")
+        connection = db.session.connection()
+
+        copy_rows(connection, User.__table__,
+                  ("id", "username", "email", "password", "is_admin", "created_at"),
+                  ((i, f"bench_{i}", f"bench_{i}@bench.local", hashed, i == 1, now)
+                   for i in range(1, users + 1)))
+
+        copy_rows(connection, Account.__table__,
+                  ("id", "balance", "user_id", "created_at"),
+                  ((i, opening_balance, i, now) for i in range(1, users + 1)))
+
+        copy_rows(connection, VirtualCard.__table__,
+                  ("card_number", "cvv", "balance", "user_id", "created_at"),
+                  ((f"{u:08d}{c:08d}", "123", opening_balance, u, now)
+                   for u in range(1, users + 1) for c in range(cards_per_user)))
+
+        batch = []
+        for user_id in range(1, users + 1):
+            for _ in range(tx_per_user):
+                amount = Decimal(rng.randint(-500, 500) or 1)
+                batch.append({
+                    "amount": amount,
+                    "transaction_type": rng.choice(TX_TYPES),
+                    "description": "seed",
+                    "account_id": user_id,
+                    "virtual_card_id": None,
+                    "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                })
+
+            if len(batch) >= chunk:
+                db.session.execute(db.insert(Transaction), batch)
+                record_transactions(connection, batch)
+                batch = []
+
+        if batch:
+            db.session.execute(db.insert(Transaction), batch)
+            record_transactions(connection, batch)
+
+        db.session.commit()
+
+        if db.engine.dialect.name == "postgresql":
+            for table in ("users", "accounts", "virtual_cards"):
+                db.session.execute(db.text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT MAX(id) FROM {table}))"
+                ))
+            db.session.execute(db.text("ANALYZE"))
+            db.session.commit()
+
+        stats.reconcile()
+
+    return [f"bench_{i}" for i in range(1, users + 1)]
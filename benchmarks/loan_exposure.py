@@ -0,0 +1,152 @@
+"""Loan portfolio exposure benchmark for loans.exposure().
+
+Builds ``--loans`` synthetic loans as column arrays and times the
+vectorized portfolio pass plus every breakdown of the exposure report.
+A sample of loans is re-amortized month by month in plain Python and
+compared against the vectorized balances.
+
+    python benchmarks/loan_exposure.py --loans 1000000
+
+With ``--database-url`` the loans are bulk-loaded into that database
+first and loading them back (``loans.load_portfolio``) is timed too.
+Use a throwaway database: the schema is created and the seeded
+``bench_*`` users are replaced on every run.
+"""
+import argparse
+import json
+import sys
+from datetime import date, datetime
+from time import perf_counter
+
+import numpy as np
+
+from common import ROOT  # noqa: F401  (puts the app on sys.path)
+
+import amortization
+import loans
+
+
+RATES = np.array([0.06, 0.09, 0.12, 0.15, 0.19, 0.24])
+TERMS = np.array([6, 12, 24, 36, 60])
+
+
+def synthetic(n, borrowers, as_of, rng):
+    as_of = np.datetime64(as_of, "D")
+    return (
+        rng.integers(1, borrowers + 1, n),
+        np.round(rng.lognormal(8, 1, n), 2),
+        rng.choice(RATES, n),
+        rng.choice(TERMS, n),
+        as_of - rng.integers(0, 5 * 365, n).astype("timedelta64[D]"),
+    )
+
+
+def reference_balance(principal, annual_rate, term_months, start, as_of):
+    """Month-by-month amortization of one loan (the slow, obvious way)."""
+    r = annual_rate / 12
+    payment = principal / term_months if r == 0 else principal * r / (1 - (1 + r) ** -term_months)
+    balance = principal
+    for k in range(1, term_months + 1):
+        due = amortization.add_months(np.datetime64(start, "D"), k)
+        if due > np.datetime64(as_of, "D"):
+            break
+        balance = 0.0 if k == term_months else balance * (1 + r) - payment
+    return max(balance, 0.0)
+
+
+def check(columns, as_of, sample, rng):
+    _, amount, rate, term, start = columns
+    outstanding = amortization.portfolio(amount, rate, term, start, as_of)["outstanding"]
+    picks = rng.choice(len(amount), min(sample, len(amount)), replace=False)
+    return max(
+        abs(outstanding[i] - reference_balance(amount[i], rate[i], int(term[i]), start[i], as_of))
+        for i in picks
+    ) if len(picks) else 0.0
+
+
+def load(app, columns):
+    from models import db, User, Loan
+    from sqlutil import copy_rows
+
+    user_id, amount, rate, term, start = columns
+    borrowers = int(user_id.max())
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.create_all()
+        bench_users = db.select(User.id).where(User.username.like("bench_%"))
+        db.session.execute(
+            db.delete(Loan).where(Loan.user_id.in_(bench_users))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            db.delete(User).where(User.username.like("bench_%"))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        users = [
+            User(username=f"bench_{i}", email=f"bench_{i}@bench.local", password="x")
+            for i in range(borrowers)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        ids = np.array([u.id for u in users])
+
+        copy_rows(
+            db.session.connection(), Loan.__table__,
+            ("amount", "annual_rate", "term_months", "start_date", "user_id", "created_at"),
+            zip(
+                (f"{a:.2f}" for a in amount), (f"{r:.4f}" for r in rate),
+                term.tolist(), start.tolist(), ids[user_id - 1].tolist(),
+                (now for _ in range(len(amount)))
+            )
+        )
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--borrowers", type=int, default=200_000)
+    parser.add_argument("--as-of", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--check-sample", type=int, default=1000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    columns = synthetic(args.loans, args.borrowers, args.as_of, rng)
+    result = {"loans": args.loans}
+
+    if args.database_url:
+        from common import load_app
+
+        app = load_app(args.database_url)
+        started = perf_counter()
+        load(app, columns)
+        result["seed_s"] = round(perf_counter() - started, 3)
+
+        with app.app_context():
+            started = perf_counter()
+            columns = loans.load_portfolio()
+            result["load_s"] = round(perf_counter() - started, 3)
+
+    started = perf_counter()
+    amortization.portfolio(*columns[1:], args.as_of)
+    result["portfolio_s"] = round(perf_counter() - started, 3)
+
+    started = perf_counter()
+    report = loans.exposure(*columns, args.as_of)
+    result["exposure_s"] = round(perf_counter() - started, 3)
+
+    error = check(columns, args.as_of, args.check_sample, rng)
+    result["max_abs_error_vs_reference"] = float(error)
+    result["outstanding"] = report["outstanding"]
+    result["active_loans"] = report["active_loans"]
+
+    print(json.dumps(result, indent=2))
+    return 0 if error < 0.01 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
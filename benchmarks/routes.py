@@ -0,0 +1,358 @@
+"""Load test for the main web and API routes.
+
+Seeds a synthetic dataset, serves the app (in-process, threaded) or
+targets an already running server, then drives each route at every
+requested concurrency level. Reports p50/p95/p99 latency, throughput,
+error count and SQL statements per request (scraped from /metrics) as
+JSON, and flags regressions against a previous run.
+
+    python benchmarks/routes.py --database-url sqlite:////tmp/zenith_bench.db \\
+        --users 200 --tx-per-user 500 --concurrency 1,8,32 \\
+        --output bench.json --baseline previous.json
+
+Against gunicorn: start it on the same database with the same
+BCRYPT_LOG_ROUNDS and with the spend limits off (TRANSFER_VELOCITY_LIMIT=
+and USER/CARD/LOAN_DAILY/MONTHLY_LIMIT=0), then pass
+``--url http://127.0.0.1:5000``. The
+database is dropped and re-seeded on every run.
+
+``dashboard`` is measured twice: ``dashboard_cold`` with the page cache
+off (every request renders) and ``dashboard`` with it warm (mostly cache
+hits). The cold case needs the in-process server and is skipped with
+``--url``; for gunicorn, run a second pass against a server started
+with PAGE_CACHE_SIZE=0.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import re
+import sys
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from time import perf_counter
+
+from common import load_app, seed
+from config import Config
+
+
+ROUTES = (
+    "login", "dashboard_cold", "dashboard", "history", "transfer", "loan",
+    "api_login", "api_transfer",
+)
+
+# Run with the rendered-page cache (versions.py) switched off, so they
+# measure rendering rather than cache hits; in-process only
+COLD_ROUTES = ("dashboard_cold",)
+
+# Route name -> URL rule label used by /metrics
+RULES = {
+    "login": "/login",
+    "dashboard_cold": "/dashboard",
+    "dashboard": "/dashboard",
+    "history": "/history",
+    "transfer": "/transfer",
+    "loan": "/loan",
+    "api_login": "/api/login",
+    "api_transfer": "/api/transfer",
+}
+
+
+# =========================
+# CLIENT
+# =========================
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """One virtual user with its own cookie jar and JWT."""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.token = None
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect
+        )
+
+    def request(self, method, path, form=None, body=None, headers=None):
+        data = None
+        headers = dict(headers or {})
+
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        req = urllib.request.Request(self.base_url + path, data, headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    # -------- scenarios --------
+
+    def login(self):
+        status, _ = self.request("POST", "/login", form={
+            "username": self.username, "password": self.password
+        })
+        return status == 302
+
+    def dashboard(self):
+        return self.request("GET", "/dashboard")[0] == 200
+
+    dashboard_cold = dashboard
+
+    def history(self):
+        return self.request("GET", "/history")[0] == 200
+
+    def transfer(self, target):
+        status, _ = self.request("POST", "/transfer", form={
+            "target_username": target,
+            "amount": "1",
+            "source": f"account_{self.username.split('_')[1]}",
+        })
+        return status == 302
+
+    def loan(self):
+        status, _ = self.request("POST", "/loan", form={
+            "amount": "1",
+            "term": str(Config.LOAN_TERMS[0]),
+            "target": f"account_{self.username.split('_')[1]}",
+        })
+        return status == 302
+
+    def api_login(self):
+        status, body = self.request("POST", "/api/login", body={
+            "username": self.username, "password": self.password
+        })
+        if status == 200:
+            self.token = json.loads(body)["access_token"]
+        return status == 200
+
+    def api_transfer(self, target):
+        status, _ = self.request(
+            "POST", "/api/transfer",
+            body={"amount": 1, "target_username": target},
+            headers={"Authorization": f"Bearer {self.token}"}
+        )
+        return status == 200
+
+
+# =========================
+# RUNNER
+# =========================
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def scrape_sql(base_url, token=None):
+    """``{rule: (requests, statements)}`` from /metrics."""
+    req = urllib.request.Request(base_url + "/metrics")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    text = urllib.request.urlopen(req, timeout=30).read().decode()
+
+    requests_, statements = defaultdict(float), defaultdict(float)
+    for name, route, value in re.findall(
+        r'^(zenith_requests_total|zenith_sql_statements_total)\{route="([^"]+)"[^}]*\} (\S+)$',
+        text, re.M
+    ):
+        target = requests_ if name == "zenith_requests_total" else statements
+        target[route] += float(value)
+
+    return {r: (requests_[r], statements[r]) for r in requests_}
+
+
+def run_route(route, clients, usernames, requests_total):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    per_client = max(1, requests_total // len(clients))
+
+    def drive(client, offset):
+        nonlocal errors
+        local, failed = [], 0
+
+        for i in range(per_client):
+            target = usernames[(offset + i + 1) % len(usernames)]
+            if target == client.username:
+                target = usernames[(offset + i + 2) % len(usernames)]
+            fn = getattr(client, route)
+            args = (target,) if route in ("transfer", "api_transfer") else ()
+
+            start = perf_counter()
+            try:
+                ok = fn(*args)
+            except OSError:
+                ok = False
+            local.append(perf_counter() - start)
+            failed += not ok
+
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    threads = [
+        threading.Thread(target=drive, args=(client, i))
+        for i, client in enumerate(clients)
+    ]
+
+    started = perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def serve(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def compare(results, baseline, tolerance):
+    """Routes whose p95 or SQL-per-request got worse than ``baseline``."""
+    regressions = []
+
+    for level, routes in results["levels"].items():
+        for route, current in routes.items():
+            previous = baseline.get("levels", {}).get(level, {}).get(route)
+            if not previous:
+                continue
+
+            if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"c={level} {route}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms"
+                )
+
+            before, after = previous.get("sql_per_request"), current.get("sql_per_request")
+            if before is not None and after is not None and after > before:
+                regressions.append(
+                    f"c={level} {route}: SQL/request {before} -> {after}"
+                )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--url", help="Target a running server instead of serving in-process.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--cards-per-user", type=int, default=1)
+    parser.add_argument("--tx-per-user", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,8")
+    parser.add_argument("--requests", type=int, default=200, help="per route and level")
+    parser.add_argument("--routes", default=",".join(ROUTES))
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--metrics-token")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed p95 slowdown vs baseline (fraction).")
+    args = parser.parse_args()
+
+    app = load_app(args.database_url, args.bcrypt_rounds)
+    import versions
+    usernames = seed(app, args.users, args.cards_per_user, args.tx_per_user)
+
+    base_url, server = (args.url, None) if args.url else serve(app)
+    routes = [r for r in args.routes.split(",") if r]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = {
+        "config": {
+            "users": args.users,
+            "tx_per_user": args.tx_per_user,
+            "requests": args.requests,
+            "database": args.database_url.split("://")[0],
+        },
+        "levels": {},
+    }
+
+    for level in levels:
+        clients = [
+            Client(base_url, usernames[i % len(usernames)], "benchpass")
+            for i in range(level)
+        ]
+        for client in clients:
+            client.login()
+            client.api_login()
+
+        results["levels"][str(level)] = {}
+
+        for route in routes:
+            cold = route in COLD_ROUTES
+            if cold and server is None:
+                print(f"c={level:<4} {route:<13} skipped: needs the in-process server",
+                      file=sys.stderr)
+                continue
+
+            cache_size = app.config["PAGE_CACHE_SIZE"]
+            if cold:
+                app.config["PAGE_CACHE_SIZE"] = 0
+                versions.clear_page_cache()
+            try:
+                before = scrape_sql(base_url, args.metrics_token)
+                summary = run_route(route, clients, usernames, args.requests)
+                after = scrape_sql(base_url, args.metrics_token)
+            finally:
+                app.config["PAGE_CACHE_SIZE"] = cache_size
+
+            rule = RULES[route]
+            n0, s0 = before.get(rule, (0, 0))
+            n1, s1 = after.get(rule, (0, 0))
+            summary["sql_per_request"] = round((s1 - s0) / (n1 - n0), 2) if n1 > n0 else None
+
+            results["levels"][str(level)][route] = summary
+            print(f"c={level:<4} {route:<13} {json.dumps(summary)}", file=sys.stderr)
+
+    if server is not None:
+        server.shutdown()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
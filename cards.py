@@ -0,0 +1,287 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+import limits
+from limits import LimitError
+from models import db, CardHold, Transaction, VirtualCard
+
+
+class CardError(Exception):
+    """Declined authorization or rejected capture; ``str()`` is the reason code."""
+
+
+HOLD = "held"
+CAPTURED = "captured"
+EXPIRED = "expired"
+
+SWEEP_BATCH = 1000
+
+
+# =========================
+# AUTHORIZE
+# =========================
+
+def _decline_reason(card_number, cvv):
+    # Slow path only: explain why the guarded UPDATE matched nothing
+    card = db.session.execute(
+        db.select(VirtualCard.cvv).where(VirtualCard.card_number == card_number)
+    ).first()
+
+    if card is None:
+        return "invalid_card"
+    if card.cvv != cvv:
+        return "invalid_cvv"
+    return "insufficient_funds"
+
+
+def _replayed(reference, card_number, amount):
+    # A retried authorization with the same reference gets the same hold
+    hold = db.session.execute(
+        db.select(CardHold.id, CardHold.amount, CardHold.expires_at, VirtualCard.card_number)
+        .join(VirtualCard, VirtualCard.id == CardHold.virtual_card_id)
+        .where(CardHold.reference == reference)
+    ).first()
+
+    if hold is None:
+        return None
+    if hold.card_number != card_number or hold.amount != amount:
+        raise CardError("duplicate_reference")
+
+    return {"hold_id": hold.id, "amount": hold.amount, "expires_at": hold.expires_at}
+
+
+def _give_back(connection, refunds):
+    """Credit ``(user_id, card_id, day, amount, count)`` back to the spend counters.
+
+    Holds count against the limits when authorized, on that day; what is
+    never captured is returned to the same day. User counters are
+    locked before card counters, each by ascending id, as in ledger.py.
+    """
+    totals = {limits.USER: {}, limits.CARD: {}}
+    for user_id, card_id, day, amount, count in refunds:
+        for scope, owner_id in ((limits.USER, user_id), (limits.CARD, card_id)):
+            spent = totals[scope].setdefault((owner_id, day), [0, 0])
+            spent[0] += amount
+            spent[1] += count
+
+    for scope in (limits.USER, limits.CARD):
+        for (owner_id, day), (amount, count) in sorted(totals[scope].items()):
+            limits.record(connection, scope, owner_id, -amount, -count, day=day)
+
+
+def authorize(card_number, cvv, amount, ttl, merchant=None, reference=None):
+    """Reserve ``amount`` on the card, or raise ``CardError``.
+
+    The funds check and the reservation are one guarded UPDATE through
+    the unique ``card_number`` index, so only that card's row is locked
+    and only for the statement, the spend counters and the hold INSERT.
+    The hold counts against the user's and the card's limits from here
+    on (``limit_exceeded`` declines). Returns ``{"hold_id", "amount",
+    "expires_at"}``.
+    """
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+
+    try:
+        card = db.session.execute(
+            db.update(VirtualCard)
+            .where(
+                VirtualCard.card_number == card_number,
+                VirtualCard.cvv == cvv,
+                VirtualCard.balance - VirtualCard.held >= amount
+            )
+            .values(held=VirtualCard.held + amount)
+            .returning(VirtualCard.id, VirtualCard.user_id)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if card is None:
+            db.session.rollback()
+            replay = _replayed(reference, card_number, amount) if reference else None
+            if replay is None:
+                raise CardError(_decline_reason(card_number, cvv))
+            return replay
+
+        # Counters after the card row, user before card, as in ledger.py
+        try:
+            limits.spend(db.session.connection(), card.user_id, amount, card_id=card.id)
+        except LimitError:
+            db.session.rollback()
+            raise CardError("limit_exceeded")
+
+        hold_id = db.session.execute(
+            db.insert(CardHold)
+            .values(
+                virtual_card_id=card.id,
+                amount=amount,
+                status=HOLD,
+                reference=reference,
+                merchant=merchant,
+                created_at=datetime.utcnow(),
+                expires_at=expires_at
+            )
+            .returning(CardHold.id)
+        ).scalar_one()
+
+        db.session.commit()
+
+    except IntegrityError:
+        db.session.rollback()
+        replay = _replayed(reference, card_number, amount) if reference else None
+        if replay is None:
+            raise
+        return replay
+
+    return {"hold_id": hold_id, "amount": amount, "expires_at": expires_at}
+
+
+# =========================
+# CAPTURE
+# =========================
+
+def _capture_error(hold_id, amount):
+    hold = db.session.get(CardHold, hold_id)
+
+    if hold is None:
+        return "hold_not_found"
+    if hold.status != HOLD or hold.expires_at <= datetime.utcnow():
+        return "hold_closed"
+    if amount is not None and amount > hold.amount:
+        return "amount_exceeds_hold"
+    return "hold_closed"
+
+
+def capture(hold_id, amount=None):
+    """Settle a hold for ``amount`` (default: all of it).
+
+    The hold row is claimed with one guarded UPDATE (so a hold can only
+    be captured once), then the card is debited, the rest of the hold is
+    released (and given back to the spend counters) and the ledger row
+    is written, in one transaction.
+    """
+    now = datetime.utcnow()
+
+    try:
+        claim = db.update(CardHold).where(
+            CardHold.id == hold_id,
+            CardHold.status == HOLD,
+            CardHold.expires_at > now
+        )
+        if amount is not None:
+            claim = claim.where(CardHold.amount >= amount)
+
+        hold = db.session.execute(
+            claim
+            .values(
+                status=CAPTURED,
+                captured_amount=CardHold.amount if amount is None else amount
+            )
+            .returning(
+                CardHold.virtual_card_id, CardHold.amount,
+                CardHold.merchant, CardHold.created_at
+            )
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if hold is None:
+            db.session.rollback()
+            raise CardError(_capture_error(hold_id, amount))
+
+        captured = hold.amount if amount is None else amount
+
+        owner_id = db.session.execute(
+            db.update(VirtualCard)
+            .where(VirtualCard.id == hold.virtual_card_id)
+            .values(
+                held=VirtualCard.held - hold.amount,
+                balance=VirtualCard.balance - captured
+            )
+            .returning(VirtualCard.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+
+        # The whole hold was counted at authorization
+        if captured < hold.amount:
+            _give_back(db.session.connection(), [(
+                owner_id, hold.virtual_card_id, hold.created_at.date(),
+                hold.amount - captured, 0
+            )])
+
+        tx = Transaction(
+            amount=-captured,
+            transaction_type="Card Purchase",
+            description=(hold.merchant or "Card purchase")[:200],
+            virtual_card_id=hold.virtual_card_id
+        )
+        db.session.add(tx)
+        db.session.flush()
+        tx_id = tx.id
+        db.session.commit()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {"hold_id": hold_id, "captured": captured, "transaction_id": tx_id}
+
+
+# =========================
+# SWEEPER
+# =========================
+
+def release_expired(batch=SWEEP_BATCH):
+    """Expire lapsed holds and give their funds back; returns the count.
+
+    Works in batches of ``batch`` holds, each its own short transaction.
+    On Postgres, holds locked by an in-flight capture are skipped and
+    picked up on the next run.
+    """
+    released = 0
+
+    while True:
+        now = datetime.utcnow()
+        due = (
+            db.select(CardHold.id)
+            .where(CardHold.status == HOLD, CardHold.expires_at <= now)
+            .order_by(CardHold.id)
+            .limit(batch)
+            .with_for_update(skip_locked=True)
+        )
+
+        try:
+            rows = db.session.execute(
+                db.update(CardHold)
+                .where(CardHold.id.in_(due.scalar_subquery()))
+                .values(status=EXPIRED)
+                .returning(CardHold.virtual_card_id, CardHold.amount, CardHold.created_at)
+                .execution_options(synchronize_session=False)
+            ).all()
+
+            deltas = {}
+            for card_id, amount, _ in rows:
+                deltas[card_id] = deltas.get(card_id, 0) + amount
+
+            if deltas:
+                owners = dict(db.session.execute(
+                    db.update(VirtualCard)
+                    .where(VirtualCard.id.in_(sorted(deltas)))
+                    .values(held=VirtualCard.held - db.case(deltas, value=VirtualCard.id))
+                    .returning(VirtualCard.id, VirtualCard.user_id)
+                    .execution_options(synchronize_session=False)
+                ).all())
+
+                # Never spent, so the authorizations stop counting too
+                _give_back(db.session.connection(), [
+                    (owners[card_id], card_id, created_at.date(), amount, 1)
+                    for card_id, amount, created_at in rows
+                ])
+
+            db.session.commit()
+
+        except Exception:
+            db.session.rollback()
+            raise
+
+        released += len(rows)
+        if len(rows) < batch:
+            return released
@@ -0,0 +1,285 @@
+import json
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+import assets
+import cards
+import eod as eod_batch
+import stats
+from importer import import_users as run_import
+import loans
+from models import db, bcrypt
+import outbox as outbox_events
+import partitions as parts
+import reconciliation
+import seeding
+import summaries
+
+
+zenith = AppGroup("zenith", help="Zenith Bank maintenance commands.")
+
+
+# -------- Statistics --------
+
+@zenith.command("reconcile-stats")
+def reconcile_stats():
+    """Rebuild the admin statistics counters from the source tables."""
+    totals = stats.reconcile()
+
+    for name, value in totals.items():
+        click.echo(f"{name}: {value}")
+
+
+@zenith.command("reconcile-balances")
+@click.option("--report", type=click.Path(dir_okay=False, writable=True), help="Write discrepancies as CSV.")
+@click.option("--chunk-size", type=int, help="Sources per chunk (default: RECONCILE_CHUNK_SIZE).")
+@click.option("--workers", type=int, help="Worker processes (default: CPU count).")
+@click.option("--full", is_flag=True, help="Drop the watermarks and recompute from scratch.")
+def reconcile_balances(report, chunk_size, workers, full):
+    """Check account and card balances against their transactions.
+
+    Only transactions added since the last run are read. Exits with
+    status 1 when any balance disagrees with its ledger.
+    """
+    config = current_app.config
+    checked, folded, discrepancies = reconciliation.run(
+        db.engine.url.render_as_string(hide_password=False),
+        settle_seconds=config["RECONCILE_SETTLE_SECONDS"],
+        chunk_size=chunk_size or config["RECONCILE_CHUNK_SIZE"],
+        workers=workers,
+        full=full,
+        progress=click.echo
+    )
+
+    if report:
+        reconciliation.write_report(report, discrepancies)
+
+    for kind, source_id, balance, ledger, difference in discrepancies[:20]:
+        click.echo(f"  {kind} {source_id}: balance {balance} != ledger {ledger} ({difference:+})")
+    if len(discrepancies) > 20:
+        click.echo(f"  ... {len(discrepancies) - 20:,} more" + (f" in {report}" if report else ""))
+
+    click.echo(f"Done: {checked:,} balances, {folded:,} new transactions, {len(discrepancies):,} discrepancies")
+    if discrepancies:
+        raise SystemExit(1)
+
+
+# -------- Bulk onboarding --------
+
+@zenith.command("import-users")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults from the file extension.")
+@click.option("--chunk-size", default=5000, show_default=True)
+@click.option("--workers", type=int, help="Hashing processes (default: CPU count).")
+@click.option("--opening-balance", default="1000", show_default=True)
+@click.option("--resume", is_flag=True, help="Continue after the last committed chunk.")
+def import_users(path, fmt, chunk_size, workers, opening_balance, resume):
+    """Bulk-import users (username, email, password) from CSV or JSONL."""
+    imported, skipped = run_import(
+        path,
+        current_app.config["BCRYPT_LOG_ROUNDS"],
+        fmt=fmt,
+        chunk_size=chunk_size,
+        workers=workers,
+        opening_balance=Decimal(opening_balance),
+        resume=resume,
+        progress=click.echo
+    )
+
+    click.echo(f"Done: {imported:,} imported, {skipped:,} skipped")
+
+
+# -------- Synthetic data --------
+
+@zenith.command("seed")
+@click.option("--users", default=10_000, show_default=True)
+@click.option("--transactions", default=1_000_000, show_default=True, help="Approximate total.")
+@click.option("--years", default=5, show_default=True, help="Spread of created_at values.")
+@click.option("--chunk-users", default=10_000, show_default=True)
+@click.option("--workers", type=int, help="Generator processes (default: CPU count).")
+@click.option("--seed", "random_seed", default=1, show_default=True)
+def seed(users, transactions, years, chunk_users, workers, random_seed):
+    """Generate a large synthetic dataset via COPY (password: seedpass)."""
+    totals = seeding.seed(
+        db.engine.url.render_as_string(hide_password=False),
+        users,
+        transactions,
+        bcrypt.generate_password_hash(seeding.SEED_PASSWORD).decode("utf-8"),
+        years=years,
+        chunk_users=chunk_users,
+        workers=workers,
+        random_seed=random_seed,
+        progress=click.echo
+    )
+
+    click.echo("Done: {:,} users, {:,} cards, {:,} loans, {:,} transactions".format(*totals))
+
+
+@zenith.command("rebuild-summaries")
+def rebuild_summaries():
+    """Recompute the dashboard monthly summaries from the ledger."""
+    summaries.rebuild()
+    click.echo("Monthly summaries rebuilt")
+
+
+# -------- Card holds --------
+
+@zenith.command("sweep-holds")
+@click.option("--every", type=float, help="Keep running, sweeping every N seconds.")
+def sweep_holds(every):
+    """Release expired card authorization holds."""
+    while True:
+        released = cards.release_expired()
+        click.echo(f"Released {released:,} expired holds")
+
+        if not every:
+            return
+        time.sleep(every)
+
+
+# -------- Static assets --------
+
+@zenith.command("assets")
+def build_assets():
+    """Fingerprint, precompress and optimize static/ into static/dist."""
+    manifest = assets.build(current_app.static_folder, progress=click.echo)
+    click.echo(f"Done: {len(manifest['files']):,} files in static/{assets.DIST}")
+
+
+# -------- End of day --------
+
+@zenith.command("eod")
+@click.option("--date", "business_date", type=click.DateTime(formats=["%Y-%m-%d"]), help="Business date (default: today, UTC).")
+@click.option("--chunk-size", type=int, help="Accounts per chunk (default: EOD_CHUNK_SIZE).")
+@click.option("--workers", type=int, help="Worker processes (default: CPU count).")
+def eod(business_date, chunk_size, workers):
+    """Post daily interest and monthly fees to every account.
+
+    Safe to rerun: chunks already done for the date are skipped.
+    """
+    config = current_app.config
+    business_date = business_date.date() if business_date else datetime.utcnow().date()
+
+    try:
+        chunks, postings = eod_batch.run(
+            db.engine.url.render_as_string(hide_password=False),
+            business_date,
+            config["EOD_INTEREST_RATE"],
+            monthly_fee=Decimal(config["EOD_MONTHLY_FEE"]),
+            fee_waiver_balance=Decimal(config["EOD_FEE_WAIVER_BALANCE"]),
+            fee_day=config["EOD_FEE_DAY"],
+            chunk_size=chunk_size or config["EOD_CHUNK_SIZE"],
+            workers=workers,
+            progress=click.echo
+        )
+    except eod_batch.EodError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"Done: {chunks:,} chunks, {postings:,} postings for {business_date}")
+
+
+# -------- Outbox --------
+
+@zenith.command("outbox-worker")
+@click.option("--batch-size", type=int, help="Events per claim (default: OUTBOX_BATCH_SIZE).")
+@click.option("--concurrency", type=int, help="Deliveries in flight (default: OUTBOX_CONCURRENCY).")
+@click.option("--poll", default=1.0, show_default=True, help="Seconds to wait when nothing is due.")
+@click.option("--once", is_flag=True, help="Exit once no events are due.")
+def outbox_worker(batch_size, concurrency, poll, once):
+    """Deliver queued outbox events to their consumers.
+
+    Run as many as needed; workers claim disjoint batches.
+    """
+    config = current_app.config
+    if not outbox_events.CONSUMERS:
+        click.echo("No consumers configured; events will be dropped as delivered")
+
+    delivered, retried, failed = outbox_events.run(
+        db.engine,
+        batch_size=batch_size or config["OUTBOX_BATCH_SIZE"],
+        concurrency=concurrency or config["OUTBOX_CONCURRENCY"],
+        lease=config["OUTBOX_LEASE_SECONDS"],
+        max_attempts=config["OUTBOX_MAX_ATTEMPTS"],
+        backoff_base=config["OUTBOX_BACKOFF_BASE"],
+        backoff_max=config["OUTBOX_BACKOFF_MAX"],
+        poll=poll,
+        once=once,
+        progress=click.echo
+    )
+
+    click.echo(f"Done: {delivered:,} delivered, {retried:,} retrying, {failed:,} failed")
+
+
+@zenith.command("outbox-requeue")
+def outbox_requeue():
+    """Retry every outbox event that ran out of attempts."""
+    click.echo(f"Requeued {outbox_events.requeue_failed():,} events")
+
+
+# -------- Loans --------
+
+@zenith.command("loan-exposure")
+@click.option("--as-of", type=click.DateTime(formats=["%Y-%m-%d"]), help="Defaults to today (UTC).")
+def loan_exposure(as_of):
+    """Print the loan portfolio exposure report as JSON."""
+    started = time.perf_counter()
+    columns = loans.load_portfolio()
+    report = loans.exposure(*columns, as_of.date() if as_of else datetime.utcnow().date())
+
+    click.echo(json.dumps(report, indent=2))
+    click.echo(f"{report['loans']:,} loans in {time.perf_counter() - started:.2f}s", err=True)
+
+
+# -------- Partitions --------
+
+partitions = AppGroup("partitions", help="Monthly transactions partitions (Postgres).")
+zenith.add_command(partitions)
+
+
+@partitions.command("list")
+def list_partitions():
+    """Show each monthly partition, its range and tablespace."""
+    try:
+        rows = parts.list_partitions()
+    except parts.PartitionError as e:
+        raise click.ClickException(str(e))
+
+    for name, lower, upper, tablespace in rows:
+        click.echo(f"{name}: [{lower}, {upper}) {tablespace or 'pg_default'}")
+
+
+@partitions.command("ensure")
+@click.option("--months-ahead", default=3, show_default=True)
+def ensure_partitions(months_ahead):
+    """Create missing partitions for the coming months (run from cron).
+
+    Also partitions any past months whose rows sit in the DEFAULT partition.
+    """
+    try:
+        created = parts.ensure_partitions(months_ahead)
+    except parts.PartitionError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"Created: {', '.join(created)}" if created else "Partitions up to date")
+
+
+@partitions.command("archive")
+@click.option("--older-than", "older_than", type=int, required=True, help="Months to keep online.")
+@click.option("--tablespace", help="Move old partitions and their indexes here.")
+@click.option("--detach", is_flag=True, help="Detach old partitions from transactions.")
+def archive_partitions(older_than, tablespace, detach):
+    """Move old partitions to cheaper storage and/or detach them."""
+    if not tablespace and not detach:
+        raise click.UsageError("Pass --tablespace and/or --detach")
+
+    try:
+        touched = parts.archive_partitions(older_than, tablespace=tablespace, detach=detach)
+    except parts.PartitionError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"Archived: {', '.join(touched)}" if touched else "Nothing to archive")
@@ -0,0 +1,151 @@
+import logging
+import os
+from time import perf_counter
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+import metrics
+
+
+logger = logging.getLogger("zenith.engines")
+
+PROFILES = ("direct", "pgbouncer")
+
+
+# =========================
+# INSTRUMENTED POOL
+# =========================
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports checkout wait, overflow use and timeouts."""
+
+    def _do_get(self):
+        overflow = self._overflow
+        started = perf_counter()
+        timed_out = False
+
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            timed_out = True
+            raise
+        finally:
+            metrics.record_pool_checkout(
+                self.logging_name or "default",
+                perf_counter() - started,
+                overflow=self._overflow > max(overflow, 0),
+                timed_out=timed_out
+            )
+
+
+# =========================
+# ENGINE PROFILES
+# =========================
+
+def database_url(url):
+    # docker/Heroku style URLs use the scheme SQLAlchemy 1.4+ rejects
+    if url and url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def pool_sizing(config):
+    """``(pool_size, max_overflow)`` for one worker process.
+
+    Each request thread holds at most one connection per engine, so the
+    steady pool is one per thread; overflow takes whatever is left of the
+    server's connection budget once every worker has its steady pool.
+    """
+    workers = max(1, config["WEB_WORKERS"])
+    budget = max(1, config["DB_MAX_CONNECTIONS"] - config["DB_RESERVED_CONNECTIONS"])
+    per_worker = max(1, budget // workers)
+
+    pool_size = config["DB_POOL_SIZE"] or config["WEB_THREADS"]
+    if pool_size > per_worker:
+        logger.warning(
+            "DB pool of %d x %d workers exceeds the %d-connection budget; using %d",
+            pool_size, workers, budget, per_worker
+        )
+        pool_size = per_worker
+
+    max_overflow = config["DB_MAX_OVERFLOW"]
+    if max_overflow is None:
+        max_overflow = per_worker - pool_size
+
+    return pool_size, max_overflow
+
+
+def engine_options(url, name, config):
+    """SQLAlchemy ``create_engine`` options for ``url`` under DB_PROFILE."""
+    url = make_url(url)
+    options = {"pool_logging_name": name}
+
+    if url.get_backend_name() == "sqlite":
+        if url.database and url.database != ":memory:":
+            options["poolclass"] = TimedQueuePool
+        return options
+
+    profile = config["DB_PROFILE"]
+    if profile not in PROFILES:
+        raise ValueError(f"DB_PROFILE must be one of {', '.join(PROFILES)}")
+
+    pool_size, max_overflow = pool_sizing(config)
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+        pool_pre_ping=config["DB_POOL_PRE_PING"],
+        connect_args={"application_name": config["DB_APPLICATION_NAME"]},
+    )
+
+    if profile == "pgbouncer":
+        # Transaction pooling: consecutive transactions may run on different
+        # server connections, so nothing may outlive a transaction. psycopg2
+        # never prepares; newer drivers must be told not to.
+        if url.get_driver_name() == "psycopg":
+            options["connect_args"]["prepare_threshold"] = None
+        elif url.get_driver_name() == "asyncpg":
+            options["connect_args"]["statement_cache_size"] = 0
+
+    return options
+
+
+def configure(config):
+    """Fill SQLALCHEMY_ENGINE_OPTIONS / SQLALCHEMY_BINDS from the profile."""
+    config["SQLALCHEMY_DATABASE_URI"] = database_url(config["SQLALCHEMY_DATABASE_URI"])
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **engine_options(config["SQLALCHEMY_DATABASE_URI"], "primary", config),
+        **config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+    }
+
+    binds = {}
+    for key, value in config.get("SQLALCHEMY_BINDS", {}).items():
+        if isinstance(value, str):
+            value = database_url(value)
+            value = {"url": value, **engine_options(value, key, config)}
+        binds[key] = value
+    config["SQLALCHEMY_BINDS"] = binds
+
+
+# =========================
+# FORK SAFETY
+# =========================
+
+def init_app(app, db):
+    """Drop inherited pool connections in forked children (gunicorn --preload).
+
+    ``close=False`` leaves the parent's sockets alone; the child simply
+    starts with empty pools and opens its own connections.
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    def reset_pools():
+        for engine in engines:
+            engine.dispose(close=False)
+
+    os.register_at_fork(after_in_child=reset_pools)
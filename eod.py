@@ -0,0 +1,260 @@
+import calendar
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time
+from decimal import Decimal
+from time import perf_counter
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.types import Numeric
+
+import stats
+from models import db, Account, EodCheckpoint, Transaction
+from summaries import record_postings
+
+
+class EodError(Exception):
+    """An end-of-day run can't proceed as requested."""
+
+
+INTEREST = "Interest"
+FEE = "Fee"
+
+TX_COLUMNS = (
+    "amount", "transaction_type", "description",
+    "account_id", "virtual_card_id", "created_at",
+)
+
+
+# =========================
+# POLICY
+# =========================
+
+def fee_due(business_date, fee_day):
+    """Monthly fees fall on ``fee_day``, or the month's last day if shorter."""
+    last_day = calendar.monthrange(business_date.year, business_date.month)[1]
+    return business_date.day == min(fee_day, last_day)
+
+
+def _interest(lo, hi, daily_rate):
+    # Whole cents only; balances too small to earn a cent today earn nothing
+    amount = db.func.round(Account.balance * db.literal(daily_rate, Numeric(20, 12)), 2)
+    return (
+        db.select(Account.id, amount.label("amount"))
+        .where(Account.id.between(lo, hi), Account.balance > 0, amount > 0)
+    )
+
+
+def _fee(lo, hi, fee, waiver_balance):
+    # Never takes an account below zero; balances at or above the waiver are exempt
+    where = [Account.id.between(lo, hi), Account.balance >= fee]
+    if waiver_balance:
+        where.append(Account.balance < waiver_balance)
+
+    return db.select(Account.id, db.literal(-fee, Numeric(12, 2)).label("amount")).where(*where)
+
+
+# =========================
+# CHUNK (worker process)
+# =========================
+
+def _lock_range(connection, lo, hi):
+    # Same global order as ledger.lock_rows (accounts by ascending id), so
+    # a chunk never deadlocks against a transfer
+    if connection.dialect.name == "sqlite":
+        connection.execute(
+            db.update(Account).where(Account.id.between(lo, hi)).values(id=Account.id)
+        )
+        return
+
+    connection.execute(
+        db.select(Account.id)
+        .where(Account.id.between(lo, hi))
+        .order_by(Account.id)
+        .with_for_update()
+    ).all()
+
+
+def _post(connection, postings, tx_type, description, posted_at):
+    """Apply one set of ``(account_id, amount)`` postings.
+
+    The ledger rows go in with one INSERT ... SELECT and the balances
+    move with one UPDATE ... FROM, last, since every statement
+    re-evaluates ``postings`` against the (locked) balances. No ORM
+    flush hook sees these statements, so ``record_postings`` folds every
+    pass (interest and fee alike) into the summaries and bumps the
+    owners' ledger versions here. Returns ``(rows, total)``.
+    """
+    p = postings.subquery()
+    count, total = connection.execute(
+        db.select(db.func.count(), db.func.coalesce(db.func.sum(p.c.amount), 0))
+    ).one()
+    if not count:
+        return 0, Decimal("0")
+
+    connection.execute(
+        db.insert(Transaction).from_select(
+            TX_COLUMNS,
+            db.select(
+                p.c.amount,
+                db.literal(tx_type, db.String),
+                db.literal(description, db.String),
+                p.c.id,
+                db.null(),
+                db.literal(posted_at, db.DateTime)
+            )
+        )
+    )
+    record_postings(connection, postings, tx_type, posted_at)
+
+    connection.execute(
+        db.update(Account)
+        .where(Account.id == p.c.id)
+        .values(balance=Account.balance + p.c.amount)
+    )
+
+    return count, Decimal(str(total))
+
+
+def _run_chunk(task):
+    """Post interest and fees for accounts ``lo..hi`` in one transaction.
+
+    Runs in a worker process with its own engine. The checkpoint row is
+    inserted in the same transaction, so a chunk is applied exactly once:
+    a crash rolls it back, a duplicate run fails on the checkpoint key.
+    Returns ``(lo, postings)``.
+    """
+    database_url, business_date, lo, hi, daily_rate, fee = task
+    posted_at = datetime.combine(business_date, time(23, 59, 59))
+    engine = create_engine(database_url)
+
+    try:
+        with engine.begin() as connection:
+            _lock_range(connection, lo, hi)
+
+            n_interest, interest = _post(
+                connection, _interest(lo, hi, daily_rate),
+                INTEREST, f"Daily interest {business_date.isoformat()}", posted_at
+            )
+
+            n_fees, fees = 0, Decimal("0")
+            if fee is not None:
+                n_fees, fees = _post(
+                    connection, _fee(lo, hi, *fee),
+                    FEE, f"Monthly maintenance fee {business_date:%Y-%m}", posted_at
+                )
+
+            stats.bump(connection, transactions=n_interest + n_fees, balance=interest + fees)
+
+            connection.execute(db.insert(EodCheckpoint).values(
+                business_date=business_date,
+                first_id=lo,
+                last_id=hi,
+                postings=n_interest + n_fees,
+                finished_at=datetime.utcnow()
+            ))
+
+    except IntegrityError:
+        # Another run finished this chunk first; anything else is a real error
+        with engine.connect() as connection:
+            done = connection.execute(
+                db.select(EodCheckpoint.first_id)
+                .where(EodCheckpoint.business_date == business_date, EodCheckpoint.first_id == lo)
+            ).first()
+        if done is None:
+            raise
+        return lo, 0
+
+    finally:
+        engine.dispose()
+
+    return lo, n_interest + n_fees
+
+
+# =========================
+# DRIVER
+# =========================
+
+def _pending_ranges(business_date, chunk_size):
+    """``(lo, hi)`` account-id ranges of ``business_date`` not yet checkpointed."""
+    first, last = db.session.execute(
+        db.select(db.func.min(Account.id), db.func.max(Account.id))
+    ).one()
+    if first is None:
+        return []
+
+    done = dict(db.session.execute(
+        db.select(EodCheckpoint.first_id, EodCheckpoint.last_id)
+        .where(EodCheckpoint.business_date == business_date)
+    ).all())
+
+    ranges = []
+    # Boundaries are multiples of chunk_size so a resumed run lines up
+    for lo in range(first - first % chunk_size, last + 1, chunk_size):
+        hi = lo + chunk_size - 1
+        if done.get(lo) == hi:
+            continue
+        if any(d_lo <= hi and lo <= d_hi for d_lo, d_hi in done.items()):
+            raise EodError(
+                f"{business_date} was partly processed with a different chunk "
+                f"size; resume with the original --chunk-size"
+            )
+        ranges.append((lo, hi))
+
+    return ranges
+
+
+def run(database_url, business_date, annual_rate, monthly_fee=Decimal("0"),
+        fee_waiver_balance=Decimal("0"), fee_day=1, chunk_size=50_000,
+        workers=None, progress=print):
+    """End-of-day processing of every account for ``business_date``.
+
+    Interest (``annual_rate`` / 365 on positive balances) is posted
+    daily; ``monthly_fee`` on the fee day. Account-id ranges of
+    ``chunk_size`` are processed in parallel by a process pool, each as
+    one set-based transaction. Chunks already checkpointed for
+    ``business_date`` are skipped, so rerunning after a crash resumes
+    and rerunning after success is a no-op. Returns
+    ``(chunks, postings)``.
+    """
+    if database_url.startswith("sqlite"):
+        # One writer at a time is all SQLite allows
+        workers = 1
+
+    daily_rate = Decimal(annual_rate) / 365
+    fee = None
+    if Decimal(monthly_fee) > 0 and fee_due(business_date, fee_day):
+        fee = (Decimal(monthly_fee), Decimal(fee_waiver_balance))
+
+    ranges = _pending_ranges(business_date, chunk_size)
+    db.session.commit()
+
+    if not ranges:
+        progress(f"{business_date}: nothing to do")
+        return 0, 0
+
+    progress(
+        f"{business_date}: {len(ranges):,} chunks of {chunk_size:,} accounts"
+        + (", monthly fee due" if fee else "")
+    )
+
+    tasks = [
+        (database_url, business_date, lo, hi, daily_rate, fee)
+        for lo, hi in ranges
+    ]
+    chunks = postings = 0
+    started = perf_counter()
+
+    with ProcessPoolExecutor(workers) as pool:
+        for future in as_completed(pool.submit(_run_chunk, t) for t in tasks):
+            lo, rows = future.result()
+            chunks += 1
+            postings += rows
+
+            elapsed = perf_counter() - started
+            progress(
+                f"{chunks:,}/{len(tasks):,} chunks, {postings:,} postings "
+                f"({postings / elapsed:,.0f} rows/s)"
+            )
+
+    return chunks, postings
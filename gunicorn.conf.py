@@ -0,0 +1,6 @@
+import os
+
+# Read by config.py too, so DB pools are sized for this many workers/threads
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
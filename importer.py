@@ -0,0 +1,202 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from time import perf_counter
+
+import bcrypt as _bcrypt
+
+from models import db, User, Account, Transaction
+from sqlutil import copy_rows
+from stats import bump
+from summaries import record_transactions
+
+
+USER_COLUMNS = ("username", "email", "password", "is_admin", "created_at")
+ACCOUNT_COLUMNS = ("balance", "user_id", "created_at")
+TX_COLUMNS = (
+    "amount", "transaction_type", "description",
+    "account_id", "virtual_card_id", "created_at",
+)
+
+
+# =========================
+# INPUT
+# =========================
+
+def read_records(path, fmt=None):
+    """Stream ``{"username", "email", "password"}`` dicts from CSV or JSONL."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# =========================
+# CHECKPOINT
+# =========================
+
+def _checkpoint_path(path):
+    return path + ".progress"
+
+
+def read_checkpoint(path):
+    try:
+        with open(_checkpoint_path(path)) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, rows_done):
+    tmp = _checkpoint_path(path) + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(str(rows_done))
+    os.replace(tmp, _checkpoint_path(path))
+
+
+# =========================
+# HASHING (process pool)
+# =========================
+
+def _hash_one(args):
+    password, rounds = args
+    salt = _bcrypt.gensalt(rounds=rounds)
+    return _bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+
+
+# =========================
+# LOAD
+# =========================
+
+def _clean(records):
+    valid = []
+    for r in records:
+        username = str(r.get("username") or "").strip()
+        email = str(r.get("email") or "").strip()
+        password = str(r.get("password") or "").strip()
+
+        # Same rules as register()
+        if not username or not email or len(password) < 6:
+            continue
+
+        valid.append((username, email, password))
+    return valid
+
+
+def _drop_duplicates(rows, seen_usernames, seen_emails):
+    """Remove rows clashing with the file so far or with existing users."""
+    usernames = [u for u, _, _ in rows]
+    emails = [e for _, e, _ in rows]
+
+    taken_usernames = set(db.session.scalars(
+        db.select(User.username).where(User.username.in_(usernames))
+    ))
+    taken_emails = set(db.session.scalars(
+        db.select(User.email).where(User.email.in_(emails))
+    ))
+
+    kept = []
+    for username, email, password in rows:
+        if (username in taken_usernames or username in seen_usernames
+                or email in taken_emails or email in seen_emails):
+            continue
+        seen_usernames.add(username)
+        seen_emails.add(email)
+        kept.append((username, email, password))
+
+    return kept
+
+
+def import_users(path, rounds, fmt=None, chunk_size=5000, workers=None,
+                 opening_balance=Decimal("1000"), resume=False, progress=print):
+    """Load users plus their starting account from ``path``.
+
+    Each chunk is de-duplicated against the ``users`` indexes in bulk,
+    hashed in a process pool and COPY'd in one DB transaction; the
+    checkpoint advances only after the chunk commits, so ``resume``
+    picks up at the first uncommitted chunk.
+    """
+    start_at = read_checkpoint(path) if resume else 0
+    done = start_at
+    imported = skipped = 0
+    seen_usernames, seen_emails = set(), set()
+    started = perf_counter()
+
+    records = islice(read_records(path, fmt), start_at, None)
+
+    with ProcessPoolExecutor(workers) as pool:
+        for chunk in _chunks(records, chunk_size):
+            rows = _clean(chunk)
+            rows = _drop_duplicates(rows, seen_usernames, seen_emails)
+            skipped += len(chunk) - len(rows)
+
+            hashes = list(pool.map(
+                _hash_one,
+                [(password, rounds) for _, _, password in rows],
+                chunksize=64
+            ))
+
+            now = datetime.utcnow()
+            connection = db.session.connection()
+
+            copy_rows(connection, User.__table__, USER_COLUMNS, (
+                (username, email, hashed, False, now)
+                for (username, email, _), hashed in zip(rows, hashes)
+            ))
+
+            ids = db.session.scalars(
+                db.select(User.id).where(User.username.in_([u for u, _, _ in rows]))
+            ).all()
+
+            copy_rows(connection, Account.__table__, ACCOUNT_COLUMNS, (
+                (opening_balance, user_id, now) for user_id in ids
+            ))
+
+            # Opening deposits keep every balance equal to its ledger sum
+            account_ids = db.session.scalars(
+                db.select(Account.id).where(Account.user_id.in_(ids))
+            ).all()
+            deposits = [
+                dict(zip(TX_COLUMNS, (opening_balance, "General", "Opening deposit", account_id, None, now)))
+                for account_id in account_ids
+            ]
+            copy_rows(connection, Transaction.__table__, TX_COLUMNS, (tuple(d.values()) for d in deposits))
+            record_transactions(connection, deposits)
+
+            bump(
+                connection,
+                users=len(ids),
+                transactions=len(deposits),
+                balance=opening_balance * len(ids)
+            )
+            db.session.commit()
+
+            done += len(chunk)
+            imported += len(ids)
+            write_checkpoint(path, done)
+
+            elapsed = perf_counter() - started
+            progress(
+                f"{done:,} rows read, {imported:,} imported, {skipped:,} skipped "
+                f"({imported / elapsed:,.0f} users/s)"
+            )
+
+    return imported, skipped
@@ -0,0 +1,377 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import limits
+import outbox
+from limits import LimitError
+from models import db, User, Account, Transaction, VirtualCard
+from stats import bump
+from summaries import record_transactions
+
+
+class TransferError(Exception):
+    """A transfer was rejected; the message is safe to show the user."""
+
+
+SOURCE_MODELS = {
+    "account": Account,
+    "vcard": VirtualCard,
+}
+
+# Global lock order: every caller locks accounts before cards, each in
+# ascending id order, so two transfers can never wait on each other in a cycle
+LOCK_ORDER = (Account, VirtualCard)
+
+
+def parse_amount(raw):
+    try:
+        amount = Decimal(str(raw))
+    except (InvalidOperation, ValueError):
+        raise TransferError("Invalid amount")
+
+    if not amount.is_finite() or amount <= 0:
+        raise TransferError("Invalid amount")
+
+    return amount.quantize(Decimal("0.01"))
+
+
+def parse_source(raw):
+    """``"account_3"`` / ``"vcard_7"`` -> ``(model, id)``."""
+    if not isinstance(raw, str):
+        raise TransferError("Invalid source")
+
+    try:
+        source_type, source_id = raw.split("_")
+        return SOURCE_MODELS[source_type], int(source_id)
+    except (KeyError, ValueError):
+        raise TransferError("Invalid source")
+
+
+def format_source(model, row_id):
+    """``(model, id)`` -> ``"account_3"`` / ``"vcard_7"``."""
+    kind = next(k for k, m in SOURCE_MODELS.items() if m is model)
+    return f"{kind}_{row_id}"
+
+
+def primary_account_id(user_id):
+    return db.session.query(Account.id).filter_by(
+        user_id=user_id
+    ).order_by(Account.id).limit(1).scalar()
+
+
+def lock_rows(refs):
+    """SELECT ... FOR UPDATE every ``(model, id)`` in the global lock order.
+
+    Returns ``{(model, id): row}``.
+    """
+    locked = {}
+    sqlite = db.session.get_bind().dialect.name == "sqlite"
+
+    for model in LOCK_ORDER:
+        ids = sorted({i for m, i in refs if m is model})
+        if not ids:
+            continue
+
+        if sqlite:
+            # SQLite ignores FOR UPDATE; a no-op write takes the database
+            # write lock first so the read below can't go stale
+            db.session.execute(
+                db.update(model).where(model.id.in_(ids)).values(id=model.id)
+            )
+
+        rows = db.session.execute(
+            db.select(model)
+            .where(model.id.in_(ids))
+            .order_by(model.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalars()
+
+        locked.update({(model, row.id): row for row in rows})
+
+    return locked
+
+
+def _available(row):
+    # Card funds under an authorization hold can't be moved (see cards.py)
+    return row.available if isinstance(row, VirtualCard) else row.balance
+
+
+def _fk(model, row_id):
+    if model is VirtualCard:
+        return {"virtual_card_id": row_id}
+    return {"account_id": row_id}
+
+
+def transfer(user_id, source, amount, target_account_id=None,
+             description_out="Transfer", description_in="Transfer",
+             type_out="Transfer Out", type_in="Transfer In"):
+    """Move ``amount`` from the user's ``source`` to ``target_account_id``.
+
+    ``source`` is a ``(model, id)`` pair owned by ``user_id``. Without a
+    target the source is only debited. Both balance updates, both ledger
+    rows, the spend counters (see limits.py) and the outbox event for
+    the side effects (see outbox.py) are committed as one transaction;
+    on any error the transaction is rolled back and ``TransferError`` is
+    raised.
+    """
+    source_model, source_id = source
+    refs = [source]
+    target = (Account, target_account_id) if target_account_id is not None else None
+
+    if target is not None:
+        if target == source:
+            raise TransferError("Cannot transfer to the same account")
+        refs.append(target)
+
+    try:
+        limits.check_velocity(user_id)
+
+        locked = lock_rows(refs)
+        sender = locked.get(source)
+
+        if sender is None or sender.user_id != user_id:
+            raise TransferError("Invalid source")
+
+        if _available(sender) < amount:
+            raise TransferError("Insufficient funds")
+
+        limits.spend(
+            db.session.connection(),
+            user_id,
+            amount,
+            card_id=source_id if source_model is VirtualCard else None
+        )
+
+        sender.balance -= amount
+        db.session.add(Transaction(
+            amount=-amount,
+            transaction_type=type_out,
+            description=description_out,
+            **_fk(source_model, source_id)
+        ))
+
+        if target is not None:
+            receiver = locked.get(target)
+            if receiver is None:
+                raise TransferError("Target account not found")
+
+            receiver.balance += amount
+            db.session.add(Transaction(
+                amount=amount,
+                transaction_type=type_in,
+                description=description_in,
+                account_id=receiver.id
+            ))
+
+        outbox.publish(outbox.TRANSFER, {
+            "user_id": user_id,
+            "source": format_source(source_model, source_id),
+            "target_account_id": target_account_id,
+            "amount": str(amount),
+            "transaction_type": type_out,
+            "description": description_out,
+        })
+
+        db.session.commit()
+
+    except LimitError as e:
+        db.session.rollback()
+        raise TransferError(str(e))
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+# =========================
+# BATCH TRANSFERS
+# =========================
+
+def _set_balances(model, deltas):
+    """One set-based UPDATE applying ``{id: delta}`` to ``model.balance``."""
+    if not deltas:
+        return
+
+    db.session.execute(
+        db.update(model)
+        .where(model.id.in_(list(deltas)))
+        .values(balance=model.balance + db.case(deltas, value=model.id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _over_limit(allowances, amount):
+    # allowances: [daily_left, monthly_left] per counter, None = unlimited
+    for daily, monthly in allowances:
+        if daily is not None and amount > daily:
+            return "Daily limit exceeded"
+        if monthly is not None and amount > monthly:
+            return "Monthly limit exceeded"
+    return None
+
+
+def transfer_batch(user_id, items, max_amount=None):
+    """Apply many transfers from ``user_id`` in one DB transaction.
+
+    ``items`` are dicts with ``amount``, ``target_username`` and an
+    optional ``source`` (``"account_3"``; defaults to the primary
+    account) and ``description``. Every affected row is locked once; the
+    balance deltas go out as one UPDATE per table and the ledger rows as
+    one bulk INSERT. Items are applied in order and each one that fails
+    validation, funds or limit checks is rejected without affecting the
+    rest.
+
+    Returns one ``{"index", "status", "msg"}`` result per item.
+    """
+    results = [None] * len(items)
+    parsed = []
+
+    # -------- validate everything up front --------
+
+    usernames = {
+        str(item.get("target_username", "")).strip()
+        for item in items if isinstance(item, dict)
+    }
+    targets = dict(
+        db.session.query(User.username, db.func.min(Account.id))
+        .join(Account, Account.user_id == User.id)
+        .filter(User.username.in_(usernames))
+        .group_by(User.username)
+        .all()
+    ) if usernames else {}
+
+    default_source = (Account, primary_account_id(user_id))
+
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise TransferError("Malformed item")
+
+            amount = parse_amount(item.get("amount"))
+            if max_amount is not None and amount > max_amount:
+                raise TransferError("Transaction limit exceeded")
+
+            target_id = targets.get(str(item.get("target_username", "")).strip())
+            if target_id is None:
+                raise TransferError("Target user not found")
+
+            source = parse_source(item["source"]) if item.get("source") else default_source
+            if source == (Account, target_id):
+                raise TransferError("Cannot transfer to the same account")
+
+            parsed.append((index, source, (Account, target_id), amount, item))
+        except TransferError as e:
+            results[index] = {"index": index, "status": "rejected", "msg": str(e)}
+
+    # -------- lock once, apply in memory --------
+
+    try:
+        limits.check_velocity(user_id)
+    except LimitError as e:
+        return [
+            result or {"index": index, "status": "rejected", "msg": str(e)}
+            for index, result in enumerate(results)
+        ]
+
+    try:
+        refs = {ref for _, source, target, _, _ in parsed for ref in (source, target)}
+        locked = lock_rows(refs)
+        connection = db.session.connection()
+
+        balances = {ref: _available(row) for ref, row in locked.items()}
+
+        # Counters are locked after the ledger rows (user, then cards by
+        # id), so the allowances below hold until commit
+        allowances = {(limits.USER, user_id): list(limits.remaining(connection, limits.USER, user_id))}
+        for model, row_id in sorted(ref for ref in refs if ref[0] is VirtualCard and ref in locked):
+            if locked[(model, row_id)].user_id == user_id:
+                allowances[(limits.CARD, row_id)] = list(limits.remaining(connection, limits.CARD, row_id))
+        spent = {key: [Decimal("0"), 0] for key in allowances}
+        deltas = {model: {} for model in LOCK_ORDER}
+        rows = []
+        applied = []
+        now = datetime.utcnow()
+
+        for index, source, target, amount, item in parsed:
+            sender = locked.get(source)
+
+            if sender is None or sender.user_id != user_id:
+                results[index] = {"index": index, "status": "rejected", "msg": "Invalid source"}
+                continue
+
+            if target not in locked:
+                results[index] = {"index": index, "status": "rejected", "msg": "Target account not found"}
+                continue
+
+            if balances[source] < amount:
+                results[index] = {"index": index, "status": "rejected", "msg": "Insufficient funds"}
+                continue
+
+            counters = [(limits.USER, user_id)]
+            if source[0] is VirtualCard:
+                counters.append((limits.CARD, source[1]))
+
+            over = _over_limit([allowances[key] for key in counters], amount)
+            if over:
+                results[index] = {"index": index, "status": "rejected", "msg": over}
+                continue
+
+            for key in counters:
+                allowances[key] = [None if left is None else left - amount for left in allowances[key]]
+                spent[key][0] += amount
+                spent[key][1] += 1
+
+            balances[source] -= amount
+            balances[target] += amount
+
+            for (model, row_id), delta in ((source, -amount), (target, amount)):
+                deltas[model][row_id] = deltas[model].get(row_id, 0) + delta
+
+            description = str(item.get("description") or "Batch Transfer")[:200]
+            base = {
+                "transaction_type": "Batch Transfer",
+                "description": description,
+                "created_at": now,
+                "account_id": None,
+                "virtual_card_id": None,
+            }
+            rows.append({**base, **_fk(*source), "amount": -amount})
+            rows.append({**base, **_fk(*target), "amount": amount})
+            applied.append({
+                "index": index,
+                "source": format_source(*source),
+                "target_account_id": target[1],
+                "amount": str(amount),
+                "description": description,
+            })
+
+            results[index] = {"index": index, "status": "ok", "msg": "Transfer successful"}
+
+        for model, model_deltas in deltas.items():
+            _set_balances(model, model_deltas)
+
+        for (scope, owner_id), (amount, count) in spent.items():
+            if count:
+                limits.record(connection, scope, owner_id, amount, count)
+
+        if rows:
+            # Core bulk insert bypasses the ORM flush hooks, so the
+            # summary and stats stores are fed explicitly
+            db.session.execute(db.insert(Transaction), rows)
+            record_transactions(connection, rows)
+            bump(
+                connection,
+                transactions=len(rows),
+                balance=sum(deltas[Account].values())
+            )
+            # One event for the whole batch keeps the extra write constant
+            outbox.publish(outbox.BATCH_TRANSFER, {"user_id": user_id, "transfers": applied})
+
+        db.session.commit()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return results
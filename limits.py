@@ -0,0 +1,212 @@
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from decimal import Decimal
+from time import monotonic
+
+from models import db, SpendCounter
+from ratelimit import parse_limit
+from sqlutil import upsert
+
+
+class LimitError(Exception):
+    """A spend limit or velocity rule said no; the message is safe to show the user."""
+
+
+USER = "user"
+CARD = "vcard"
+LOAN = "loan"
+
+# scope -> (daily, monthly); None means unlimited
+_policy = {USER: (None, None), CARD: (None, None), LOAN: (None, None)}
+_velocity = {"window": None}
+
+
+# =========================
+# COUNTERS
+# =========================
+#
+# One spend_counters row per (scope, owner, UTC day). Writers bump it
+# with an upsert in the same transaction as their ledger rows; the
+# upsert also row-locks the counter, so two concurrent writers for the
+# same owner can't both squeeze under a limit. Today's total is one
+# primary-key row and the month's at most 31 adjacent ones.
+
+def _today():
+    return datetime.utcnow().date()
+
+
+def _bump(connection, scope, owner_id, day, amount, count):
+    """Add to the day's counter; returns ``(amount, count)`` after the add."""
+    stmt = upsert(connection, SpendCounter).values(
+        scope=scope,
+        owner_id=owner_id,
+        day=day,
+        amount=amount,
+        count=count
+    )
+    excluded = stmt.excluded
+
+    return connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["scope", "owner_id", "day"],
+            set_={
+                "amount": SpendCounter.amount + excluded.amount,
+                "count": SpendCounter.count + excluded.count,
+            }
+        ).returning(SpendCounter.amount, SpendCounter.count)
+    ).one()
+
+
+def _month_total(connection, scope, owner_id, day):
+    return connection.execute(
+        db.select(db.func.coalesce(db.func.sum(SpendCounter.amount), 0))
+        .where(
+            SpendCounter.scope == scope,
+            SpendCounter.owner_id == owner_id,
+            SpendCounter.day.between(day.replace(day=1), day)
+        )
+    ).scalar()
+
+
+def record(connection, scope, owner_id, amount, count=1, day=None):
+    """Count ``amount`` against ``owner_id`` without enforcing its limits."""
+    _bump(connection, scope, owner_id, day or _today(), amount, count)
+
+
+def remaining(connection, scope, owner_id, day=None):
+    """``(daily, monthly)`` allowance left, ``None`` where unlimited.
+
+    Locks the owner's counter for the rest of the caller's transaction,
+    so the answer holds until it commits.
+    """
+    day = day or _today()
+    daily, monthly = _policy[scope]
+    spent_today, _ = _bump(connection, scope, owner_id, day, 0, 0)
+
+    return (
+        None if daily is None else daily - Decimal(str(spent_today)),
+        None if monthly is None else monthly - Decimal(str(_month_total(connection, scope, owner_id, day))),
+    )
+
+
+def consume(connection, scope, owner_id, amount, count=1, day=None):
+    """Count ``amount`` against ``owner_id``; ``LimitError`` if that breaks a limit.
+
+    The caller must roll back on ``LimitError``.
+    """
+    day = day or _today()
+    daily, monthly = _policy[scope]
+    spent_today, _ = _bump(connection, scope, owner_id, day, amount, count)
+
+    if daily is not None and Decimal(str(spent_today)) > daily:
+        raise LimitError("Daily limit exceeded")
+
+    if monthly is not None and Decimal(str(_month_total(connection, scope, owner_id, day))) > monthly:
+        raise LimitError("Monthly limit exceeded")
+
+
+def spend(connection, user_id, amount, card_id=None):
+    """Debit from ``user_id`` (and the card it came from, if any)."""
+    consume(connection, USER, user_id, amount)
+    if card_id is not None:
+        consume(connection, CARD, card_id, amount)
+
+
+def usage(scope, owner_ids, day=None):
+    """``{owner_id: {"day", "month", "daily_limit", "monthly_limit"}}`` read from the counters."""
+    day = day or _today()
+    daily, monthly = _policy[scope]
+    owner_ids = list(owner_ids)
+
+    totals = {owner_id: [Decimal("0.00"), Decimal("0.00")] for owner_id in owner_ids}
+    rows = db.session.execute(
+        db.select(SpendCounter.owner_id, SpendCounter.day, SpendCounter.amount)
+        .where(
+            SpendCounter.scope == scope,
+            SpendCounter.owner_id.in_(owner_ids),
+            SpendCounter.day.between(day.replace(day=1), day)
+        )
+    ) if owner_ids else ()
+
+    for owner_id, row_day, amount in rows:
+        totals[owner_id][1] += amount
+        if row_day == day:
+            totals[owner_id][0] += amount
+
+    return {
+        owner_id: {
+            "day": spent_today,
+            "month": spent_month,
+            "daily_limit": daily,
+            "monthly_limit": monthly,
+        }
+        for owner_id, (spent_today, spent_month) in totals.items()
+    }
+
+
+# =========================
+# VELOCITY (per process)
+# =========================
+
+class SlidingWindow:
+    """Event times per key over the last ``period`` seconds, in memory.
+
+    Per process: with several workers the effective limit is up to
+    ``limit`` per worker. Idle keys are evicted LRU beyond ``max_keys``.
+    """
+
+    def __init__(self, limit, period, max_keys=100_000):
+        self.limit = limit
+        self.period = period
+        self.max_keys = max_keys
+        self._events = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, now=None):
+        """Record one event; False when ``key`` already had ``limit`` in the window."""
+        now = monotonic() if now is None else now
+
+        with self._lock:
+            events = self._events.pop(key, None) or deque()
+            while events and events[0] <= now - self.period:
+                events.popleft()
+
+            allowed = len(events) < self.limit
+            if allowed:
+                events.append(now)
+
+            if events:
+                self._events[key] = events
+                while len(self._events) > self.max_keys:
+                    self._events.popitem(last=False)
+
+            return allowed
+
+
+def check_velocity(user_id):
+    """``LimitError`` when ``user_id`` is over the transfer velocity rule."""
+    window = _velocity["window"]
+    if window is not None and not window.hit(user_id):
+        raise LimitError("Too many transfers, please slow down")
+
+
+# =========================
+# SETUP
+# =========================
+
+def _limit(value):
+    value = Decimal(str(value or 0))
+    return value if value > 0 else None
+
+
+def init_app(app):
+    config = app.config
+
+    _policy[USER] = (_limit(config["USER_DAILY_LIMIT"]), _limit(config["USER_MONTHLY_LIMIT"]))
+    _policy[CARD] = (_limit(config["CARD_DAILY_LIMIT"]), _limit(config["CARD_MONTHLY_LIMIT"]))
+    _policy[LOAN] = (_limit(config["LOAN_DAILY_LIMIT"]), _limit(config["LOAN_MONTHLY_LIMIT"]))
+
+    if config["TRANSFER_VELOCITY_LIMIT"]:
+        limit, period = parse_limit(config["TRANSFER_VELOCITY_LIMIT"])
+        _velocity["window"] = SlidingWindow(limit, period) if limit > 0 else None
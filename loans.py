@@ -0,0 +1,265 @@
+import threading
+from datetime import datetime
+from decimal import Decimal
+from time import monotonic
+
+import numpy as np
+
+import amortization
+import limits
+from ledger import TransferError, lock_rows, parse_amount, parse_source
+from limits import LimitError
+from models import db, Loan, Transaction, VirtualCard
+
+
+class LoanError(Exception):
+    """A loan request was rejected; the message is safe to show the user."""
+
+
+LOAD_CHUNK = 100_000
+TOP_BORROWERS = 20
+RATE_BANDS = (0.05, 0.10, 0.15, 0.20)
+
+_cache = {"expires": 0.0, "key": None, "value": None}
+_cache_lock = threading.Lock()
+
+
+def _cents(value):
+    return f"{value:.2f}"
+
+
+# =========================
+# DISBURSEMENT
+# =========================
+
+def disburse(user_id, target, amount, annual_rate, term_months, terms, max_amount):
+    """Book a loan and credit ``amount`` to the user's ``target``.
+
+    ``target`` is ``"account_3"`` / ``"vcard_7"``; ``term_months`` must be
+    one of ``terms``. The balance update, ledger row and loan are
+    committed together; returns the new ``Loan``.
+    """
+    try:
+        amount = parse_amount(amount)
+    except TransferError as e:
+        raise LoanError(str(e))
+
+    try:
+        model, target_id = parse_source(target)
+    except TransferError:
+        raise LoanError("Invalid destination")
+
+    if amount > max_amount:
+        raise LoanError(f"Loan amount exceeds limit ({max_amount})")
+
+    try:
+        term_months = int(term_months)
+    except (TypeError, ValueError):
+        term_months = None
+    if term_months not in terms:
+        raise LoanError("Invalid term")
+
+    try:
+        dest = lock_rows([(model, target_id)]).get((model, target_id))
+        if dest is None or dest.user_id != user_id:
+            raise LoanError("Invalid destination")
+
+        limits.consume(db.session.connection(), limits.LOAN, user_id, amount)
+
+        dest.balance += amount
+        db.session.add(Transaction(
+            amount=amount,
+            transaction_type="Loan Disbursed",
+            description=f"Loan: {term_months} months at {Decimal(annual_rate) * 100:.2f}%",
+            **({"virtual_card_id": dest.id} if model is VirtualCard else {"account_id": dest.id})
+        ))
+
+        loan = Loan(
+            amount=amount,
+            annual_rate=Decimal(annual_rate),
+            term_months=term_months,
+            start_date=datetime.utcnow().date(),
+            user_id=user_id
+        )
+        db.session.add(loan)
+        db.session.commit()
+
+    except LimitError as e:
+        db.session.rollback()
+        raise LoanError(str(e))
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return loan
+
+
+# =========================
+# SINGLE LOAN
+# =========================
+
+def loan_schedule(loan, as_of=None):
+    """Full repayment schedule and current position of one ``Loan``."""
+    as_of = as_of or datetime.utcnow().date()
+    due, payments, interest, principal, balances = amortization.schedule(
+        loan.amount, loan.annual_rate, loan.term_months, loan.start_date
+    )
+    position = amortization.portfolio(
+        [float(loan.amount)], [float(loan.annual_rate)],
+        [loan.term_months], [loan.start_date], as_of
+    )
+
+    return {
+        "loan_id": loan.id,
+        "amount": str(loan.amount),
+        "annual_rate": str(loan.annual_rate),
+        "term_months": loan.term_months,
+        "start_date": loan.start_date.isoformat(),
+        "monthly_payment": _cents(position["payment"][0]),
+        "as_of": as_of.isoformat(),
+        "payments_made": int(position["payments_made"][0]),
+        "outstanding_principal": _cents(position["outstanding"][0]),
+        "accrued_interest": _cents(position["accrued_interest"][0]),
+        "total_interest": _cents(interest.sum()),
+        "schedule": [
+            {
+                "period": i + 1,
+                "due_date": str(due[i]),
+                "payment": _cents(payments[i]),
+                "interest": _cents(interest[i]),
+                "principal": _cents(principal[i]),
+                "balance": _cents(balances[i]),
+            }
+            for i in range(loan.term_months)
+        ],
+    }
+
+
+# =========================
+# PORTFOLIO
+# =========================
+
+def load_portfolio(chunk=LOAD_CHUNK):
+    """Every loan as column arrays, streamed from the database in chunks.
+
+    Numerics are cast to float in SQL so rows arrive as plain floats
+    rather than ``Decimal`` objects.
+    """
+    result = db.session.execute(
+        db.select(
+            Loan.user_id,
+            db.cast(Loan.amount, db.Float),
+            db.cast(Loan.annual_rate, db.Float),
+            Loan.term_months,
+            Loan.start_date
+        )
+        .order_by(Loan.id)
+        .execution_options(yield_per=chunk)
+    )
+
+    parts = []
+    for rows in result.partitions():
+        user_id, amount, rate, term, start = zip(*rows)
+        parts.append((
+            np.array(user_id, dtype=np.int64),
+            np.array(amount, dtype=np.float64),
+            np.array(rate, dtype=np.float64),
+            np.array(term, dtype=np.int64),
+            np.array(start, dtype="datetime64[D]"),
+        ))
+
+    if not parts:
+        empty = (np.int64, np.float64, np.float64, np.int64, "datetime64[D]")
+        return tuple(np.empty(0, dtype=dtype) for dtype in empty)
+
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def _breakdown(keys, labels, count, principal, outstanding, accrued):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    n = len(unique)
+    sums = [
+        np.bincount(inverse, weights=w, minlength=n)
+        for w in (count, principal, outstanding, accrued)
+    ]
+
+    return [
+        {
+            "bucket": labels(key),
+            "loans": int(sums[0][i]),
+            "principal": _cents(sums[1][i]),
+            "outstanding": _cents(sums[2][i]),
+            "accrued_interest": _cents(sums[3][i]),
+        }
+        for i, key in enumerate(unique)
+    ]
+
+
+def exposure(user_id, amount, annual_rate, term_months, start, as_of, top=TOP_BORROWERS):
+    """Portfolio exposure on ``as_of`` from column arrays (see ``load_portfolio``).
+
+    Positions come from one vectorized ``amortization.portfolio`` pass;
+    every breakdown is a ``bincount`` over the same arrays.
+    """
+    position = amortization.portfolio(amount, annual_rate, term_months, start, as_of)
+    outstanding = position["outstanding"]
+    accrued = position["accrued_interest"]
+    active = outstanding > 0
+    ones = np.ones(len(amount))
+
+    band_edges = np.array(RATE_BANDS)
+    band_names = [f"<{RATE_BANDS[0]:.0%}"] + [
+        f"{lo:.0%}-{hi:.0%}" for lo, hi in zip(RATE_BANDS, RATE_BANDS[1:])
+    ] + [f">={RATE_BANDS[-1]:.0%}"]
+
+    maturity_year = position["maturity"].astype("datetime64[Y]").astype(np.int64) + 1970
+
+    borrowers, inverse = np.unique(user_id, return_inverse=True)
+    by_borrower = np.bincount(inverse, weights=outstanding, minlength=len(borrowers))
+    top = min(top, len(borrowers))
+    largest = np.argpartition(-by_borrower, top - 1)[:top] if top else np.empty(0, dtype=np.int64)
+    largest = largest[np.argsort(-by_borrower[largest], kind="stable")]
+
+    return {
+        "as_of": str(np.datetime64(as_of, "D")),
+        "loans": int(len(amount)),
+        "active_loans": int(active.sum()),
+        "borrowers": int(len(borrowers)),
+        "principal": _cents(amount.sum()),
+        "outstanding": _cents(outstanding.sum()),
+        "accrued_interest": _cents(accrued.sum()),
+        "monthly_payments_due": _cents(position["payment"][active].sum()),
+        "by_term": _breakdown(
+            term_months, lambda t: f"{t} months", ones, amount, outstanding, accrued
+        ),
+        "by_rate": _breakdown(
+            np.digitize(annual_rate, band_edges), lambda b: band_names[b],
+            ones, amount, outstanding, accrued
+        ),
+        "by_maturity_year": _breakdown(
+            maturity_year, int, ones, amount, outstanding, accrued
+        ),
+        "top_borrowers": [
+            {"user_id": int(borrowers[i]), "outstanding": _cents(by_borrower[i])}
+            for i in largest
+            if by_borrower[i] > 0
+        ],
+    }
+
+
+def exposure_report(ttl, as_of=None):
+    """``exposure`` of every loan, served from a short-lived in-process cache."""
+    as_of = as_of or datetime.utcnow().date()
+    now = monotonic()
+
+    with _cache_lock:
+        if _cache["key"] == as_of and now < _cache["expires"]:
+            return _cache["value"]
+
+    value = exposure(*load_portfolio(), as_of)
+
+    with _cache_lock:
+        _cache.update(key=as_of, value=value, expires=now + ttl)
+
+    return value
@@ -0,0 +1,403 @@
+import fcntl
+import glob
+import hmac
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+from time import perf_counter, time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger("zenith.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+COUNTERS = {
+    "zenith_requests_total": "Requests served.",
+    "zenith_sql_statements_total": "SQL statements executed.",
+    "zenith_sql_seconds_total": "Time spent executing SQL.",
+    "zenith_sql_rows_total": "Rows returned or affected by SQL statements.",
+    "zenith_db_transaction_seconds_total": "Time DB transactions were held open.",
+    "zenith_section_seconds_total": "Time spent in instrumented sections (e.g. bcrypt).",
+    "zenith_n_plus_one_total": "Requests that repeated one SQL statement N+ times.",
+    "zenith_db_target_total": "Requests by the database they read from (primary/replica).",
+    "zenith_db_pool_checkouts_total": "Connections checked out of the pool.",
+    "zenith_db_pool_wait_seconds_total": "Time spent waiting to check out a pooled connection.",
+    "zenith_db_pool_overflow_total": "Checkouts that had to open an overflow connection.",
+    "zenith_db_pool_timeouts_total": "Checkouts that gave up after DB_POOL_TIMEOUT.",
+}
+
+HISTOGRAM = "zenith_request_duration_seconds"
+
+
+# =========================
+# PER-PROCESS STORE
+# =========================
+#
+# Each worker aggregates in memory and periodically dumps its totals to
+# METRICS_DIR/<pid>-<nonce>.json; /metrics merges every worker's file.
+# The nonce keeps a reused PID from overwriting a dead worker's totals.
+# A worker holds an flock on its <name>.lock for as long as it lives, so
+# a collector that can take the lock knows the owner is gone and folds
+# its counters into retired.json before deleting the file: totals keep
+# going up and the directory doesn't grow with every worker restart.
+
+RETIRED = "retired"
+
+
+def _snapshot(counters, histograms):
+    return {
+        "counters": [[n, list(l), v] for (n, l), v in counters.items()],
+        "histograms": [[list(l), h] for l, h in histograms.items()],
+    }
+
+
+def _merge(snapshot, counters, histograms):
+    for name, labels, value in snapshot["counters"]:
+        counters[(name, tuple(map(tuple, labels)))] += value
+
+    for labels, hist in snapshot["histograms"]:
+        key = tuple(map(tuple, labels))
+        merged = histograms.setdefault(key, [0] * len(hist))
+        histograms[key] = [a + b for a, b in zip(merged, hist)]
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, snapshot):
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot, f)
+    os.replace(path + ".tmp", path)
+
+
+class Store:
+
+    def __init__(self, directory, n_plus_one_threshold, flush_interval=1.0):
+        self.directory = directory
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._name = None
+        self._alive = None
+        os.makedirs(directory, exist_ok=True)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # gunicorn --preload: the parent's totals are its own, and its
+        # liveness lock must not make this child look like the parent
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._name = None
+        if self._alive is not None:
+            self._alive.close()
+            self._alive = None
+
+    def _path(self):
+        if self._name is None:
+            name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            alive = open(os.path.join(self.directory, name + ".lock"), "w")
+            fcntl.flock(alive, fcntl.LOCK_EX)
+            self._name, self._alive = name, alive
+        return os.path.join(self.directory, self._name + ".json")
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._counters[(name, labels)] += value
+
+    def observe(self, labels, value):
+        with self._lock:
+            hist = self._histograms.setdefault(
+                labels, [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            )
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def flush(self, force=False):
+        now = time()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+
+        with self._lock:
+            snapshot = _snapshot(self._counters, self._histograms)
+            self._last_flush = now
+            path = self._path()
+
+        _write(path, snapshot)
+
+    def _retire_dead(self):
+        """Fold snapshots of exited workers into retired.json."""
+        retired_path = os.path.join(self.directory, RETIRED + ".json")
+
+        # One collector at a time, or two could fold the same file twice
+        with open(os.path.join(self.directory, RETIRED + ".lock"), "w") as guard:
+            fcntl.flock(guard, fcntl.LOCK_EX)
+
+            counters, histograms = Counter(), {}
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                name = os.path.basename(path)[:-len(".json")]
+                if name == RETIRED:
+                    continue
+
+                lock_path = os.path.join(self.directory, name + ".lock")
+                try:
+                    with open(lock_path, "a") as alive:
+                        fcntl.flock(alive, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+
+                snapshot = _load(path)
+                if snapshot is not None:
+                    _merge(snapshot, counters, histograms)
+                dead.append((path, lock_path))
+
+            if not dead:
+                return
+
+            retired = _load(retired_path)
+            if retired is not None:
+                _merge(retired, counters, histograms)
+            _write(retired_path, _snapshot(counters, histograms))
+
+            for path, lock_path in dead:
+                for stale in (path, lock_path):
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+
+    def collect(self):
+        """Merge every worker's latest snapshot plus the retired totals."""
+        self._retire_dead()
+
+        counters = Counter()
+        histograms = {}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            snapshot = _load(path)
+            if snapshot is not None:
+                _merge(snapshot, counters, histograms)
+
+        return counters, histograms
+
+
+# =========================
+# PROMETHEUS TEXT FORMAT
+# =========================
+
+def _labels(pairs, extra=()):
+    items = list(pairs) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in items
+    )
+    return "{" + body + "}"
+
+
+def render(counters, histograms):
+    lines = [
+        f"# HELP {HISTOGRAM} Request latency.",
+        f"# TYPE {HISTOGRAM} histogram",
+    ]
+
+    for labels, hist in sorted(histograms.items()):
+        for bound, count in zip(LATENCY_BUCKETS, hist):
+            lines.append(f"{HISTOGRAM}_bucket{_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{HISTOGRAM}_bucket{_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+        lines.append(f"{HISTOGRAM}_sum{_labels(labels)} {hist[-2]}")
+        lines.append(f"{HISTOGRAM}_count{_labels(labels)} {hist[-1]}")
+
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_labels(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+# =========================
+# HOOKS
+# =========================
+
+_store = None
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def record_section(section, seconds):
+    """Attribute ``seconds`` of the current request to ``section``."""
+    if _store is None or not has_request_context() or "_metrics" not in g:
+        return
+    g._metrics["sections"][section] += seconds
+
+
+def record_pool_checkout(pool, seconds, overflow=False, timed_out=False):
+    """Count one pool checkout (process-wide, not tied to a request)."""
+    if _store is None:
+        return
+
+    labels = (("pool", pool),)
+    _store.inc("zenith_db_pool_checkouts_total", labels)
+    _store.inc("zenith_db_pool_wait_seconds_total", labels, seconds)
+    if overflow:
+        _store.inc("zenith_db_pool_overflow_total", labels)
+    if timed_out:
+        _store.inc("zenith_db_pool_timeouts_total", labels)
+
+
+def record_db_target(target):
+    """Record which database (``primary``/``replica``) served the request."""
+    if _store is None or not has_request_context() or "_metrics" not in g:
+        return
+    g._metrics["db_target"] = target
+
+
+def _before_request():
+    g._metrics = {
+        "db_target": "primary",
+        "start": perf_counter(),
+        "statements": Counter(),
+        "sql_seconds": 0.0,
+        "rows": 0,
+        "tx_seconds": 0.0,
+        "sections": Counter(),
+    }
+
+
+def _after_request(response):
+    m = g.get("_metrics")
+    if m is None:
+        return response
+
+    args = (m, (("route", _route()),), request.method, response.status_code)
+    if response.is_streamed:
+        # A stream_with_context body still runs SQL after this hook, into
+        # the same g._metrics; count it once the server closes the body
+        response.call_on_close(lambda: _record(*args))
+    else:
+        g.pop("_metrics")
+        _record(*args)
+    return response
+
+
+def _record(m, route, method, status):
+    elapsed = perf_counter() - m["start"]
+
+    _store.observe(route + (("method", method),), elapsed)
+    _store.inc("zenith_requests_total", route + (("status", status),))
+    _store.inc("zenith_sql_statements_total", route, sum(m["statements"].values()))
+    _store.inc("zenith_sql_seconds_total", route, m["sql_seconds"])
+    _store.inc("zenith_sql_rows_total", route, m["rows"])
+    _store.inc("zenith_db_transaction_seconds_total", route, m["tx_seconds"])
+    _store.inc("zenith_db_target_total", route + (("target", m["db_target"]),))
+
+    for section, seconds in m["sections"].items():
+        _store.inc("zenith_section_seconds_total", route + (("section", section),), seconds)
+
+    if m["statements"]:
+        statement, repeats = m["statements"].most_common(1)[0]
+        if repeats >= _store.n_plus_one_threshold:
+            _store.inc("zenith_n_plus_one_total", route)
+            logger.warning(
+                "Possible N+1 on %s: statement ran %d times: %s",
+                route[0][1], repeats, statement[:200]
+            )
+
+    _store.flush()
+
+
+def _request_metrics():
+    if has_request_context() and "_metrics" in g:
+        return g._metrics
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("zenith_query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["zenith_query_start"].pop()
+    m = _request_metrics()
+    if m is None:
+        return
+
+    m["statements"][statement] += 1
+    m["sql_seconds"] += perf_counter() - started
+    if cursor.rowcount and cursor.rowcount > 0:
+        m["rows"] += cursor.rowcount
+
+
+def _handle_error(context):
+    # A failed execute never reaches after_cursor_execute
+    if context.connection is not None:
+        started = context.connection.info.get("zenith_query_start")
+        if started:
+            started.pop()
+
+
+def _begin(conn):
+    conn.info["zenith_tx_start"] = perf_counter()
+
+
+def _end(conn):
+    started = conn.info.pop("zenith_tx_start", None)
+    m = _request_metrics()
+    if started is not None and m is not None:
+        m["tx_seconds"] += perf_counter() - started
+
+
+def init_app(app):
+    """Install request/SQL instrumentation and the ``/metrics`` route."""
+    global _store
+
+    _store = Store(app.config["METRICS_DIR"], app.config["N_PLUS_ONE_THRESHOLD"])
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    # Engine class-level hooks cover every engine the app creates
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    event.listen(Engine, "begin", _begin)
+    event.listen(Engine, "commit", _end)
+    event.listen(Engine, "rollback", _end)
+
+    @app.route("/metrics")
+    def metrics():
+        token = app.config.get("METRICS_TOKEN")
+        presented = request.headers.get("Authorization", "").encode("utf-8")
+        if token and not hmac.compare_digest(presented, f"Bearer {token}".encode("utf-8")):
+            return "Unauthorized", 401
+
+        _store.flush(force=True)
+        return render(*_store.collect()), 200, {
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8"
+        }
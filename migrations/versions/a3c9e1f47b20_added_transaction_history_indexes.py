@@ -0,0 +1,36 @@
+"""Added keyset pagination indexes on transactions
+
+Revision ID: a3c9e1f47b20
+Revises: ded48306281b
+Create Date: 2026-03-02 10:14:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f47b20'
+down_revision = 'ded48306281b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_transactions_account_created_id',
+            ['account_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False
+        )
+        batch_op.create_index(
+            'ix_transactions_vcard_created_id',
+            ['virtual_card_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_vcard_created_id')
+        batch_op.drop_index('ix_transactions_account_created_id')
@@ -0,0 +1,51 @@
+"""Added Loan rate, term and start date
+
+Revision ID: a7e4c2b9d516
+Revises: f3a9b1c7d820
+Create Date: 2026-03-18 09:27:44.610385
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e4c2b9d516'
+down_revision = 'f3a9b1c7d820'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('annual_rate', sa.Numeric(precision=6, scale=4), nullable=True))
+        batch_op.add_column(sa.Column('term_months', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('start_date', sa.Date(), nullable=True))
+
+    # Existing loans were booked before terms existed: give them the
+    # default 12% over 12 months, running from the day they were made
+    if op.get_bind().dialect.name == 'sqlite':
+        start_date = 'date(created_at)'
+    else:
+        start_date = 'CAST(created_at AS DATE)'
+    op.execute(
+        f"UPDATE loans SET annual_rate = 0.12, term_months = 12, start_date = {start_date}"
+    )
+
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.alter_column('annual_rate', existing_type=sa.Numeric(precision=6, scale=4), nullable=False)
+        batch_op.alter_column('term_months', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('start_date', existing_type=sa.Date(), nullable=False)
+        batch_op.create_check_constraint('ck_loans_term_positive', 'term_months > 0')
+        batch_op.create_check_constraint('ck_loans_rate_non_negative', 'annual_rate >= 0')
+        batch_op.create_index(batch_op.f('ix_loans_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('loans', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_loans_user_id'))
+        batch_op.drop_constraint('ck_loans_rate_non_negative', type_='check')
+        batch_op.drop_constraint('ck_loans_term_positive', type_='check')
+        batch_op.drop_column('start_date')
+        batch_op.drop_column('term_months')
+        batch_op.drop_column('annual_rate')
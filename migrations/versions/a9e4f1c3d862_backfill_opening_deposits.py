@@ -0,0 +1,98 @@
+"""Backfill opening deposits
+
+Revision ID: a9e4f1c3d862
+Revises: f6c2a8d4b391
+Create Date: 2026-03-30 10:02:18.774203
+
+Accounts opened before register() posted an "Opening deposit" carry its
+fixed 1000 in the balance with no ledger row behind it, and
+`flask zenith reconcile-balances` flags every one of them. This posts
+that deposit, dated when the account was created, for each account
+that has none. Only the known amount is posted: any other drift is
+left for the reconciliation report. Cards are never opened with money
+(they start at 0 and are funded by transfers, which are in the
+ledger), so there is nothing identifiable to backfill for them.
+
+The derived stores move in the same transaction, as
+record_transactions() would for a live insert: the monthly summaries,
+the transactions stat counter and each owner's ledger_version (so ETag
+clients don't keep getting 304s for the old ledger).
+
+Data only. Downgrade leaves the rows in place: they can't be told apart
+from deposits posted by register().
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4f1c3d862'
+down_revision = 'f6c2a8d4b391'
+branch_labels = None
+depends_on = None
+
+
+OPENING = 1000
+
+MISSING = """
+SELECT a.id, a.user_id, a.created_at
+FROM accounts a
+WHERE NOT EXISTS (
+    SELECT 1 FROM transactions t
+    WHERE t.account_id = a.id AND t.description = 'Opening deposit'
+)
+"""
+
+SUMMARIES = """
+INSERT INTO monthly_summaries
+    (user_id, month, transaction_type, income, expense, income_count, expense_count)
+SELECT m.user_id, {month}, 'General', COUNT(*) * {opening}, 0, COUNT(*), 0
+FROM ({missing}) m
+WHERE true
+GROUP BY m.user_id, {month}
+ON CONFLICT (user_id, month, transaction_type) DO UPDATE SET
+    income = monthly_summaries.income + excluded.income,
+    income_count = monthly_summaries.income_count + excluded.income_count
+"""
+
+STATS = """
+INSERT INTO stat_counters (name, shard, value)
+SELECT 'transactions', 0, COUNT(*) FROM ({missing}) m
+WHERE true
+HAVING COUNT(*) > 0
+ON CONFLICT (name, shard) DO UPDATE SET
+    value = stat_counters.value + excluded.value
+"""
+
+VERSIONS = """
+UPDATE users
+SET ledger_version = ledger_version + 1, ledger_updated_at = :now
+WHERE id IN (SELECT m.user_id FROM ({missing}) m)
+"""
+
+BACKFILL = """
+INSERT INTO transactions
+    (amount, transaction_type, description, account_id, virtual_card_id, created_at)
+SELECT {opening}, 'General', 'Opening deposit', m.id, NULL, m.created_at
+FROM ({missing}) m
+"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "date_trunc('month', m.created_at)::date"
+    else:
+        month = "date(m.created_at, 'start of month')"
+
+    # Derived stores first: MISSING stops matching once the rows exist
+    op.execute(SUMMARIES.format(month=month, opening=OPENING, missing=MISSING))
+    op.execute(STATS.format(missing=MISSING))
+    op.get_bind().execute(sa.text(VERSIONS.format(missing=MISSING)), {"now": datetime.utcnow()})
+    op.execute(BACKFILL.format(opening=OPENING, missing=MISSING))
+
+
+def downgrade():
+    pass
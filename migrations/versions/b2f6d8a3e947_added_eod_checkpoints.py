@@ -0,0 +1,31 @@
+"""Added EodCheckpoint model
+
+Revision ID: b2f6d8a3e947
+Revises: a7e4c2b9d516
+Create Date: 2026-03-19 14:05:31.228716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f6d8a3e947'
+down_revision = 'a7e4c2b9d516'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('eod_checkpoints',
+    sa.Column('business_date', sa.Date(), nullable=False),
+    sa.Column('first_id', sa.Integer(), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('postings', sa.Integer(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('business_date', 'first_id')
+    )
+
+
+def downgrade():
+    op.drop_table('eod_checkpoints')
@@ -0,0 +1,34 @@
+"""Added ReconcileMark model
+
+Revision ID: b5d2e8f4a170
+Revises: a9e4f1c3d862
+Create Date: 2026-03-30 15:37:52.093418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2e8f4a170'
+down_revision = 'a9e4f1c3d862'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reconcile_marks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('reconcile_marks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reconcile_marks_recorded_at'), ['recorded_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reconcile_marks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reconcile_marks_recorded_at'))
+
+    op.drop_table('reconcile_marks')
@@ -0,0 +1,60 @@
+"""Added MonthlySummary model
+
+Revision ID: b7d2f08c5e31
+Revises: a3c9e1f47b20
+Create Date: 2026-03-04 18:42:07.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2f08c5e31'
+down_revision = 'a3c9e1f47b20'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = """
+INSERT INTO monthly_summaries
+    (user_id, month, transaction_type, income, expense, income_count, expense_count)
+SELECT owner_id, {month}, transaction_type,
+       COALESCE(SUM(CASE WHEN amount > 0 THEN amount END), 0),
+       COALESCE(SUM(CASE WHEN amount < 0 THEN -amount END), 0),
+       SUM(CASE WHEN amount > 0 THEN 1 ELSE 0 END),
+       SUM(CASE WHEN amount < 0 THEN 1 ELSE 0 END)
+FROM (
+    SELECT COALESCE(a.user_id, v.user_id) AS owner_id, t.*
+    FROM transactions t
+    LEFT JOIN accounts a ON a.id = t.account_id
+    LEFT JOIN virtual_cards v ON v.id = t.virtual_card_id
+) owned
+WHERE owner_id IS NOT NULL
+GROUP BY owner_id, {month}, transaction_type
+"""
+
+
+def upgrade():
+    op.create_table('monthly_summaries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('transaction_type', sa.String(length=50), nullable=False),
+    sa.Column('income', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('expense', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('income_count', sa.Integer(), nullable=False),
+    sa.Column('expense_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'month', 'transaction_type')
+    )
+
+    # Seed the store from the existing ledger
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "date_trunc('month', created_at)::date"
+    else:
+        month = "date(created_at, 'start of month')"
+    op.execute(BACKFILL.format(month=month))
+
+
+def downgrade():
+    op.drop_table('monthly_summaries')
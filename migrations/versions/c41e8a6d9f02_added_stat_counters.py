@@ -0,0 +1,34 @@
+"""Added StatCounter model
+
+Revision ID: c41e8a6d9f02
+Revises: b7d2f08c5e31
+Create Date: 2026-03-06 09:27:33.804117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e8a6d9f02'
+down_revision = 'b7d2f08c5e31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stat_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('name', 'shard')
+    )
+
+    # Seed from the current tables (same as `flask zenith reconcile-stats`)
+    op.execute("INSERT INTO stat_counters (name, shard, value) SELECT 'users', 0, COUNT(*) FROM users")
+    op.execute("INSERT INTO stat_counters (name, shard, value) SELECT 'transactions', 0, COUNT(*) FROM transactions")
+    op.execute("INSERT INTO stat_counters (name, shard, value) SELECT 'balance', 0, COALESCE(SUM(balance), 0) FROM accounts")
+
+
+def downgrade():
+    op.drop_table('stat_counters')
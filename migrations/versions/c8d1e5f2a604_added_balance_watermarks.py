@@ -0,0 +1,32 @@
+"""Added BalanceWatermark model
+
+Revision ID: c8d1e5f2a604
+Revises: b2f6d8a3e947
+Create Date: 2026-03-20 11:46:09.553187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8d1e5f2a604'
+down_revision = 'b2f6d8a3e947'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('balance_watermarks',
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('source_id', sa.Integer(), nullable=False),
+    sa.Column('last_transaction_id', sa.Integer(), nullable=False),
+    sa.Column('ledger_sum', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('difference', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'source_id')
+    )
+
+
+def downgrade():
+    op.drop_table('balance_watermarks')
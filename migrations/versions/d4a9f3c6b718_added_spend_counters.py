@@ -0,0 +1,31 @@
+"""Added SpendCounter model
+
+Revision ID: d4a9f3c6b718
+Revises: c8d1e5f2a604
+Create Date: 2026-03-23 09:12:40.381926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9f3c6b718'
+down_revision = 'c8d1e5f2a604'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('spend_counters',
+    sa.Column('scope', sa.String(length=10), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'owner_id', 'day')
+    )
+
+
+def downgrade():
+    op.drop_table('spend_counters')
@@ -0,0 +1,119 @@
+"""Partition transactions by month on created_at
+
+Revision ID: d5a7b3e9c114
+Revises: c41e8a6d9f02
+Create Date: 2026-03-11 14:05:48.260713
+
+Postgres only: the table is rebuilt as a declarative RANGE-partitioned
+table with one partition per month (plus a DEFAULT catch-all). The
+primary key becomes (id, created_at) because Postgres requires the
+partition key in every unique index. On other dialects this is a no-op.
+
+Future partitions are created by `flask zenith partitions ensure`.
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a7b3e9c114'
+down_revision = 'c41e8a6d9f02'
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, amount, transaction_type, description, account_id, virtual_card_id, created_at"
+
+INDEXES = """
+CREATE INDEX ix_transactions_account_created_id
+    ON transactions (account_id, created_at DESC, id DESC);
+CREATE INDEX ix_transactions_vcard_created_id
+    ON transactions (virtual_card_id, created_at DESC, id DESC);
+"""
+
+
+def _add_months(d, n):
+    month = d.month - 1 + n
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    first = bind.execute(sa.text(
+        "SELECT date_trunc('month', MIN(created_at))::date FROM transactions"
+    )).scalar()
+    today = date.today().replace(day=1)
+    first = min(first or today, today)
+
+    op.execute("ALTER TABLE transactions RENAME TO transactions_legacy")
+    op.execute("ALTER TABLE transactions_legacy RENAME CONSTRAINT transactions_pkey TO transactions_legacy_pkey")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE transactions (
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            amount NUMERIC(12, 2) NOT NULL,
+            transaction_type VARCHAR(50) NOT NULL,
+            description VARCHAR(200) NOT NULL,
+            account_id INTEGER REFERENCES accounts (id) ON DELETE CASCADE,
+            virtual_card_id INTEGER,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    month = first
+    end = _add_months(today, MONTHS_AHEAD + 1)
+    while month < end:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transactions_p{month:%Y_%m} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+        )
+        month = upper
+
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_legacy")
+    op.execute("DROP TABLE transactions_legacy")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+
+    # Built after the copy; each becomes a per-partition index
+    op.execute(INDEXES)
+    op.execute("ANALYZE transactions")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE transactions (
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            amount NUMERIC(12, 2) NOT NULL,
+            transaction_type VARCHAR(50) NOT NULL,
+            description VARCHAR(200) NOT NULL,
+            account_id INTEGER REFERENCES accounts (id) ON DELETE CASCADE,
+            virtual_card_id INTEGER,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id)
+        )
+    """)
+
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_partitioned")
+    op.execute("DROP TABLE transactions_partitioned CASCADE")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute(INDEXES)
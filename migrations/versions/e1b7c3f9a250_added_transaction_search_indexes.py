@@ -0,0 +1,71 @@
+"""Added transaction search indexes
+
+Revision ID: e1b7c3f9a250
+Revises: d4a9f3c6b718
+Create Date: 2026-03-25 16:41:07.902215
+
+A btree on (account_id, transaction_type, created_at DESC, id DESC) for
+type-filtered search. Description text search gets a pg_trgm GIN index
+on Postgres and an FTS5 trigram table (kept in step by triggers) on
+SQLite.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7c3f9a250'
+down_revision = 'd4a9f3c6b718'
+branch_labels = None
+depends_on = None
+
+
+FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+    "description, content='transactions', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN "
+    "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+)
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_transactions_account_type_created_id',
+            ['account_id', 'transaction_type', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False
+        )
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # On the partitioned table this becomes one index per partition
+        op.execute(
+            "CREATE INDEX ix_transactions_description_trgm "
+            "ON transactions USING gin (description gin_trgm_ops)"
+        )
+    elif bind.dialect.name == 'sqlite':
+        for statement in FTS:
+            op.execute(statement)
+        op.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_transactions_description_trgm")
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('transactions_fts_au', 'transactions_fts_ad', 'transactions_fts_ai'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS transactions_fts")
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_account_type_created_id')
@@ -0,0 +1,28 @@
+"""Added User.ledger_version
+
+Revision ID: e8c2d4f61a37
+Revises: d5a7b3e9c114
+Create Date: 2026-03-13 10:42:19.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c2d4f61a37'
+down_revision = 'd5a7b3e9c114'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ledger_version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('ledger_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('ledger_updated_at')
+        batch_op.drop_column('ledger_version')
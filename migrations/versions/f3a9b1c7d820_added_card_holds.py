@@ -0,0 +1,50 @@
+"""Added CardHold model and VirtualCard.held
+
+Revision ID: f3a9b1c7d820
+Revises: e8c2d4f61a37
+Create Date: 2026-03-16 16:08:51.902337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9b1c7d820'
+down_revision = 'e8c2d4f61a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('virtual_cards', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('held', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False))
+
+    op.create_table('card_holds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('virtual_card_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('captured_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('reference', sa.String(length=64), nullable=True),
+    sa.Column('merchant', sa.String(length=200), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['virtual_card_id'], ['virtual_cards.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('reference')
+    )
+    with op.batch_alter_table('card_holds', schema=None) as batch_op:
+        batch_op.create_index('ix_card_holds_status_expires', ['status', 'expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_card_holds_virtual_card_id'), ['virtual_card_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('card_holds', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_card_holds_virtual_card_id'))
+        batch_op.drop_index('ix_card_holds_status_expires')
+
+    op.drop_table('card_holds')
+
+    with op.batch_alter_table('virtual_cards', schema=None) as batch_op:
+        batch_op.drop_column('held')
@@ -0,0 +1,46 @@
+"""Added OutboxEvent model
+
+Revision ID: f6c2a8d4b391
+Revises: e1b7c3f9a250
+Create Date: 2026-03-27 11:20:33.517604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c2a8d4b391'
+down_revision = 'e1b7c3f9a250'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('pending', sa.JSON(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('failed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('outbox_events', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_outbox_events_available',
+            ['available_at'],
+            unique=False,
+            postgresql_where=sa.text('failed_at IS NULL'),
+            sqlite_where=sa.text('failed_at IS NULL')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('outbox_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_outbox_events_available')
+
+    op.drop_table('outbox_events')
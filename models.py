@@ -1,11 +1,13 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
-from sqlalchemy import CheckConstraint
+from sqlalchemy import DDL, CheckConstraint, event
 from sqlalchemy.orm import validates
 from sqlalchemy.types import Numeric
 
-db = SQLAlchemy()
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 bcrypt = Bcrypt()
 
 
@@ -49,10 +51,34 @@ class User(db.Model):
         nullable=False
     )
 
+    # Bumped whenever the user's transactions or balances change; backs
+    # the ETag / Last-Modified of the dashboard and history pages
+    ledger_version = db.Column(
+        db.Integer,
+        default=0,
+        server_default="0",
+        nullable=False
+    )
+
+    ledger_updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        nullable=True
+    )
+
     accounts = db.relationship(
         "Account",
         backref="owner",
         cascade="all, delete-orphan",
+        order_by="Account.id",
+        lazy=True
+    )
+
+    virtual_cards = db.relationship(
+        "VirtualCard",
+        backref="owner",
+        cascade="all, delete-orphan",
+        order_by="VirtualCard.id",
         lazy=True
     )
 
@@ -105,6 +131,8 @@ class Account(db.Model):
 class Transaction(db.Model):
     __tablename__ = "transactions"
 
+    # On Postgres the table is range-partitioned by month and the real key
+    # is (id, created_at); id stays unique through its sequence.
     id = db.Column(db.Integer, primary_key=True)
 
     amount = db.Column(
@@ -142,8 +170,68 @@ class Transaction(db.Model):
         nullable=False
     )
 
+    # Keyset pagination indexes for history (newest first per source)
+    __table_args__ = (
+        db.Index(
+            "ix_transactions_account_created_id",
+            "account_id",
+            created_at.desc(),
+            id.desc()
+        ),
+        db.Index(
+            "ix_transactions_vcard_created_id",
+            "virtual_card_id",
+            created_at.desc(),
+            id.desc()
+        ),
+        # Search filtered by type: one ordered range scan per (account, type)
+        db.Index(
+            "ix_transactions_account_type_created_id",
+            "account_id",
+            "transaction_type",
+            created_at.desc(),
+            id.desc()
+        ),
+        # Free-text search (ILIKE '%...%'); SQLite uses transactions_fts below
+        db.Index(
+            "ix_transactions_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
     def __repr__(self):
         return f"<Transaction {self.amount} ({self.transaction_type})>"
+
+
+# SQLite stand-in for the trigram index: an external-content FTS5 table
+# over description, kept in step by triggers. Batch migrations that
+# rebuild transactions on SQLite drop the triggers; recreate them after.
+TRANSACTIONS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+    "description, content='transactions', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN "
+    "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+)
+
+for statement in TRANSACTIONS_FTS_DDL:
+    event.listen(
+        Transaction.__table__, "after_create",
+        DDL(statement).execute_if(dialect="sqlite")
+    )
+
+event.listen(
+    Transaction.__table__, "after_drop",
+    DDL("DROP TABLE IF EXISTS transactions_fts").execute_if(dialect="sqlite")
+)
     
     
 # =========================
@@ -172,6 +260,15 @@ class VirtualCard(db.Model):
         nullable=False
     )
 
+    # Sum of open authorization holds (see cards.py); spendable is
+    # balance - held
+    held = db.Column(
+        Numeric(12, 2),
+        default=0,
+        server_default="0",
+        nullable=False
+    )
+
     user_id = db.Column(
         db.Integer,
         db.ForeignKey("users.id", ondelete="CASCADE"),
@@ -184,10 +281,79 @@ class VirtualCard(db.Model):
         nullable=False
     )
 
+    @property
+    def available(self):
+        return self.balance - self.held
+
     def __repr__(self):
         return f"<VirtualCard {self.card_number} - Balance {self.balance}>"
     
     
+# =========================
+# CARD HOLD MODEL
+# =========================
+
+class CardHold(db.Model):
+    __tablename__ = "card_holds"
+
+    # Funds reserved by /api/cards/authorize until captured or expired
+    __table_args__ = (
+        db.Index("ix_card_holds_status_expires", "status", "expires_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    virtual_card_id = db.Column(
+        db.Integer,
+        db.ForeignKey("virtual_cards.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+
+    amount = db.Column(
+        Numeric(12, 2),
+        nullable=False
+    )
+
+    captured_amount = db.Column(
+        Numeric(12, 2),
+        nullable=True
+    )
+
+    # held -> captured | expired
+    status = db.Column(
+        db.String(20),
+        default="held",
+        nullable=False
+    )
+
+    # Processor's idempotency key for retried authorizations
+    reference = db.Column(
+        db.String(64),
+        unique=True,
+        nullable=True
+    )
+
+    merchant = db.Column(
+        db.String(200),
+        nullable=True
+    )
+
+    created_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+
+    expires_at = db.Column(
+        db.DateTime,
+        nullable=False
+    )
+
+    def __repr__(self):
+        return f"<CardHold {self.id} {self.status} {self.amount}>"
+
+
 # =========================
 # LOAN MODEL
 # =========================
@@ -202,12 +368,346 @@ class Loan(db.Model):
         nullable=False
     )
 
+    # Fixed nominal annual rate (0.1200 = 12%), compounded monthly
+    annual_rate = db.Column(
+        Numeric(6, 4),
+        nullable=False
+    )
+
+    term_months = db.Column(
+        db.Integer,
+        nullable=False
+    )
+
+    # First repayment falls due one month after this date
+    start_date = db.Column(
+        db.Date,
+        nullable=False
+    )
+
     user_id = db.Column(
         db.Integer,
         db.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+
+    created_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+
+    __table_args__ = (
+        CheckConstraint("term_months > 0", name="ck_loans_term_positive"),
+        CheckConstraint("annual_rate >= 0", name="ck_loans_rate_non_negative"),
+    )
+
+    def __repr__(self):
+        return f"<Loan {self.amount} - User {self.user_id}>"
+
+# =========================
+# MONTHLY SUMMARY MODEL
+# =========================
+
+class MonthlySummary(db.Model):
+    __tablename__ = "monthly_summaries"
+
+    # Maintained incrementally from Transaction writes (see summaries.py)
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    month = db.Column(
+        db.Date,
+        primary_key=True
+    )
+
+    transaction_type = db.Column(
+        db.String(50),
+        primary_key=True
+    )
+
+    income = db.Column(
+        Numeric(14, 2),
+        default=0,
+        nullable=False
+    )
+
+    expense = db.Column(
+        Numeric(14, 2),
+        default=0,
+        nullable=False
+    )
+
+    income_count = db.Column(
+        db.Integer,
+        default=0,
+        nullable=False
+    )
+
+    expense_count = db.Column(
+        db.Integer,
+        default=0,
+        nullable=False
+    )
+
+    @property
+    def count(self):
+        return self.income_count + self.expense_count
+
+    @property
+    def net(self):
+        return self.income - self.expense
+
+    def __repr__(self):
+        return f"<MonthlySummary {self.user_id} {self.month} {self.transaction_type}>"
+
+
+# =========================
+# STAT COUNTER MODEL
+# =========================
+
+class StatCounter(db.Model):
+    __tablename__ = "stat_counters"
+
+    # Each counter is split across a few shards so concurrent writers
+    # don't all queue on one row; readers sum the shards (see stats.py)
+    name = db.Column(
+        db.String(50),
+        primary_key=True
+    )
+
+    shard = db.Column(
+        db.Integer,
+        primary_key=True
+    )
+
+    value = db.Column(
+        Numeric(18, 2),
+        default=0,
+        nullable=False
+    )
+
+    def __repr__(self):
+        return f"<StatCounter {self.name}[{self.shard}] = {self.value}>"
+
+
+# =========================
+# END-OF-DAY CHECKPOINT MODEL
+# =========================
+
+class EodCheckpoint(db.Model):
+    __tablename__ = "eod_checkpoints"
+
+    # One row per finished chunk of an end-of-day run, written in the same
+    # transaction as the chunk's postings (see eod.py)
+    business_date = db.Column(
+        db.Date,
+        primary_key=True
+    )
+
+    first_id = db.Column(
+        db.Integer,
+        primary_key=True
+    )
+
+    last_id = db.Column(
+        db.Integer,
+        nullable=False
+    )
+
+    postings = db.Column(
+        db.Integer,
+        default=0,
+        nullable=False
+    )
+
+    finished_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+
+    def __repr__(self):
+        return f"<EodCheckpoint {self.business_date} {self.first_id}-{self.last_id}>"
+
+
+# =========================
+# BALANCE WATERMARK MODEL
+# =========================
+
+class BalanceWatermark(db.Model):
+    __tablename__ = "balance_watermarks"
+
+    # Reconciliation progress per balance holder (see reconciliation.py):
+    # ledger_sum is the sum of its transactions up to last_transaction_id
+    kind = db.Column(
+        db.String(10),  # "account" / "vcard"
+        primary_key=True
+    )
+
+    source_id = db.Column(
+        db.Integer,
+        primary_key=True
+    )
+
+    last_transaction_id = db.Column(
+        db.Integer,
+        default=0,
+        nullable=False
+    )
+
+    ledger_sum = db.Column(
+        Numeric(14, 2),
+        default=0,
+        nullable=False
+    )
+
+    # balance minus ledger at the last check; non-zero means drift
+    difference = db.Column(
+        Numeric(14, 2),
+        default=0,
+        nullable=False
+    )
+
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+
+    def __repr__(self):
+        return f"<BalanceWatermark {self.kind} {self.source_id} @{self.last_transaction_id}>"
+
+
+class ReconcileMark(db.Model):
+    __tablename__ = "reconcile_marks"
+
+    # Highest transaction id visible at recorded_at; once recorded_at is
+    # older than the settle window every id up to it has committed
+    id = db.Column(db.Integer, primary_key=True)
+
+    transaction_id = db.Column(
+        db.Integer,
         nullable=False
     )
 
+    recorded_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        nullable=False,
+        index=True
+    )
+
+    def __repr__(self):
+        return f"<ReconcileMark {self.transaction_id} at {self.recorded_at}>"
+
+
+# =========================
+# SPEND COUNTER MODEL
+# =========================
+
+class SpendCounter(db.Model):
+    __tablename__ = "spend_counters"
+
+    # Running totals per owner and UTC day, written in the same transaction
+    # as the ledger rows they count (see limits.py)
+    scope = db.Column(
+        db.String(10),  # "user" / "vcard" / "loan"
+        primary_key=True
+    )
+
+    owner_id = db.Column(
+        db.Integer,
+        primary_key=True
+    )
+
+    day = db.Column(
+        db.Date,
+        primary_key=True
+    )
+
+    amount = db.Column(
+        Numeric(14, 2),
+        default=0,
+        nullable=False
+    )
+
+    count = db.Column(
+        db.Integer,
+        default=0,
+        nullable=False
+    )
+
+    def __repr__(self):
+        return f"<SpendCounter {self.scope} {self.owner_id} {self.day} = {self.amount}>"
+
+
+# =========================
+# OUTBOX MODEL
+# =========================
+
+class OutboxEvent(db.Model):
+    __tablename__ = "outbox_events"
+
+    # Side effects of a commit (webhooks, notifications), written in the
+    # same transaction and delivered later by `flask zenith outbox-worker`
+    # (see outbox.py). Delivered rows are deleted; rows that ran out of
+    # attempts stay with failed_at set
+    __table_args__ = (
+        db.Index(
+            "ix_outbox_events_available",
+            "available_at",
+            postgresql_where=db.text("failed_at IS NULL"),
+            sqlite_where=db.text("failed_at IS NULL")
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    topic = db.Column(
+        db.String(100),
+        nullable=False
+    )
+
+    payload = db.Column(
+        db.JSON,
+        nullable=False
+    )
+
+    # Consumers still to deliver to; NULL means all of them
+    pending = db.Column(
+        db.JSON,
+        nullable=True
+    )
+
+    attempts = db.Column(
+        db.Integer,
+        default=0,
+        nullable=False
+    )
+
+    # Next delivery attempt; a claim pushes it out by the lease, so rows
+    # of a crashed worker come back on their own
+    available_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        nullable=False
+    )
+
+    last_error = db.Column(
+        db.String(500),
+        nullable=True
+    )
+
+    failed_at = db.Column(
+        db.DateTime,
+        nullable=True
+    )
+
     created_at = db.Column(
         db.DateTime,
         default=datetime.utcnow,
@@ -215,4 +715,4 @@ class Loan(db.Model):
     )
 
     def __repr__(self):
-        return f"<Loan {self.amount} - User {self.user_id}>"
\ No newline at end of file
+        return f"<OutboxEvent {self.id} {self.topic} attempts={self.attempts}>"
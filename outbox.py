@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import hmac
+import inspect
+import json
+import random
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from models import db, OutboxEvent
+
+
+class DeliveryError(Exception):
+    """A consumer couldn't take an event; it will be retried."""
+
+
+TRANSFER = "transfer.completed"
+BATCH_TRANSFER = "transfer.batch_completed"
+
+# name -> callable(event); plain functions run on the worker's thread pool,
+# coroutine functions on its event loop
+CONSUMERS = {}
+
+_settings = {"enabled": True}
+
+
+# =========================
+# PUBLISH (request side)
+# =========================
+#
+# A request only adds one INSERT to the transaction it is already in:
+# the event commits (or rolls back) with the ledger rows, and nothing is
+# delivered inline, however many consumers are attached. Whether to
+# queue at all comes from config (OUTBOX_ENABLED), never from this
+# process's CONSUMERS: the worker may register consumers the web
+# process doesn't.
+
+def publish(topic, payload):
+    """Queue ``payload`` (JSON-safe) for every consumer, in the current transaction."""
+    if _settings["enabled"]:
+        db.session.add(OutboxEvent(topic=topic, payload=payload))
+
+
+def consumer(name):
+    """Register the decorated function as the consumer ``name``."""
+    def decorator(fn):
+        CONSUMERS[name] = fn
+        return fn
+    return decorator
+
+
+def webhook(url, secret=None, timeout=10):
+    """Consumer POSTing each event to ``url`` as JSON.
+
+    Any non-2xx answer or network error is a failed delivery. With
+    ``secret`` the body is signed (``X-Zenith-Signature: sha256=<hmac>``);
+    ``X-Zenith-Delivery`` carries the event id, which stays the same
+    across retries so receivers can drop duplicates.
+    """
+    def send(event):
+        body = json.dumps(event).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "X-Zenith-Event": event["topic"],
+            "X-Zenith-Delivery": str(event["id"]),
+        }
+        if secret:
+            digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Zenith-Signature"] = f"sha256={digest}"
+
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            raise DeliveryError(f"HTTP {e.code}")
+        except OSError as e:
+            raise DeliveryError(str(e) or type(e).__name__)
+
+    return send
+
+
+# =========================
+# CLAIM / FINISH
+# =========================
+
+def claim(connection, batch_size, lease):
+    """Take up to ``batch_size`` due events for this worker.
+
+    ``FOR UPDATE SKIP LOCKED`` lets several workers claim side by side
+    without waiting on each other's rows. The claim itself is a lease:
+    ``available_at`` moves ``lease`` seconds out and ``attempts`` goes
+    up, so events of a worker that dies mid-batch are claimed again once
+    the lease runs out.
+    """
+    now = datetime.utcnow()
+    due = (
+        db.select(OutboxEvent.id)
+        .where(OutboxEvent.failed_at.is_(None), OutboxEvent.available_at <= now)
+        .order_by(OutboxEvent.available_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+    return connection.execute(
+        db.update(OutboxEvent)
+        .where(OutboxEvent.id.in_(due))
+        .values(
+            available_at=now + timedelta(seconds=lease),
+            attempts=OutboxEvent.attempts + 1
+        )
+        .returning(
+            OutboxEvent.id,
+            OutboxEvent.topic,
+            OutboxEvent.payload,
+            OutboxEvent.pending,
+            OutboxEvent.attempts,
+            OutboxEvent.created_at
+        )
+    ).all()
+
+
+def backoff(attempts, base, cap):
+    """Seconds before retry number ``attempts``: doubling, capped, jittered."""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * (0.5 + random.random() / 2)
+
+
+def finish(connection, outcomes, max_attempts, backoff_base, backoff_max):
+    """Record a batch: delete delivered events, reschedule or fail the rest.
+
+    ``outcomes`` are ``(event, failed, error)``; ``failed`` lists the
+    consumers that still need the event, so a retry skips the ones that
+    already took it. Returns ``(delivered, retried, failed)`` counts.
+    """
+    now = datetime.utcnow()
+    delivered = [event.id for event, failed, _ in outcomes if not failed]
+    retried = given_up = 0
+
+    if delivered:
+        connection.execute(db.delete(OutboxEvent).where(OutboxEvent.id.in_(delivered)))
+
+    for event, failed, error in outcomes:
+        if not failed:
+            continue
+
+        values = {"pending": failed, "last_error": error[:500]}
+        if event.attempts >= max_attempts:
+            values["failed_at"] = now
+            given_up += 1
+        else:
+            values["available_at"] = now + timedelta(
+                seconds=backoff(event.attempts, backoff_base, backoff_max)
+            )
+            retried += 1
+
+        connection.execute(
+            db.update(OutboxEvent).where(OutboxEvent.id == event.id).values(**values)
+        )
+
+    return len(delivered), retried, given_up
+
+
+def requeue_failed():
+    """Give every event that ran out of attempts a fresh set; returns the count."""
+    count = db.session.execute(
+        db.update(OutboxEvent)
+        .where(OutboxEvent.failed_at.is_not(None))
+        .values(failed_at=None, attempts=0, available_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    return count
+
+
+# =========================
+# DISPATCHER (worker process)
+# =========================
+
+async def _deliver(event, consumers, call):
+    names = list(consumers) if event.pending is None else [
+        # Consumers removed since the last attempt are dropped
+        name for name in event.pending if name in consumers
+    ]
+    message = {
+        "id": event.id,
+        "topic": event.topic,
+        "payload": event.payload,
+        "created_at": event.created_at.isoformat(),
+        "attempt": event.attempts,
+    }
+
+    results = await asyncio.gather(
+        *(call(consumers[name], message) for name in names),
+        return_exceptions=True
+    )
+
+    failed = [name for name, result in zip(names, results) if isinstance(result, Exception)]
+    error = "; ".join(
+        f"{name}: {result}"
+        for name, result in zip(names, results) if isinstance(result, Exception)
+    )
+    return event, failed, error
+
+
+async def _dispatch(engine, consumers, batch_size, concurrency, lease, max_attempts,
+                    backoff_base, backoff_max, poll, once, progress):
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        async def call(fn, message):
+            async with limit:
+                if inspect.iscoroutinefunction(fn):
+                    return await fn(message)
+                return await loop.run_in_executor(pool, fn, message)
+
+        totals = [0, 0, 0]
+        started = perf_counter()
+
+        while True:
+            with engine.begin() as connection:
+                events = claim(connection, batch_size, lease)
+
+            if not events:
+                if once:
+                    return tuple(totals)
+                await asyncio.sleep(poll)
+                continue
+
+            outcomes = await asyncio.gather(*(_deliver(e, consumers, call) for e in events))
+
+            with engine.begin() as connection:
+                counts = finish(connection, outcomes, max_attempts, backoff_base, backoff_max)
+
+            totals = [t + c for t, c in zip(totals, counts)]
+            elapsed = perf_counter() - started
+            progress(
+                f"{totals[0]:,} delivered ({totals[0] / elapsed:,.0f}/s), "
+                f"{totals[1]:,} retrying, {totals[2]:,} failed"
+            )
+
+
+def run(engine, consumers=None, batch_size=100, concurrency=20, lease=60,
+        max_attempts=10, backoff_base=5, backoff_max=3600, poll=1.0,
+        once=False, progress=print):
+    """Deliver outbox events until stopped (or, with ``once``, until none are due).
+
+    Each loop claims a batch, hands every event to every consumer
+    concurrently (at most ``concurrency`` calls in flight), then deletes
+    what was delivered and reschedules the rest with exponential
+    backoff. Delivery is at least once: a crash between a consumer
+    succeeding and ``finish`` means that consumer sees the event again.
+    Returns ``(delivered, retried, failed)``.
+    """
+    consumers = CONSUMERS if consumers is None else consumers
+    return asyncio.run(_dispatch(
+        engine, consumers, batch_size, concurrency, lease, max_attempts,
+        backoff_base, backoff_max, poll, once, progress
+    ))
+
+
+# =========================
+# SETUP
+# =========================
+
+def init_app(app):
+    config = app.config
+    _settings["enabled"] = config["OUTBOX_ENABLED"]
+
+    for url in filter(None, (u.strip() for u in config["OUTBOX_WEBHOOK_URLS"].split(","))):
+        CONSUMERS[f"webhook:{url}"] = webhook(
+            url, config["OUTBOX_WEBHOOK_SECRET"], config["OUTBOX_WEBHOOK_TIMEOUT"]
+        )
@@ -0,0 +1,94 @@
+import base64
+import heapq
+from datetime import datetime
+
+from models import db, Transaction
+
+
+# =========================
+# CURSOR ENCODING
+# =========================
+
+def encode_cursor(tx):
+    """Opaque keyset cursor pointing just past ``tx``."""
+    raw = f"{tx.created_at.isoformat()}|{tx.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` or ``None`` for a missing/garbled cursor."""
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, tx_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(tx_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+# =========================
+# KEYSET PAGE
+# =========================
+
+def source_query(column, source_id, after, limit, where=()):
+    # One index range scan per source on
+    # (source, created_at DESC, id DESC) — cost is independent of page depth.
+    query = Transaction.query.filter(column == source_id, *where)
+
+    if after is not None:
+        # The plain created_at bound lets Postgres prune later partitions;
+        # the row comparison alone is opaque to the planner.
+        query = query.filter(
+            Transaction.created_at <= after[0],
+            db.tuple_(Transaction.created_at, Transaction.id) < after
+        )
+
+    return query.order_by(
+        Transaction.created_at.desc(),
+        Transaction.id.desc()
+    ).limit(limit)
+
+
+def transaction_page(account_ids, card_ids, cursor=None, limit=50):
+    """Newest-first page of transactions across a user's accounts and cards.
+
+    Returns ``(transactions, next_cursor)``; ``next_cursor`` is ``None`` on
+    the last page.
+    """
+    after = decode_cursor(cursor)
+
+    sources = [(Transaction.account_id, i) for i in account_ids]
+    sources += [(Transaction.virtual_card_id, i) for i in card_ids]
+
+    return merge_page([
+        source_query(column, source_id, after, limit + 1).all()
+        for column, source_id in sources
+    ], limit)
+
+
+def merge_page(streams, limit):
+    """First ``limit`` of newest-first ``streams`` and the cursor past them.
+
+    Each stream is already sorted, so a k-way merge of the per-source
+    heads gives the global order without sorting the full ledger. Each
+    must hold up to ``limit + 1`` rows so the last page is detected.
+    """
+    merged = heapq.merge(
+        *streams,
+        key=lambda tx: (tx.created_at, tx.id),
+        reverse=True
+    )
+
+    page = []
+    for tx in merged:
+        page.append(tx)
+        if len(page) > limit:
+            break
+
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1])
+
+    return page, None
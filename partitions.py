@@ -0,0 +1,160 @@
+from datetime import date, datetime
+
+from models import db
+
+
+PARENT = "transactions"
+DEFAULT_PARTITION = "transactions_default"
+
+
+class PartitionError(Exception):
+    """The transactions table is not partitioned (or not on Postgres)."""
+
+
+def add_months(d, n):
+    month = d.month - 1 + n
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_p{month:%Y_%m}"
+
+
+def _require_partitioned():
+    if db.session.get_bind().dialect.name != "postgresql":
+        raise PartitionError("Partitioning is only available on Postgres")
+
+    kind = db.session.execute(db.text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"
+    ), {"t": PARENT}).scalar()
+
+    if kind != "p":
+        raise PartitionError("transactions is not a partitioned table")
+
+
+def list_partitions():
+    """``[(name, lower, upper, tablespace)]`` for the monthly partitions.
+
+    Bounds are read from the ``transactions_pYYYY_MM`` naming used by the
+    migration and by ``ensure_partitions``.
+    """
+    _require_partitioned()
+
+    rows = db.session.execute(db.text("""
+        SELECT c.relname, t.spcname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace
+        WHERE i.inhparent = to_regclass(:parent)
+    """), {"parent": PARENT}).all()
+
+    partitions = []
+    for name, tablespace in rows:
+        try:
+            lower = datetime.strptime(name, f"{PARENT}_p%Y_%m").date()
+        except ValueError:
+            continue
+        partitions.append((name, lower, add_months(lower, 1), tablespace))
+
+    return sorted(partitions, key=lambda p: p[1])
+
+
+# =========================
+# MISSING PARTITIONS
+# =========================
+
+def _default_months():
+    """Months that rows in the DEFAULT partition fall into."""
+    return set(db.session.scalars(db.text(
+        f"SELECT DISTINCT date_trunc('month', created_at)::date FROM {DEFAULT_PARTITION}"
+    )))
+
+
+def ensure_partitions(months_ahead=3, today=None, since=None):
+    """Create any missing monthly partitions up to ``months_ahead``.
+
+    Past months get one too: every month the DEFAULT partition holds
+    rows for (old or bulk-loaded history), and every month from
+    ``since`` on. Rows in DEFAULT are moved into their new partitions
+    in the same transaction, so it only ever catches stragglers.
+    Returns the names created.
+    """
+    _require_partitioned()
+
+    today = (today or date.today()).replace(day=1)
+    existing = {lower for _, lower, _, _ in list_partitions()}
+
+    wanted = {add_months(today, n) for n in range(months_ahead + 1)}
+    if since is not None:
+        month = since.replace(day=1)
+        while month < today:
+            wanted.add(month)
+            month = add_months(month, 1)
+
+    stray = _default_months()
+    missing = sorted((wanted | stray) - existing)
+    if not missing:
+        return []
+
+    if stray:
+        # A range can't be attached while DEFAULT holds rows for it
+        db.session.execute(db.text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}"))
+
+    created = []
+    for month in missing:
+        name = partition_name(month)
+        db.session.execute(db.text(
+            f"CREATE TABLE {name} PARTITION OF {PARENT} "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        ))
+        created.append(name)
+
+    if stray:
+        # Every month DEFAULT held now has a partition, so all of it moves
+        db.session.execute(db.text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} RETURNING *) "
+            f"INSERT INTO {PARENT} SELECT * FROM moved"
+        ))
+        db.session.execute(db.text(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"
+        ))
+
+    db.session.commit()
+    return created
+
+
+# =========================
+# ARCHIVING
+# =========================
+
+def archive_partitions(older_than_months, tablespace=None, detach=False, today=None):
+    """Move and/or detach partitions that end before the cutoff month.
+
+    ``tablespace`` moves each old partition (and its indexes) to cheaper
+    storage; ``detach`` removes it from ``transactions`` so queries and
+    VACUUM no longer see it, leaving it as a standalone table. Returns
+    the names touched.
+    """
+    _require_partitioned()
+
+    cutoff = add_months((today or date.today()).replace(day=1), -older_than_months)
+    touched = []
+
+    for name, _, upper, current_space in list_partitions():
+        if upper > cutoff:
+            continue
+
+        if tablespace and current_space != tablespace:
+            db.session.execute(db.text(f'ALTER TABLE {name} SET TABLESPACE "{tablespace}"'))
+            for (index,) in db.session.execute(db.text(
+                "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = to_regclass(:t)"
+            ), {"t": name}):
+                db.session.execute(db.text(f'ALTER INDEX {index} SET TABLESPACE "{tablespace}"'))
+
+        if detach:
+            db.session.execute(db.text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+
+        touched.append(name)
+
+    db.session.commit()
+    return touched
@@ -0,0 +1,136 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from time import perf_counter
+
+from metrics import record_section
+from models import bcrypt
+
+
+class HasherBusy(Exception):
+    """Too many password hashes queued; the caller should retry later."""
+
+
+# =========================
+# COST CALIBRATION
+# =========================
+
+def measure_rounds(rounds, samples=3):
+    """Median wall time (ms) of one bcrypt hash at ``rounds``."""
+    timings = []
+    for _ in range(samples):
+        start = perf_counter()
+        bcrypt.generate_password_hash("calibration", rounds)
+        timings.append((perf_counter() - start) * 1000)
+    return sorted(timings)[samples // 2]
+
+
+def calibrate_rounds(target_ms, min_rounds=10, max_rounds=15):
+    """Highest bcrypt cost whose hash time stays within ``target_ms``.
+
+    Each extra round doubles the work, so one measurement at
+    ``min_rounds`` is enough to extrapolate the rest.
+    """
+    base = measure_rounds(min_rounds)
+    rounds = min_rounds
+
+    while rounds < max_rounds and base * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+
+    return rounds
+
+
+def resolve_rounds(config):
+    """The bcrypt cost for this deployment.
+
+    An explicit ``BCRYPT_LOG_ROUNDS`` wins. Otherwise the cost is
+    calibrated once per host and cached in ``BCRYPT_CALIBRATION_FILE`` so
+    every gunicorn worker agrees. Hosts may still differ, so logins only
+    ever rehash upward (see ``PasswordHasher.needs_rehash``).
+    """
+    if config.get("BCRYPT_LOG_ROUNDS"):
+        return int(config["BCRYPT_LOG_ROUNDS"])
+
+    path = config["BCRYPT_CALIBRATION_FILE"]
+
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        pass
+
+    rounds = calibrate_rounds(config["BCRYPT_TARGET_MS"])
+
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        with os.fdopen(fd, "w") as f:
+            f.write(str(rounds))
+    except FileExistsError:
+        # Another worker won the race; use its value
+        with open(path) as f:
+            return int(f.read().strip())
+
+    return rounds
+
+
+def hash_rounds(hashed):
+    """Cost factor encoded in a ``$2b$12$...`` hash."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+# =========================
+# BOUNDED HASHER
+# =========================
+
+class PasswordHasher:
+    """Runs bcrypt on a fixed pool with a cap on queued work.
+
+    The bcrypt C code releases the GIL, so the pool bounds CPU spent on
+    hashing and a login burst fails fast with ``HasherBusy`` instead of
+    piling up behind every other route.
+    """
+
+    def __init__(self, rounds, workers=4, max_pending=32, timeout=5.0):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Password service busy")
+
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        # The slot frees when the hash finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+
+        started = perf_counter()
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Hashes are queued too deep to finish in time; same answer as a full queue
+            raise HasherBusy("Password service busy")
+        finally:
+            record_section("bcrypt", perf_counter() - started)
+
+    def hash(self, password):
+        return self._run(
+            bcrypt.generate_password_hash, password, self.rounds
+        ).decode("utf-8")
+
+    def check(self, hashed, password):
+        return self._run(bcrypt.check_password_hash, hashed, password)
+
+    def needs_rehash(self, hashed):
+        # Upward only: hosts calibrated to different costs would otherwise
+        # rewrite a user's hash back and forth on every login
+        rounds = hash_rounds(hashed)
+        return rounds is None or rounds < self.rounds
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import time
+
+
+# =========================
+# BACKENDS
+# =========================
+#
+# A backend stores one token bucket per key and exposes a single atomic
+# operation, take(), so every check is O(1). Buckets that have refilled
+# completely carry no information and are evicted.
+
+def _refill(tokens, updated, now, capacity, rate):
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryBackend:
+    """Per-process buckets with LRU eviction. Not shared across workers."""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost, now):
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+
+            allowed = tokens >= max(cost, 1)
+            if allowed:
+                tokens -= cost
+
+            if tokens < capacity:
+                self._buckets[key] = (tokens, now)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+
+            return allowed
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SQLiteBackend:
+    """Buckets in a local SQLite file, shared by every worker on the host."""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path, max_idle=3600):
+        self.path = path
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._ops = 0
+
+    def _connect(self):
+        # One connection per thread and per process (safe across fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, cost, now):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = _refill(*(row or (capacity, now)), now, capacity, rate)
+
+            allowed = tokens >= max(cost, 1)
+            if allowed:
+                tokens -= cost
+
+            if tokens < capacity:
+                conn.execute(
+                    "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET "
+                    "tokens = excluded.tokens, updated = excluded.updated",
+                    (key, tokens, now)
+                )
+            elif row is not None:
+                conn.execute("DELETE FROM buckets WHERE key = ?", (key,))
+
+            self._ops += 1
+            if self._ops % self.SWEEP_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM buckets WHERE updated < ?", (now - self.max_idle,)
+                )
+
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return allowed
+
+    def reset(self, key):
+        self._connect().execute("DELETE FROM buckets WHERE key = ?", (key,))
+
+
+# =========================
+# LIMITER
+# =========================
+
+class RateLimiter:
+    """Token bucket: ``limit`` events per ``period`` seconds per key."""
+
+    def __init__(self, backend, name, limit, period):
+        self.backend = backend
+        self.name = name
+        self.capacity = limit
+        self.rate = limit / period
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def blocked(self, key):
+        """True when ``key`` has no budget left (does not consume)."""
+        return not self.backend.take(
+            self._key(key), self.capacity, self.rate, 0, time()
+        )
+
+    def hit(self, key):
+        """Consume one unit; False when the key was already out of budget."""
+        return self.backend.take(
+            self._key(key), self.capacity, self.rate, 1, time()
+        )
+
+    def reset(self, key):
+        self.backend.reset(self._key(key))
+
+
+def parse_limit(spec):
+    """``"5/60"`` -> ``(5, 60.0)``."""
+    limit, period = spec.split("/")
+    return int(limit), float(period)
+
+
+def create_backend(config):
+    if config["RATELIMIT_BACKEND"] == "memory":
+        return MemoryBackend(config["RATELIMIT_MAX_KEYS"])
+    return SQLiteBackend(config["RATELIMIT_SQLITE_PATH"])
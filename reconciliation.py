@@ -0,0 +1,265 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from decimal import Decimal
+from time import perf_counter
+
+from sqlalchemy import create_engine
+
+from models import db, Account, BalanceWatermark, ReconcileMark, Transaction, VirtualCard
+from sqlutil import upsert
+
+
+# kind -> (balance holder, its foreign key on transactions)
+SOURCES = {
+    "account": (Account, Transaction.account_id),
+    "vcard": (VirtualCard, Transaction.virtual_card_id),
+}
+
+REPORT_COLUMNS = ("kind", "source_id", "balance", "ledger", "difference")
+
+# New sources per IN (...) list; stays under SQLite's bound-parameter cap
+IN_BATCH = 10_000
+
+
+# =========================
+# CHUNK (worker process)
+# =========================
+
+def _fold(connection, fk, where):
+    """``{source_id: (sum, count)}`` of the transactions matching ``where``."""
+    rows = connection.execute(
+        db.select(fk, db.func.sum(Transaction.amount), db.func.count())
+        .where(*where)
+        .group_by(fk)
+    )
+    return {source_id: (Decimal(str(total)), n) for source_id, total, n in rows}
+
+
+def _check_chunk(task):
+    """Fold new transactions of ``kind`` ids ``lo..hi`` and compare balances.
+
+    Runs in a worker process with its own engine, in one snapshot so
+    balances and transactions agree. Watermarked sources only read
+    transactions after their watermark (an id range scan); sources seen
+    for the first time are summed once in full. Every source in the
+    range leaves with its watermark at ``horizon``. Transactions above
+    ``horizon`` may still have lower-id siblings in flight, so they are
+    counted for the comparison but not folded into the watermark.
+    Returns ``(checked, folded, discrepancies)``.
+    """
+    database_url, kind, lo, hi, horizon = task
+    model, fk = SOURCES[kind]
+    engine = create_engine(database_url)
+
+    try:
+        connection = engine.connect()
+        if connection.dialect.name == "postgresql":
+            connection = connection.execution_options(isolation_level="REPEATABLE READ")
+
+        with connection, connection.begin():
+            balances = dict(connection.execute(
+                db.select(model.id, model.balance).where(model.id.between(lo, hi))
+            ).all())
+            if not balances:
+                return 0, 0, []
+
+            marks = {
+                source_id: (last, Decimal(str(total)), Decimal(str(difference)))
+                for source_id, last, total, difference in connection.execute(
+                    db.select(
+                        BalanceWatermark.source_id,
+                        BalanceWatermark.last_transaction_id,
+                        BalanceWatermark.ledger_sum,
+                        BalanceWatermark.difference
+                    ).where(
+                        BalanceWatermark.kind == kind,
+                        BalanceWatermark.source_id.between(lo, hi)
+                    )
+                )
+            }
+
+            folded = {}
+            if marks:
+                floor = min(last for last, _, _ in marks.values())
+                folded.update(_fold(connection, fk, (
+                    Transaction.id > floor,
+                    Transaction.id <= horizon,
+                    fk.between(lo, hi),
+                    Transaction.id > db.select(BalanceWatermark.last_transaction_id).where(
+                        BalanceWatermark.kind == kind,
+                        BalanceWatermark.source_id == fk
+                    ).scalar_subquery()
+                )))
+
+                new = sorted(set(balances) - set(marks))
+                for i in range(0, len(new), IN_BATCH):
+                    folded.update(_fold(connection, fk, (
+                        fk.in_(new[i:i + IN_BATCH]),
+                        Transaction.id <= horizon
+                    )))
+            else:
+                folded.update(_fold(connection, fk, (fk.between(lo, hi), Transaction.id <= horizon)))
+
+            tail = _fold(connection, fk, (Transaction.id > horizon, fk.between(lo, hi)))
+
+            now = datetime.utcnow()
+            writes, discrepancies = [], []
+            for source_id, balance in balances.items():
+                _, ledger_sum, old_difference = marks.get(source_id, (0, Decimal("0"), None))
+                ledger_sum += folded.get(source_id, (Decimal("0"),))[0]
+
+                ledger = ledger_sum + tail.get(source_id, (Decimal("0"),))[0]
+                difference = Decimal(str(balance)) - ledger
+                if difference:
+                    discrepancies.append((kind, source_id, balance, ledger, difference))
+
+                # Only rows that moved are rewritten
+                if source_id in folded or difference != old_difference:
+                    writes.append({
+                        "kind": kind,
+                        "source_id": source_id,
+                        "last_transaction_id": horizon,
+                        "ledger_sum": ledger_sum,
+                        "difference": difference,
+                        "updated_at": now,
+                    })
+
+            if writes:
+                stmt = upsert(connection, BalanceWatermark)
+                excluded = stmt.excluded
+                connection.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["kind", "source_id"],
+                        set_={
+                            "last_transaction_id": excluded.last_transaction_id,
+                            "ledger_sum": excluded.ledger_sum,
+                            "difference": excluded.difference,
+                            "updated_at": excluded.updated_at,
+                        }
+                    ),
+                    writes
+                )
+
+            # Everything else in the range is now verified through horizon
+            # too; one set-based UPDATE keeps the next run's scan short
+            connection.execute(
+                db.update(BalanceWatermark)
+                .where(
+                    BalanceWatermark.kind == kind,
+                    BalanceWatermark.source_id.between(lo, hi),
+                    BalanceWatermark.last_transaction_id < horizon
+                )
+                .values(last_transaction_id=horizon)
+            )
+
+    finally:
+        engine.dispose()
+
+    return len(balances), sum(n for _, n in folded.values()), discrepancies
+
+
+# =========================
+# DRIVER
+# =========================
+
+def settled_horizon(settle_seconds):
+    """Highest transaction id whose writer must have finished by now.
+
+    Ids come from a sequence at INSERT time but commit in any order, and
+    created_at says nothing about either (EOD, batches and seeding
+    backdate it). So each run records the highest id visible right now;
+    every id up to it was handed out before that moment, so once the
+    mark is ``settle_seconds`` old its writers have all committed or
+    rolled back. The newest such mark is the horizon (0 until one
+    exists, so with cron the horizon trails by about one run); older
+    marks are pruned.
+    """
+    now = datetime.utcnow()
+    db.session.add(ReconcileMark(
+        transaction_id=db.session.execute(db.select(db.func.max(Transaction.id))).scalar() or 0,
+        recorded_at=now
+    ))
+    db.session.flush()
+
+    settled = db.session.execute(
+        db.select(ReconcileMark.id, ReconcileMark.transaction_id)
+        .where(ReconcileMark.recorded_at <= now - timedelta(seconds=settle_seconds))
+        .order_by(ReconcileMark.recorded_at.desc())
+        .limit(1)
+    ).first()
+
+    if settled is not None:
+        db.session.execute(db.delete(ReconcileMark).where(ReconcileMark.id < settled.id))
+    db.session.commit()
+
+    return settled.transaction_id if settled is not None else 0
+
+
+def _ranges(model, chunk_size):
+    first, last = db.session.execute(
+        db.select(db.func.min(model.id), db.func.max(model.id))
+    ).one()
+    if first is None:
+        return []
+    return [(lo, lo + chunk_size - 1) for lo in range(first, last + 1, chunk_size)]
+
+
+def run(database_url, settle_seconds=300, chunk_size=50_000, workers=None,
+        full=False, progress=print):
+    """Check every account and card balance against its ledger.
+
+    Sources are split into id ranges of ``chunk_size`` and checked in
+    parallel by a process pool; each run folds only transactions newer
+    than the per-source watermarks. ``full`` drops the watermarks first
+    (a from-scratch recompute). Returns ``(checked, folded,
+    discrepancies)``; discrepancies are ``REPORT_COLUMNS`` tuples.
+    """
+    if database_url.startswith("sqlite"):
+        # One writer at a time is all SQLite allows
+        workers = 1
+
+    if full:
+        db.session.execute(db.delete(BalanceWatermark))
+        db.session.commit()
+
+    # Never behind a previous run, or its folded rows would count twice
+    horizon = max(
+        settled_horizon(settle_seconds),
+        db.session.execute(db.select(db.func.max(BalanceWatermark.last_transaction_id))).scalar() or 0
+    )
+    tasks = [
+        (database_url, kind, lo, hi, horizon)
+        for kind, (model, _) in SOURCES.items()
+        for lo, hi in _ranges(model, chunk_size)
+    ]
+    db.session.commit()
+
+    progress(f"{len(tasks):,} chunks, transactions settled up to id {horizon:,}")
+
+    checked = folded = 0
+    discrepancies = []
+    started = perf_counter()
+
+    with ProcessPoolExecutor(workers) as pool:
+        for future in as_completed(pool.submit(_check_chunk, t) for t in tasks):
+            n_checked, n_folded, found = future.result()
+            checked += n_checked
+            folded += n_folded
+            discrepancies.extend(found)
+
+            elapsed = perf_counter() - started
+            progress(
+                f"{checked:,} balances checked, {folded:,} transactions folded "
+                f"({folded / elapsed:,.0f} rows/s), {len(discrepancies):,} discrepancies"
+            )
+
+    discrepancies.sort(key=lambda d: (d[0], d[1]))
+    return checked, folded, discrepancies
+
+
+def write_report(path, discrepancies):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        writer.writerows(discrepancies)
@@ -0,0 +1,202 @@
+import logging
+import threading
+from time import monotonic, time
+
+from datetime import datetime, timedelta
+
+from flask import current_app, g, has_request_context, request, session
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from flask_sqlalchemy.session import Session as FlaskSession
+from jwt import PyJWTError
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import metrics
+
+
+logger = logging.getLogger("zenith.replicas")
+
+REPLICA_BIND = "replica"
+PRIMARY_COOKIE = "zenith_primary_until"
+
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+# users.ledger_updated_at moves on every ledger write (versions.bump)
+WROTE_SINCE_SQL = "SELECT 1 FROM users WHERE id = :user_id AND ledger_updated_at > :since"
+
+_lag = {"checked": None, "fresh": False}
+_lag_lock = threading.Lock()
+
+
+# =========================
+# ROUTING SESSION
+# =========================
+#
+# Reads go to the "replica" bind (SQLALCHEMY_BINDS) when the request was
+# routed there; flushes and INSERT/UPDATE/DELETE statements always go to
+# the primary, so a stray write on a read-only route still lands safely.
+
+class RoutingSession(FlaskSession):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and self.info.get("use_replica")
+            and not self._flushing
+            and not getattr(clause, "is_dml", False)
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(fn):
+    """Mark a view as safe to serve from the replica, whatever its method."""
+    fn._read_only = True
+    return fn
+
+
+# =========================
+# REPLICA HEALTH
+# =========================
+
+def replica_lag(engine):
+    """Seconds the replica is behind the primary (0 for non-Postgres)."""
+    if engine.dialect.name != "postgresql":
+        return 0.0
+
+    with engine.connect() as conn:
+        return float(conn.execute(text(LAG_SQL)).scalar() or 0)
+
+
+def _replica_fresh(engine):
+    config = current_app.config
+    now = monotonic()
+
+    with _lag_lock:
+        checked = _lag["checked"]
+        if checked is not None and now - checked < config["REPLICA_LAG_CHECK_INTERVAL"]:
+            return _lag["fresh"]
+
+    try:
+        fresh = replica_lag(engine) <= config["REPLICA_MAX_LAG"]
+        if not fresh:
+            logger.warning("Replica lag above %ss; reading from primary", config["REPLICA_MAX_LAG"])
+    except SQLAlchemyError:
+        logger.exception("Replica lag check failed; reading from primary")
+        fresh = False
+
+    with _lag_lock:
+        _lag["checked"], _lag["fresh"] = now, fresh
+
+    return fresh
+
+
+# =========================
+# REQUEST HOOKS
+# =========================
+
+def _wants_replica():
+    view = current_app.view_functions.get(request.endpoint)
+    marked = getattr(view, "_read_only", None)
+
+    if marked is None:
+        marked = current_app.config["REPLICA_ROUTE_GETS"] and request.method in ("GET", "HEAD")
+    if not marked:
+        return False
+
+    engine = current_app.extensions["sqlalchemy"].engines.get(REPLICA_BIND)
+    if engine is None:
+        return False
+
+    # Read-your-writes: stay on the primary for a while after writing
+    try:
+        if float(request.cookies.get(PRIMARY_COOKIE, 0)) > time():
+            return False
+    except ValueError:
+        pass
+
+    return _replica_fresh(engine) and not _user_wrote_recently()
+
+
+def _request_user_id():
+    user_id = session.get("user_id")
+    if user_id is not None:
+        return user_id
+
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        # The view's own @jwt_required answers bad tokens
+        return None
+
+
+def _user_wrote_recently():
+    """The cookie's server-side twin, for API clients without a cookie jar.
+
+    One primary-key lookup on the primary: has the authenticated user's
+    ledger changed within READ_YOUR_WRITES_WINDOW?
+    """
+    user_id = _request_user_id()
+    if user_id is None:
+        return False
+
+    window = timedelta(seconds=current_app.config["READ_YOUR_WRITES_WINDOW"])
+    db_session = current_app.extensions["sqlalchemy"].session
+    db_session.info["use_replica"] = False
+
+    return db_session.execute(
+        text(WROTE_SINCE_SQL),
+        {"user_id": int(user_id), "since": datetime.utcnow() - window}
+    ).first() is not None
+
+
+def _before_request():
+    use_replica = _wants_replica()
+    current_app.extensions["sqlalchemy"].session.info["use_replica"] = use_replica
+    metrics.record_db_target(REPLICA_BIND if use_replica else "primary")
+
+
+def _after_request(response):
+    if g.pop("db_wrote", False):
+        window = current_app.config["READ_YOUR_WRITES_WINDOW"]
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            f"{time() + window:.3f}",
+            max_age=int(window) + 1,
+            httponly=True,
+            samesite="Lax"
+        )
+    return response
+
+
+def _mark_write():
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session, flush_context):
+    _mark_write()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write()
+
+
+def init_app(app):
+    """Route eligible requests to the replica bind, if one is configured."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
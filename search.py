@@ -0,0 +1,125 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from exports import parse_date_range
+from models import db, Transaction
+from pagination import decode_cursor, merge_page, source_query
+
+
+class SearchError(Exception):
+    """A search filter is malformed; the message is safe to show the user."""
+
+
+MIN_QUERY = 3  # trigrams: anything shorter can't use the text index
+MAX_QUERY = 100
+MAX_TYPES = 10
+
+
+# =========================
+# FILTERS
+# =========================
+
+def _amount(value, name):
+    if not value:
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise SearchError(f"Invalid {name}")
+    if not amount.is_finite() or amount < 0:
+        raise SearchError(f"Invalid {name}")
+    return amount
+
+
+def _text_match(q):
+    """``description`` contains ``q``, case-insensitively, off the text index."""
+    if db.session.get_bind().dialect.name == "sqlite":
+        # FTS5 trigram phrase: a substring match like ILIKE below
+        fts = db.table("transactions_fts")
+        phrase = '"' + q.replace('"', '""') + '"'
+        return Transaction.id.in_(
+            db.select(db.literal_column("rowid"))
+            .select_from(fts)
+            .where(db.literal_column("transactions_fts").op("MATCH")(phrase))
+        )
+
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return Transaction.description.ilike(f"%{escaped}%", escape="\\")
+
+
+def parse_filters(args, max_days, now=None):
+    """Query-string filters -> ``(types, where)``.
+
+    ``types`` lists the requested ``transaction_type`` values (empty for
+    any); ``where`` holds every other condition. The date window
+    (``start`` / ``end``, ``YYYY-MM-DD``) is at most ``max_days`` long
+    and defaults to the last ``max_days``, which bounds the rows any one
+    search can walk. ``min_amount`` / ``max_amount`` compare the absolute
+    amount, so "above 500" means money in or out. Raises ``SearchError``.
+    """
+    try:
+        start_at, end_before = parse_date_range(args.get("start"), args.get("end"))
+    except ValueError:
+        raise SearchError("Invalid date range")
+
+    window = timedelta(days=max_days)
+    if end_before is None:
+        end_before = datetime.combine((now or datetime.utcnow()).date(), time()) + timedelta(days=1)
+    if start_at is None:
+        start_at = end_before - window
+    if start_at >= end_before:
+        raise SearchError("Invalid date range")
+    if end_before - start_at > window:
+        raise SearchError(f"Date range is limited to {max_days} days")
+
+    where = [Transaction.created_at >= start_at, Transaction.created_at < end_before]
+
+    types = sorted(set(args.getlist("type")))
+    if len(types) > MAX_TYPES or any(not t or len(t) > 50 for t in types):
+        raise SearchError("Invalid transaction type")
+
+    min_amount = _amount(args.get("min_amount"), "min_amount")
+    max_amount = _amount(args.get("max_amount"), "max_amount")
+    if min_amount is not None:
+        where.append(db.func.abs(Transaction.amount) >= min_amount)
+    if max_amount is not None:
+        where.append(db.func.abs(Transaction.amount) <= max_amount)
+
+    q = (args.get("q") or "").strip()
+    if q:
+        if not MIN_QUERY <= len(q) <= MAX_QUERY:
+            raise SearchError(f"Search text must be {MIN_QUERY} to {MAX_QUERY} characters")
+        where.append(_text_match(q))
+
+    return types, where
+
+
+# =========================
+# SEARCH PAGE
+# =========================
+
+def search_page(account_ids, card_ids, types, where, cursor=None, limit=50):
+    """Newest-first page of a user's transactions matching the filters.
+
+    Same keyset walk as ``transaction_page``. With ``types`` each account
+    gets one stream per type, each an ordered range scan on
+    (account, type, created_at DESC, id DESC), merged like the sources.
+    Returns ``(transactions, next_cursor)``.
+    """
+    after = decode_cursor(cursor)
+    streams = []
+
+    type_filters = [[Transaction.transaction_type == t] for t in types] or [[]]
+    for account_id in account_ids:
+        for type_where in type_filters:
+            streams.append(source_query(
+                Transaction.account_id, account_id, after, limit + 1, where + type_where
+            ).all())
+
+    card_where = where + ([Transaction.transaction_type.in_(types)] if types else [])
+    for card_id in card_ids:
+        streams.append(source_query(
+            Transaction.virtual_card_id, card_id, after, limit + 1, card_where
+        ).all())
+
+    return merge_page(streams, limit)
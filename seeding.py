@@ -0,0 +1,239 @@
+import itertools
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from decimal import Decimal
+from time import perf_counter
+
+from sqlalchemy import create_engine
+
+import partitions
+import stats
+import summaries
+from models import db, User, Account, VirtualCard, Loan, Transaction
+from sqlutil import copy_rows
+
+
+SEED_PASSWORD = "seedpass"
+
+# (transaction_type, sign, relative frequency)
+TX_MIX = (
+    ("Transfer Out", -1, 40),
+    ("Transfer In", 1, 30),
+    ("API Transfer", -1, 15),
+    ("Batch Transfer", -1, 8),
+    ("Loan Disbursed", 1, 4),
+    ("General", 1, 3),
+)
+
+MAX_CARDS = 3
+COPY_ROWS = 50_000
+
+USER_COLUMNS = ("id", "username", "email", "password", "is_admin", "created_at")
+ACCOUNT_COLUMNS = ("id", "balance", "user_id", "created_at")
+CARD_COLUMNS = ("id", "card_number", "cvv", "balance", "user_id", "created_at")
+LOAN_COLUMNS = (
+    "amount", "annual_rate", "term_months", "start_date", "user_id", "created_at",
+)
+LOAN_RATES = ("0.0600", "0.0900", "0.1200", "0.1500", "0.1900", "0.2400")
+LOAN_TERMS = (6, 12, 24, 36, 60)
+TX_COLUMNS = (
+    "amount", "transaction_type", "description",
+    "account_id", "virtual_card_id", "created_at",
+)
+
+
+# =========================
+# GENERATORS
+# =========================
+
+def _money(value):
+    return Decimal(value).quantize(Decimal("0.01"))
+
+
+def _activity(rng, n_users, budget):
+    """Heavy-tailed transactions per user summing to roughly ``budget``."""
+    weights = [rng.paretovariate(1.2) for _ in range(n_users)]
+    total = sum(weights)
+    return [int(budget * w / total) for w in weights]
+
+
+def _generate_chunk(task):
+    """Build and COPY one range of users with everything they own.
+
+    Runs in a worker process with its own engine; returns row counts.
+    """
+    (database_url, random_seed, first, count, ids, tx_budget, years,
+     password_hash, opening) = task
+
+    rng = random.Random(random_seed + first)
+    engine = create_engine(database_url)
+    now = datetime.utcnow()
+    span = timedelta(days=365 * years).total_seconds()
+    mix = [(tx_type, sign) for tx_type, sign, _ in TX_MIX]
+    cum_weights = list(itertools.accumulate(weight for _, _, weight in TX_MIX))
+
+    users, accounts, cards, loans, txs = [], [], [], [], []
+    counts = [0, 0, 0, 0]
+    activity = _activity(rng, count, tx_budget)
+
+    def flush(connection):
+        # Parents before children so FKs hold; buffers stay ~COPY_ROWS
+        copy_rows(connection, User.__table__, USER_COLUMNS, users)
+        copy_rows(connection, Account.__table__, ACCOUNT_COLUMNS, accounts)
+        copy_rows(connection, VirtualCard.__table__, CARD_COLUMNS, cards)
+        copy_rows(connection, Loan.__table__, LOAN_COLUMNS, loans)
+        copy_rows(connection, Transaction.__table__, TX_COLUMNS, txs)
+
+        for i, rows in enumerate((users, cards, loans, txs)):
+            counts[i] += len(rows)
+        for rows in (users, accounts, cards, loans, txs):
+            rows.clear()
+
+    with engine.begin() as connection:
+        for offset in range(count):
+            user_id = ids["user"] + first + offset
+            account_id = ids["account"] + first + offset
+            joined = now - timedelta(seconds=rng.random() * span)
+
+            users.append((
+                user_id, f"seed_{user_id}", f"seed_{user_id}@seed.local",
+                password_hash, False, joined
+            ))
+
+            card_ids = [
+                ids["card"] + (first + offset) * MAX_CARDS + c
+                for c in range(rng.choice((0, 0, 1, 1, 2, MAX_CARDS)))
+            ]
+
+            for _ in range(rng.choice((0, 0, 0, 1, 1, 2))):
+                loans.append((
+                    _money(rng.lognormvariate(8, 1)), Decimal(rng.choice(LOAN_RATES)),
+                    rng.choice(LOAN_TERMS), joined.date(), user_id, joined
+                ))
+
+            # Opening deposit keeps every balance equal to its ledger sum
+            balances = {("account", account_id): _money(opening)}
+            for card_id in card_ids:
+                balances[("vcard", card_id)] = Decimal("0.00")
+            txs.append((_money(opening), "General", "Opening deposit", account_id, None, joined))
+
+            age = (now - joined).total_seconds()
+            for tx_type, sign in rng.choices(mix, cum_weights=cum_weights, k=activity[offset]):
+                amount = _money(sign * min(rng.lognormvariate(3.5, 1.2), 50_000))
+                created = joined + timedelta(seconds=rng.random() * age)
+
+                if card_ids and rng.random() < 0.25:
+                    source = ("vcard", rng.choice(card_ids))
+                    txs.append((amount, tx_type, tx_type, None, source[1], created))
+                else:
+                    source = ("account", account_id)
+                    txs.append((amount, tx_type, tx_type, account_id, None, created))
+
+                balances[source] += amount
+
+            accounts.append((account_id, balances[("account", account_id)], user_id, joined))
+            for card_id in card_ids:
+                cards.append((
+                    card_id, f"9{card_id:015d}", f"{rng.randrange(1000):03d}",
+                    balances[("vcard", card_id)], user_id, joined
+                ))
+
+            if len(txs) >= COPY_ROWS:
+                flush(connection)
+
+        flush(connection)
+
+    engine.dispose()
+    return tuple(counts)
+
+
+# =========================
+# DRIVER
+# =========================
+
+def _next_ids():
+    def next_id(model):
+        return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+    return {
+        "user": next_id(User),
+        "account": next_id(Account),
+        "card": next_id(VirtualCard),
+    }
+
+
+def _fix_sequences():
+    if db.session.get_bind().dialect.name != "postgresql":
+        return
+
+    for table in ("users", "accounts", "virtual_cards"):
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        ))
+    db.session.commit()
+
+
+def seed(database_url, users, transactions, password_hash, years=5,
+         chunk_users=10_000, workers=None, opening=1000, random_seed=1,
+         progress=print):
+    """Generate ``users`` customers and about ``transactions`` ledger rows.
+
+    User ranges are generated and COPY'd in parallel by a process pool;
+    ids are assigned up front after the current maxima so seeding into a
+    non-empty database is safe. Derived stores (monthly summaries, stats
+    counters) are rebuilt once at the end. On a partitioned ledger the
+    monthly partitions for the whole span are created first, so the
+    history doesn't pile up in the DEFAULT partition.
+    """
+    if database_url.startswith("sqlite"):
+        # One writer at a time is all SQLite allows
+        workers = 1
+    elif db.session.get_bind().dialect.name == "postgresql":
+        try:
+            created = partitions.ensure_partitions(
+                since=(datetime.utcnow() - timedelta(days=365 * years)).date()
+            )
+            if created:
+                progress(f"Created {len(created):,} monthly partitions")
+        except partitions.PartitionError:
+            pass
+
+    ids = _next_ids()
+    db.session.commit()
+
+    n_chunks = math.ceil(users / chunk_users)
+    tasks = []
+    for i in range(n_chunks):
+        first = i * chunk_users
+        count = min(chunk_users, users - first)
+        budget = transactions * count // users
+        tasks.append((
+            database_url, random_seed, first, count, ids, budget, years,
+            password_hash, opening
+        ))
+
+    totals = [0, 0, 0, 0]
+    started = perf_counter()
+
+    with ProcessPoolExecutor(workers) as pool:
+        for future in as_completed(pool.submit(_generate_chunk, t) for t in tasks):
+            totals = [a + b for a, b in zip(totals, future.result())]
+            elapsed = perf_counter() - started
+            progress(
+                f"{totals[0]:,} users, {totals[1]:,} cards, {totals[2]:,} loans, "
+                f"{totals[3]:,} transactions ({totals[3] / elapsed:,.0f} tx/s)"
+            )
+
+    progress("Finalizing: sequences, monthly summaries, stats counters")
+    _fix_sequences()
+    summaries.rebuild()
+    stats.reconcile()
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+    return totals
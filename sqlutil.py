@@ -0,0 +1,46 @@
+import csv
+import io
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+
+def upsert(connection, model):
+    """INSERT that supports ``on_conflict_do_update`` on our dialects."""
+    if connection.dialect.name == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
+def copy_rows(connection, table, columns, rows):
+    """Bulk-load ``rows`` (tuples in ``columns`` order) into ``table``.
+
+    Uses ``COPY ... FROM STDIN`` on Postgres, inside ``connection``'s
+    current transaction; other dialects fall back to an executemany
+    INSERT. Returns the number of rows written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    if connection.dialect.name != "postgresql":
+        connection.execute(
+            table.insert(),
+            [dict(zip(columns, row)) for row in rows]
+        )
+        return len(rows)
+
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buf
+        )
+    finally:
+        cursor.close()
+
+    return len(rows)
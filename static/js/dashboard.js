@@ -12,9 +12,7 @@ document.addEventListener("DOMContentLoaded", () => {
 function initBalance(){
     const balanceEl = document.getElementById("liveBalance");
 
-    let total = transactionsData.reduce((sum, tx)=> sum + parseFloat(tx.amount), 0);
-
-    animateBalance(balanceEl, total);
+    animateBalance(balanceEl, dashboardSummary.balance);
 }
 
 function animateBalance(el, target){
@@ -39,12 +37,7 @@ function initCreditScore(){
     const circle = document.getElementById("scoreCircle");
     const label = document.getElementById("scoreLabel");
 
-    let income = transactionsData.filter(t=>t.amount>0).length;
-    let expense = transactionsData.filter(t=>t.amount<0).length;
-
-    let score = 600 + (income-expense)*10;
-    if(score<300) score=300;
-    if(score>850) score=850;
+    let score = dashboardSummary.credit_score;
 
     let current=0;
     const step=score/60;
@@ -75,13 +68,8 @@ function initCreditScore(){
 function generateAIInsights(){
     const list = document.getElementById("insightsList");
 
-    let totalIncome = 0;
-    let totalExpense = 0;
-
-    transactionsData.forEach(tx=>{
-        if(tx.amount>0) totalIncome+=parseFloat(tx.amount);
-        else totalExpense+=Math.abs(parseFloat(tx.amount));
-    });
+    let totalIncome = dashboardSummary.income;
+    let totalExpense = dashboardSummary.expense;
 
     let saving = totalIncome-totalExpense;
 
@@ -112,14 +100,12 @@ function addInsight(text){
 function initChart(){
     const ctx=document.getElementById("financeChart");
 
-    const monthly=transactionsData.slice(-6).map(tx=>tx.amount);
-
     new Chart(ctx,{
         type:"line",
         data:{
-            labels:["1","2","3","4","5","6"],
+            labels:dashboardSummary.chart.labels,
             datasets:[{
-                data:monthly,
+                data:dashboardSummary.chart.values,
                 borderColor:"#3b82f6",
                 backgroundColor:"rgba(59,130,246,0.2)",
                 fill:true,
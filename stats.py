@@ -0,0 +1,150 @@
+import random
+import threading
+from decimal import Decimal
+from time import monotonic
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import db, User, Account, Transaction, StatCounter
+from sqlutil import upsert
+
+
+USERS = "users"
+TRANSACTIONS = "transactions"
+BALANCE = "balance"
+
+SHARDS = 8
+
+_cache = {"expires": 0.0, "value": None}
+_cache_lock = threading.Lock()
+
+
+# =========================
+# WRITE SIDE
+# =========================
+
+def bump(connection, users=0, transactions=0, balance=0):
+    """Apply counter deltas on ``connection``'s current transaction."""
+    deltas = {USERS: users, TRANSACTIONS: transactions, BALANCE: balance}
+    shard = random.randrange(SHARDS)
+
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+
+        stmt = upsert(connection, StatCounter).values(
+            name=name,
+            shard=shard,
+            value=delta
+        )
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=["name", "shard"],
+            set_={"value": StatCounter.value + stmt.excluded.value}
+        ))
+
+
+def _balance_delta(account):
+    added, _, deleted = inspect(account).attrs.balance.history
+    new = Decimal(str(added[0])) if added else Decimal("0")
+    old = Decimal(str(deleted[0])) if deleted and deleted[0] is not None else Decimal("0")
+    return new - old
+
+
+@event.listens_for(Session, "after_flush")
+def _count_changes(session, flush_context):
+    users = 0
+    transactions = 0
+    balance = Decimal("0")
+
+    for obj in session.new:
+        if isinstance(obj, User):
+            users += 1
+        elif isinstance(obj, Transaction):
+            transactions += 1
+        elif isinstance(obj, Account):
+            balance += Decimal(str(obj.balance))
+
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            users -= 1
+        elif isinstance(obj, Transaction):
+            transactions -= 1
+        elif isinstance(obj, Account):
+            balance -= Decimal(str(obj.balance))
+
+    for obj in session.dirty:
+        if isinstance(obj, Account):
+            balance += _balance_delta(obj)
+
+    if users or transactions or balance:
+        bump(
+            session.connection(),
+            users=users,
+            transactions=transactions,
+            balance=balance
+        )
+
+
+# =========================
+# READ SIDE
+# =========================
+
+def _read_counters():
+    rows = db.session.query(
+        StatCounter.name,
+        db.func.sum(StatCounter.value)
+    ).group_by(StatCounter.name).all()
+
+    totals = {name: value for name, value in rows}
+
+    return {
+        "users": int(totals.get(USERS) or 0),
+        "transactions": int(totals.get(TRANSACTIONS) or 0),
+        "balance": Decimal(str(totals.get(BALANCE) or 0)),
+    }
+
+
+def system_stats(ttl):
+    """Precomputed totals, served from a short-lived in-process cache."""
+    now = monotonic()
+
+    with _cache_lock:
+        if _cache["value"] is not None and now < _cache["expires"]:
+            return _cache["value"]
+
+    value = _read_counters()
+
+    with _cache_lock:
+        _cache["value"] = value
+        _cache["expires"] = now + ttl
+
+    return value
+
+
+def reconcile():
+    """Rebuild every counter from the source tables. Returns the totals."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Writers bump counters in their own transaction; holding this
+        # lock makes the recount and the rebuild one consistent step
+        db.session.execute(
+            db.text("LOCK TABLE stat_counters IN EXCLUSIVE MODE")
+        )
+
+    totals = {
+        USERS: db.session.query(db.func.count(User.id)).scalar(),
+        TRANSACTIONS: db.session.query(db.func.count(Transaction.id)).scalar(),
+        BALANCE: db.session.query(
+            db.func.coalesce(db.func.sum(Account.balance), 0)
+        ).scalar(),
+    }
+
+    StatCounter.query.delete()
+    for name, value in totals.items():
+        db.session.add(StatCounter(name=name, shard=0, value=value))
+    db.session.commit()
+
+    with _cache_lock:
+        _cache["value"] = None
+
+    return totals
@@ -0,0 +1,263 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Account, Transaction, VirtualCard, MonthlySummary
+from pagination import transaction_page
+from sqlutil import upsert
+import versions
+
+
+RECENT_TRANSACTIONS = 10
+CHART_MONTHS = 6
+
+
+def month_start(moment):
+    return date(moment.year, moment.month, 1)
+
+
+# =========================
+# INCREMENTAL MAINTENANCE
+# =========================
+
+def _owners(connection, account_ids, card_ids):
+    owners = {}
+
+    if account_ids:
+        rows = connection.execute(
+            db.select(Account.id, Account.user_id)
+            .where(Account.id.in_(account_ids))
+        )
+        owners.update({("account", i): u for i, u in rows})
+
+    if card_ids:
+        rows = connection.execute(
+            db.select(VirtualCard.id, VirtualCard.user_id)
+            .where(VirtualCard.id.in_(card_ids))
+        )
+        owners.update({("vcard", i): u for i, u in rows})
+
+    return owners
+
+
+def record_transactions(connection, rows):
+    """Fold new transaction rows into the per-user monthly summaries.
+
+    Also advances each affected user's ledger version (see versions.py).
+
+    ``rows`` are mappings with ``amount``, ``transaction_type``,
+    ``account_id``, ``virtual_card_id`` and ``created_at``. Must run on the
+    same connection/transaction that inserts the rows so the summary
+    never drifts from the ledger.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    owners = _owners(
+        connection,
+        {r["account_id"] for r in rows if r["account_id"] is not None},
+        {r["virtual_card_id"] for r in rows if r["virtual_card_id"] is not None}
+    )
+
+    deltas = defaultdict(lambda: [Decimal("0"), Decimal("0"), 0, 0])
+
+    for r in rows:
+        if r["account_id"] is not None:
+            user_id = owners.get(("account", r["account_id"]))
+        else:
+            user_id = owners.get(("vcard", r["virtual_card_id"]))
+
+        if user_id is None:
+            continue
+
+        amount = Decimal(str(r["amount"]))
+        bucket = deltas[(user_id, month_start(r["created_at"]), r["transaction_type"])]
+
+        if amount > 0:
+            bucket[0] += amount
+            bucket[2] += 1
+        elif amount < 0:
+            bucket[1] += -amount
+            bucket[3] += 1
+
+    versions.bump(connection, owners.values())
+
+    for (user_id, month, tx_type), (income, expense, n_in, n_out) in deltas.items():
+        stmt = upsert(connection, MonthlySummary).values(
+            user_id=user_id,
+            month=month,
+            transaction_type=tx_type,
+            income=income,
+            expense=expense,
+            income_count=n_in,
+            expense_count=n_out
+        )
+        excluded = stmt.excluded
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "month", "transaction_type"],
+            set_={
+                "income": MonthlySummary.income + excluded.income,
+                "expense": MonthlySummary.expense + excluded.expense,
+                "income_count": MonthlySummary.income_count + excluded.income_count,
+                "expense_count": MonthlySummary.expense_count + excluded.expense_count,
+            }
+        ))
+
+
+def record_postings(connection, postings, transaction_type, created_at):
+    """Set-based ``record_transactions`` for bulk account postings.
+
+    ``postings`` is a SELECT of ``(id, amount)`` over accounts, all of
+    ``transaction_type`` and dated ``created_at``. It is folded in with
+    one INSERT ... SELECT ... ON CONFLICT and one version UPDATE, however
+    many users it touches. Run it before changing anything ``postings``
+    reads.
+    """
+    p = postings.subquery()
+    credit = db.case((p.c.amount > 0, p.c.amount), else_=0)
+    debit = db.case((p.c.amount < 0, -p.c.amount), else_=0)
+
+    grouped = (
+        db.select(
+            Account.user_id,
+            db.literal(month_start(created_at), db.Date),
+            db.literal(transaction_type, db.String),
+            db.func.sum(credit),
+            db.func.sum(debit),
+            db.func.sum(db.case((p.c.amount > 0, 1), else_=0)),
+            db.func.sum(db.case((p.c.amount < 0, 1), else_=0))
+        )
+        .join(Account, Account.id == p.c.id)
+        # Also keeps SQLite's upsert-after-SELECT parser unambiguous
+        .where(p.c.amount != 0)
+        .group_by(Account.user_id)
+    )
+
+    versions.bump_selected(
+        connection,
+        db.select(Account.user_id).join(p, Account.id == p.c.id)
+    )
+
+    stmt = upsert(connection, MonthlySummary).from_select(
+        ["user_id", "month", "transaction_type",
+         "income", "expense", "income_count", "expense_count"],
+        grouped
+    )
+    excluded = stmt.excluded
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "month", "transaction_type"],
+        set_={
+            "income": MonthlySummary.income + excluded.income,
+            "expense": MonthlySummary.expense + excluded.expense,
+            "income_count": MonthlySummary.income_count + excluded.income_count,
+            "expense_count": MonthlySummary.expense_count + excluded.expense_count,
+        }
+    ))
+
+
+@event.listens_for(Session, "after_flush")
+def _summarize_new_transactions(session, flush_context):
+    rows = [
+        {
+            "amount": obj.amount,
+            "transaction_type": obj.transaction_type,
+            "account_id": obj.account_id,
+            "virtual_card_id": obj.virtual_card_id,
+            "created_at": obj.created_at,
+        }
+        for obj in session.new
+        if isinstance(obj, Transaction)
+    ]
+
+    if rows:
+        record_transactions(session.connection(), rows)
+
+
+# =========================
+# DASHBOARD READ MODEL
+# =========================
+
+def dashboard_summary(user_id, accounts, virtual_cards):
+    """Everything the dashboard needs, in a payload of fixed size."""
+    totals = db.session.query(
+        db.func.coalesce(db.func.sum(MonthlySummary.income), 0),
+        db.func.coalesce(db.func.sum(MonthlySummary.expense), 0),
+        db.func.coalesce(db.func.sum(MonthlySummary.income_count), 0),
+        db.func.coalesce(db.func.sum(MonthlySummary.expense_count), 0)
+    ).filter(MonthlySummary.user_id == user_id).one()
+
+    income, expense, income_count, expense_count = totals
+
+    monthly = db.session.query(
+        MonthlySummary.month,
+        db.func.sum(MonthlySummary.income - MonthlySummary.expense)
+    ).filter(
+        MonthlySummary.user_id == user_id
+    ).group_by(
+        MonthlySummary.month
+    ).order_by(
+        MonthlySummary.month.desc()
+    ).limit(CHART_MONTHS).all()
+    monthly.reverse()
+
+    balance = sum(a.balance for a in accounts) + sum(c.balance for c in virtual_cards)
+
+    score = 600 + (int(income_count) - int(expense_count)) * 10
+
+    return {
+        "balance": float(balance),
+        "income": float(income),
+        "expense": float(expense),
+        "credit_score": max(300, min(850, score)),
+        "chart": {
+            "labels": [m.strftime("%b %Y") for m, _ in monthly],
+            "values": [float(net) for _, net in monthly],
+        },
+    }
+
+
+def recent_transactions(account_ids, card_ids, limit=RECENT_TRANSACTIONS):
+    transactions, _ = transaction_page(account_ids, card_ids, limit=limit)
+    return transactions
+
+
+# =========================
+# FULL REBUILD
+# =========================
+
+REBUILD_SQL = """
+INSERT INTO monthly_summaries
+    (user_id, month, transaction_type, income, expense, income_count, expense_count)
+SELECT owner_id, {month}, transaction_type,
+       COALESCE(SUM(CASE WHEN amount > 0 THEN amount END), 0),
+       COALESCE(SUM(CASE WHEN amount < 0 THEN -amount END), 0),
+       SUM(CASE WHEN amount > 0 THEN 1 ELSE 0 END),
+       SUM(CASE WHEN amount < 0 THEN 1 ELSE 0 END)
+FROM (
+    SELECT COALESCE(a.user_id, v.user_id) AS owner_id, t.*
+    FROM transactions t
+    LEFT JOIN accounts a ON a.id = t.account_id
+    LEFT JOIN virtual_cards v ON v.id = t.virtual_card_id
+) owned
+WHERE owner_id IS NOT NULL
+GROUP BY owner_id, {month}, transaction_type
+"""
+
+
+def rebuild():
+    """Recompute every monthly summary from the ledger in one statement.
+
+    For bulk loads that bypass ``record_transactions``.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        month = "date_trunc('month', created_at)::date"
+    else:
+        month = "date(created_at, 'start of month')"
+
+    MonthlySummary.query.delete()
+    db.session.execute(db.text(REBUILD_SQL.format(month=month)))
+    db.session.commit()
@@ -0,0 +1,126 @@
+"""End-of-day posting: derived stores move with it, and it posts once per date.
+
+Runs the real process-pool path against a throwaway SQLite database.
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BUSINESS_DATE = date(2026, 3, 1)
+RATE = "0.05"
+FEE = Decimal("10")
+
+
+@pytest.fixture(scope="module")
+def app():
+    import config
+    path = os.path.join(tempfile.mkdtemp(), "eod.db")
+    config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+
+    from app import app as flask_app
+    from models import db, User, Account
+
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        # 1000 earns interest and pays the fee; 20 earns no whole cent of
+        # interest but still pays the fee; 5 can't cover the fee
+        for name, balance in (("rich", 1000), ("fee_only", 20), ("poor", 5)):
+            user = User(username=name, email=f"{name}@eod.test", password="x")
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Account(user_id=user.id, balance=balance))
+        db.session.commit()
+
+        yield flask_app
+
+
+def _run(app):
+    import eod
+    from models import db
+
+    with app.app_context():
+        return eod.run(
+            db.engine.url.render_as_string(hide_password=False),
+            BUSINESS_DATE, RATE,
+            monthly_fee=FEE, fee_day=BUSINESS_DATE.day,
+            chunk_size=2, progress=lambda _: None
+        )
+
+
+def _state(app):
+    from models import db, User, Account, Transaction, MonthlySummary
+
+    with app.app_context():
+        db.session.expire_all()
+        names = {u.id: u.username for u in User.query}
+        accounts = {a.id: a for a in Account.query}
+        owner = {account_id: names[a.user_id] for account_id, a in accounts.items()}
+
+        return {
+            "balances": {owner[i]: a.balance for i, a in accounts.items()},
+            "versions": {u.username: u.ledger_version for u in User.query},
+            "postings": sorted(
+                (owner[t.account_id], t.transaction_type, t.amount)
+                for t in Transaction.query
+            ),
+            "summaries": sorted(
+                (names[s.user_id], s.transaction_type, s.income, s.expense)
+                for s in MonthlySummary.query
+            ),
+        }
+
+
+def test_fee_pass_updates_versions_and_summaries(app):
+    before = _state(app)
+
+    chunks, postings = _run(app)
+    after = _state(app)
+
+    assert chunks == 2
+    assert postings == 3  # rich: interest + fee; fee_only: fee
+    assert after["postings"] == [
+        ("fee_only", "Fee", Decimal("-10.00")),
+        ("rich", "Fee", Decimal("-10.00")),
+        ("rich", "Interest", Decimal("0.14")),
+    ]
+    assert after["balances"] == {
+        "rich": Decimal("990.14"), "fee_only": Decimal("10.00"), "poor": Decimal("5.00"),
+    }
+
+    # The fee pass alone must advance the owner's ledger version (ETags)
+    assert after["versions"]["fee_only"] == before["versions"]["fee_only"] + 1
+    assert after["versions"]["rich"] == before["versions"]["rich"] + 2
+    assert after["versions"]["poor"] == before["versions"]["poor"]
+    assert ("fee_only", "Fee", Decimal("0.00"), Decimal("10.00")) in after["summaries"]
+
+
+def test_rerun_for_same_date_is_a_no_op(app):
+    import eod
+    from models import db, EodCheckpoint
+
+    _run(app)  # already done if the test above ran
+    before = _state(app)
+
+    assert _run(app) == (0, 0)
+    assert _state(app) == before
+
+    # A racing run that already holds a planned chunk hits the checkpoint
+    # key inside its transaction and rolls back without posting
+    with app.app_context():
+        lo, hi = db.session.execute(
+            db.select(EodCheckpoint.first_id, EodCheckpoint.last_id)
+            .order_by(EodCheckpoint.first_id)
+        ).first()
+        url = db.engine.url.render_as_string(hide_password=False)
+
+    fee = (FEE, Decimal("0"))
+    daily_rate = Decimal(RATE) / 365
+    assert eod._run_chunk((url, BUSINESS_DATE, lo, hi, daily_rate, fee)) == (lo, 0)
+    assert _state(app) == before
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from flask import g, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from models import db, User
+
+
+PROFILE_TTL = 30
+PROFILE_MAX_KEYS = 10_000
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+# =========================
+# REQUEST-SCOPED USER
+# =========================
+
+def current_user():
+    """The logged-in user with accounts and virtual cards preloaded.
+
+    Loaded at most once per request (two statements: the user joined to
+    its accounts, then its cards) and cached on ``g``.
+    """
+    if "current_user" not in g:
+        user_id = session.get("user_id")
+        g.current_user = None
+
+        if user_id is not None:
+            g.current_user = db.session.execute(
+                db.select(User)
+                .where(User.id == user_id)
+                .options(
+                    joinedload(User.accounts),
+                    selectinload(User.virtual_cards)
+                )
+            ).unique().scalar_one_or_none()
+
+    return g.current_user
+
+
+# =========================
+# PROFILE CACHE
+# =========================
+#
+# Small per-process TTL cache of the user attributes that rarely change,
+# for checks like admin_required that don't need the full user. Local
+# writes invalidate immediately; other workers converge within the TTL.
+# Least recently used entries are evicted beyond PROFILE_MAX_KEYS.
+
+def user_profile(user_id):
+    """``{"id", "username", "email", "is_admin"}`` or ``None``."""
+    user_id = int(user_id)
+    now = monotonic()
+
+    with _profiles_lock:
+        hit = _profiles.get(user_id)
+        if hit and hit[0] > now:
+            _profiles.move_to_end(user_id)
+            return hit[1]
+
+    row = db.session.execute(
+        db.select(User.id, User.username, User.email, User.is_admin)
+        .where(User.id == user_id)
+    ).first()
+    profile = row._asdict() if row else None
+
+    with _profiles_lock:
+        _profiles[user_id] = (now + PROFILE_TTL, profile)
+        _profiles.move_to_end(user_id)
+        while len(_profiles) > PROFILE_MAX_KEYS:
+            _profiles.popitem(last=False)
+
+    return profile
+
+
+def invalidate_profile(user_id):
+    with _profiles_lock:
+        _profiles.pop(user_id, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_written_users(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            invalidate_profile(obj.id)
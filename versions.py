@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from assets import DIST, MANIFEST
+from models import db, User, Account, VirtualCard
+
+
+_pages = OrderedDict()
+_pages_lock = threading.Lock()
+
+
+# =========================
+# LEDGER VERSION
+# =========================
+#
+# users.ledger_version goes up whenever one of the user's transactions or
+# balances changes. Transaction inserts bump it from
+# summaries.record_transactions (ORM flushes and bulk paths alike);
+# balance-only ORM edits are caught by the flush hook below.
+
+def bump(connection, user_ids):
+    """Advance the ledger version of ``user_ids`` in the caller's transaction."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    connection.execute(
+        db.update(User)
+        .where(User.id.in_(user_ids))
+        .values(
+            ledger_version=User.ledger_version + 1,
+            ledger_updated_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_selected(connection, user_ids):
+    """``bump`` for the users returned by the ``user_ids`` SELECT, in one UPDATE."""
+    connection.execute(
+        db.update(User)
+        .where(User.id.in_(user_ids))
+        .values(
+            ledger_version=User.ledger_version + 1,
+            ledger_updated_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_balances(session, flush_context):
+    user_ids = {
+        obj.user_id
+        for obj in session.dirty
+        if isinstance(obj, (Account, VirtualCard))
+        and inspect(obj).attrs.balance.history.has_changes()
+    }
+
+    if user_ids:
+        bump(session.connection(), user_ids)
+
+
+def ledger_state(user_id):
+    """``(version, updated_at)`` for ``user_id``: one primary-key lookup."""
+    return db.session.execute(
+        db.select(User.ledger_version, User.ledger_updated_at)
+        .where(User.id == user_id)
+    ).first()
+
+
+# =========================
+# CONDITIONAL GET
+# =========================
+
+def _build_id():
+    # Same for every worker of a deploy; changes when a template does or
+    # when an asset rebuild renames the fingerprinted files pages link to
+    digest = hashlib.sha1()
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = os.path.join(here, "templates")
+
+    for name in sorted(os.listdir(root)):
+        with open(os.path.join(root, name), "rb") as f:
+            digest.update(name.encode() + f.read())
+
+    manifest = os.path.join(here, "static", DIST, MANIFEST)
+    if os.path.exists(manifest):
+        with open(manifest, "rb") as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()[:8]
+
+
+BUILD_ID = _build_id()
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and last_modified <= since
+
+
+def _cached_page(key):
+    with _pages_lock:
+        page = _pages.get(key)
+        if page is not None:
+            _pages.move_to_end(key)
+        return page
+
+
+def _store_page(key, page):
+    with _pages_lock:
+        _pages[key] = page
+        _pages.move_to_end(key)
+        while len(_pages) > current_app.config["PAGE_CACHE_SIZE"]:
+            _pages.popitem(last=False)
+
+
+def clear_page_cache():
+    """Drop every rendered page this process has cached."""
+    with _pages_lock:
+        _pages.clear()
+
+
+def conditional(identity, vary):
+    """ETag / Last-Modified for views that depend only on the user's ledger.
+
+    ``identity`` returns the user id (or ``None`` to skip). When the
+    client's copy matches the current ledger version the view is not run
+    and a 304 goes back; otherwise the rendered body is cached per
+    (path, user, version) so other clients of the same user skip the
+    queries and the template too.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id = identity()
+            state = ledger_state(user_id) if user_id is not None else None
+            if state is None:
+                return fn(*args, **kwargs)
+
+            version, updated_at = state
+            etag = f"{BUILD_ID}.{user_id}.{version}.{datetime.utcnow():%Y%m}"
+            last_modified = (
+                updated_at.replace(microsecond=0, tzinfo=timezone.utc)
+                if updated_at else None
+            )
+
+            if _not_modified(etag, last_modified):
+                response = make_response("", 304)
+            else:
+                key = (request.full_path, user_id, etag)
+                page = _cached_page(key)
+
+                if page is not None:
+                    response = make_response(page[0])
+                    response.mimetype = page[1]
+                else:
+                    response = make_response(fn(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    _store_page(key, (response.get_data(), response.mimetype))
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Always revalidate; never shared between users
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.add(vary)
+            return response
+
+        return wrapper
+    return decorator